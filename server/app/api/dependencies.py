@@ -2,12 +2,16 @@
 """
 Dependencies for FastAPI routes
 """
+from functools import lru_cache
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from app.services.storage_service import StorageService
 from app.services.pdf_service import PDFService
 from app.services.tts_service import TTSService
 from app.services.video_service import VideoService
+from app.services.groq_service import GroqService
+from app.services.llm_router import LLMRouter, Provider
+from app.services.precompute_service import SummaryPrecomputeService
 from app.core.supabase import supabase
 import os
 
@@ -36,6 +40,33 @@ def get_video_service() -> VideoService:
     storage = get_storage_service()
     return VideoService(storage)
 
+@lru_cache(maxsize=1)
+def get_ai_service() -> LLMRouter:
+    """
+    Get AI service shared by every request in the process
+    
+    Routes between the providers in LLM_PROVIDERS (preference order);
+    Gemini is skipped unless GOOGLE_API_KEY is set.
+    """
+    providers = []
+    for name in os.getenv("LLM_PROVIDERS", "groq,gemini").split(","):
+        name = name.strip()
+        if name == "groq":
+            providers.append(Provider("groq", GroqService()))
+        elif name == "gemini" and os.getenv("GOOGLE_API_KEY"):
+            from app.services.gemini_service import GeminiService
+            providers.append(Provider("gemini", GeminiService()))
+    
+    if not providers:
+        providers.append(Provider("groq", GroqService()))
+    return LLMRouter(providers)
+
+
+@lru_cache(maxsize=1)
+def get_summary_precompute_service() -> SummaryPrecomputeService:
+    """Get the process-wide speculative summary service"""
+    return SummaryPrecomputeService(get_ai_service())
+
 async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
     """
     Validate the Supabase JWT and return the user object
@@ -1,23 +1,73 @@
 """
 AI routes for Chat and Summary features
 """
+import os
+import json
 import logging
-from typing import List, Dict, Optional
-from fastapi import APIRouter, HTTPException, Depends
+from pathlib import Path
+from typing import List, Dict, Optional, Tuple
+from fastapi import APIRouter, BackgroundTasks, HTTPException, Depends, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
 from fastapi.security import HTTPAuthorizationCredentials
 from pydantic import BaseModel
 from app.services.pdf_service import PDFService
 from app.services.storage_service import StorageService
-from app.services.groq_service import GroqService
+from app.core.llm_governor import governor_stats
+from app.services.llm_router import LLMRouter
 from app.services.chunking_service import ChunkingService
+from app.services.chunk_store import ChunkStore
 from app.services.chat_history_service import ChatHistoryService
+from app.services.history_manager import HistoryManager
+from app.services.model_cascade import unsure_answer
 from app.services.summary_history_service import SummaryHistoryService
+from app.services.database_service import Database
+from app.services.cache_service import LRUCache, get_cache
+from app.utils.hashing import file_hash, question_fingerprint
+from app.utils.disconnect import ClientDisconnected, cancel_on_disconnect, stream_until_disconnect
+from app.utils.singleflight import SingleFlight
 from app.models.chat_models import ChatSession, ChatSessionWithMessages, CreateSessionRequest
 from app.models.summary_models import PDFSummary
-from app.api.dependencies import get_pdf_service, get_storage_service
+from app.services.precompute_service import SummaryPrecomputeService
+from app.api.dependencies import (
+    get_ai_service,
+    get_pdf_service,
+    get_storage_service,
+    get_summary_precompute_service
+)
 
 logger = logging.getLogger(__name__)
 
+# Initialize database
+db = Database()
+
+# Summaries are shared by every user who uploads the same PDF
+summary_cache = get_cache("summary")
+
+# Retrieved context pinned per chat session, so follow-ups keep the same prompt
+# prefix (and provider prompt caching) until the questions drift away from it
+pinned_contexts = LRUCache(
+    max_entries=int(os.getenv("CHAT_CONTEXT_SESSIONS", 1000)),
+    ttl_seconds=float(os.getenv("CHAT_CONTEXT_TTL", 3600))
+)
+CHAT_CONTEXT_MIN_COVERAGE = float(os.getenv("CHAT_CONTEXT_MIN_COVERAGE", 0.6))
+
+# Confident answers to first-turn questions, shared by everyone asking the
+# same thing about the same PDF
+answer_cache = LRUCache(
+    max_entries=int(os.getenv("CHAT_ANSWER_CACHE_ENTRIES", 2000)),
+    ttl_seconds=float(os.getenv("CHAT_ANSWER_CACHE_TTL", 24 * 3600))
+)
+
+# Keeps long chat sessions within a fixed prompt budget
+history_manager = HistoryManager()
+
+# Identical concurrent requests, e.g. a class opening the same PDF at once,
+# share one extraction, index build and summary generation
+extract_flights = SingleFlight("extraction")
+index_flights = SingleFlight("index build")
+summary_flights = SingleFlight("summary")
+
 router = APIRouter(prefix="/api/ai", tags=["AI"])
 
 class ChatRequest(BaseModel):
@@ -25,16 +75,17 @@ class ChatRequest(BaseModel):
     messages: List[Dict[str, str]]
     session_id: Optional[str] = None
 
+class LibraryChatRequest(BaseModel):
+    messages: List[Dict[str, str]]
+    max_pages: int = 8
+
 class SummaryRequest(BaseModel):
     job_id: str
     length: str = "standard"  # brief, standard, detailed
 
-def get_ai_service():
-    """Get AI service (using Groq)"""
-    return GroqService()
-
 def get_chunking_service():
-    return ChunkingService()
+    # 'content' gives edit-stable chunk boundaries across re-uploads
+    return ChunkingService(boundaries=os.getenv("CHUNK_BOUNDARIES", "fixed"))
 
 from app.api.dependencies import get_current_user, security
 
@@ -50,65 +101,204 @@ def get_summary_history_service(
 ):
     return SummaryHistoryService(user_id=user.id, access_token=credentials.credentials)
 
+def find_pdf(job_id: str, storage_service: StorageService) -> Path:
+    """Locate a job's uploaded PDF"""
+    upload_dir = storage_service.get_job_dir(job_id, "upload")
+    pdf_files = list(upload_dir.glob("*.pdf"))
+    
+    if not pdf_files:
+        raise HTTPException(status_code=404, detail="PDF file not found")
+    
+    return pdf_files[0]
+
+def extract_pdf_text(pdf_file: Path, job_id: str, pdf_service: PDFService) -> str:
+    """Extract and combine the text of every page of a PDF"""
+    extraction_result = pdf_service.extract_content(str(pdf_file), job_id)
+    
+    # Combine text from all pages
+    full_text = "\n".join([page.text for page in extraction_result.pages if page.text])
+    
+    if not full_text.strip():
+        raise HTTPException(status_code=400, detail="Could not extract text from PDF")
+    
+    return full_text
+
+async def load_pdf_text(
+    job_id: str,
+    storage_service: StorageService,
+    pdf_service: PDFService
+) -> Tuple[str, str]:
+    """
+    Extract the combined text of a job's PDF
+    
+    Extraction runs off the event loop, once per PDF content however many
+    requests need it at the same time.
+    
+    Returns:
+        Tuple of (full_text, pdf_filename)
+    """
+    pdf_file = find_pdf(job_id, storage_service)
+    full_text = await extract_flights.do(
+        f"extract:{await run_in_threadpool(file_hash, str(pdf_file))}",
+        lambda: run_in_threadpool(extract_pdf_text, pdf_file, job_id, pdf_service)
+    )
+    
+    return full_text, pdf_file.name
+
+async def load_chunk_store(
+    job_id: str,
+    storage_service: StorageService,
+    pdf_service: PDFService,
+    chunking_service: ChunkingService
+) -> ChunkStore:
+    """Open the job's chunk store, extracting and building it once if missing"""
+    store_dir = storage_service.get_job_dir(job_id, "temp") / "chunk_store"
+    
+    async def build():
+        if not ChunkStore.exists(store_dir, chunking_service):
+            full_text, _ = await load_pdf_text(job_id, storage_service, pdf_service)
+            # Only the store is shared; each caller opens its own handle
+            store = await run_in_threadpool(ChunkStore.build, full_text, store_dir, chunking_service)
+            store.close()
+    
+    if not ChunkStore.exists(store_dir, chunking_service):
+        await index_flights.do(f"index:{store_dir}", build)
+    return ChunkStore(store_dir)
+
+async def prepare_chat(
+    request: ChatRequest,
+    storage_service: StorageService,
+    pdf_service: PDFService,
+    chunking_service: ChunkingService,
+    chat_history_service: ChatHistoryService
+) -> Tuple[str, str, str]:
+    """
+    Retrieve context for the current question and resolve the chat session
+    
+    A session's follow-up questions reuse its pinned context while it still
+    contains at least CHAT_CONTEXT_MIN_COVERAGE of their keywords; beyond
+    that drift the context is retrieved again and re-pinned.
+    
+    Returns:
+        Tuple of (context, session_id, current_question)
+    """
+    pdf_filename = find_pdf(request.job_id, storage_service).name
+    
+    # Get user's current question
+    current_question = request.messages[-1]['content'] if request.messages else ""
+    print(f"DEBUG: Current question: {current_question}")
+    
+    # Reuse the job's chunk store if present, otherwise extract and build it once
+    store = await load_chunk_store(request.job_id, storage_service, pdf_service, chunking_service)
+    
+    with store:
+        pinned = None
+        if request.session_id:
+            pinned = pinned_contexts.get(f"{chat_history_service.user_id}:{request.job_id}:{request.session_id}")
+        
+        if pinned is not None and chunking_service.keyword_coverage(
+            current_question, pinned, store.contains
+        ) >= CHAT_CONTEXT_MIN_COVERAGE:
+            context = pinned
+            logger.info(f"Reusing pinned context for session {request.session_id}")
+        else:
+            # Pick diverse chunks, merge overlapping hits and only decode what makes the context
+            spans = chunking_service.select_context_spans(store, current_question)
+            context = chunking_service.build_context([store.slice(start, end) for start, end in spans])
+            logger.info(f"Using {len(spans)} spans for context")
+    
+    session_id = resolve_session(request, pdf_filename, chat_history_service)
+    pinned_contexts.set(f"{chat_history_service.user_id}:{request.job_id}:{session_id}", context)
+    return context, session_id, current_question
+
+def resolve_session(request: ChatRequest, pdf_filename: str, chat_history_service: ChatHistoryService) -> str:
+    """Get the request's chat session, creating one if needed"""
+    session_id = request.session_id
+    if not session_id:
+        # Create new session
+        session = chat_history_service.create_session(request.job_id, pdf_filename)
+        session_id = session.session_id
+    return session_id
+
+async def get_answer_cache_key(request: ChatRequest, storage_service: StorageService) -> Optional[str]:
+    """
+    Answer cache key for a first-turn question, or None if the answer must not be shared
+    
+    Follow-ups depend on the conversation so far and are never cached.
+    """
+    if len(request.messages) != 1:
+        return None
+    
+    fingerprint = question_fingerprint(request.messages[-1]['content'])
+    if not fingerprint:
+        return None
+    
+    document_hash = await run_in_threadpool(file_hash, str(find_pdf(request.job_id, storage_service)))
+    return f"{document_hash}:{fingerprint}"
+
+def sse_event(event: str, data: dict) -> str:
+    """Format a server-sent event"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+SSE_HEADERS = {
+    "Cache-Control": "no-cache",
+    "X-Accel-Buffering": "no"  # Disable proxy buffering so tokens flush immediately
+}
+
 @router.post("/chat")
 async def chat_with_pdf(
     request: ChatRequest,
+    http_request: Request,
     storage_service: StorageService = Depends(get_storage_service),
     pdf_service: PDFService = Depends(get_pdf_service),
-    ai_service: GroqService = Depends(get_ai_service),
+    ai_service: LLMRouter = Depends(get_ai_service),
     chunking_service: ChunkingService = Depends(get_chunking_service),
     chat_history_service: ChatHistoryService = Depends(get_chat_history_service)
 ):
     """
     Chat with a PDF document with chunking support
+    
+    First-turn questions already answered for the same PDF are served from
+    the answer cache without retrieval or an LLM call. If the client
+    disconnects first, generation is cancelled and nothing is saved.
     """
     try:
-        # Get PDF content
-        upload_dir = storage_service.get_job_dir(request.job_id, "upload")
-        pdf_files = list(upload_dir.glob("*.pdf"))
-        
-        if not pdf_files:
-            raise HTTPException(status_code=404, detail="PDF file not found")
-            
-        pdf_path = str(pdf_files[0])
-        pdf_filename = pdf_files[0].name
-        extraction_result = pdf_service.extract_content(pdf_path, request.job_id)
-        
-        # Combine text from all pages
-        full_text = "\n".join([page.text for page in extraction_result.pages if page.text])
-        
-        if not full_text.strip():
-            raise HTTPException(status_code=400, detail="Could not extract text from PDF")
-        
-        # Get or create session
-        session_id = request.session_id
-        if not session_id:
-            # Create new session
-            session = chat_history_service.create_session(request.job_id, pdf_filename)
-            session_id = session.session_id
-        
-        # Get user's current question
-        current_question = request.messages[-1]['content'] if request.messages else ""
-        print(f"DEBUG: Current question: {current_question}")
-        
-        # Create chunks and get relevant ones
-        chunks = chunking_service.create_chunks(full_text)
-        relevant_chunks = chunking_service.get_relevant_chunks(chunks, current_question)
-        context = chunking_service.build_context(relevant_chunks)
+        answer_key = await get_answer_cache_key(request, storage_service)
+        cached_answer = answer_cache.get(answer_key) if answer_key else None
+        if cached_answer is not None:
+            logger.info(f"Answer cache hit for job {request.job_id}")
+            pdf_filename = find_pdf(request.job_id, storage_service).name
+            session_id = resolve_session(request, pdf_filename, chat_history_service)
+            chat_history_service.add_messages(session_id, request.messages[-1]['content'], cached_answer)
+            return {"response": cached_answer, "session_id": session_id, "cached": True}
         
-        logger.info(f"Using {len(relevant_chunks)} chunks for context")
+        context, session_id, current_question = await cancel_on_disconnect(http_request, prepare_chat(
+            request, storage_service, pdf_service, chunking_service, chat_history_service
+        ))
+        messages = await cancel_on_disconnect(http_request, history_manager.prepare(
+            request.messages, ai_service.complete, session_id, chat_history_service
+        ))
         
         # Get response from AI service
         print("DEBUG: Calling AI service...")
-        response = await ai_service.chat_with_pdf(context, request.messages)
+        response = await cancel_on_disconnect(http_request, ai_service.chat_with_pdf(context, messages))
         print("DEBUG: AI service response received")
         
+        # The answer is paid for, so later askers still get it from the cache;
+        # "not in the document" answers may be retrieval misses and are not shared
+        if answer_key and not unsure_answer(response):
+            answer_cache.set(answer_key, response)
+        
+        if await http_request.is_disconnected():
+            raise ClientDisconnected()
+        
         # Save messages to history
         chat_history_service.add_messages(session_id, current_question, response)
         
         return {
             "response": response,
-            "session_id": session_id
+            "session_id": session_id,
+            "cached": False
         }
         
     except HTTPException:
@@ -120,60 +310,322 @@ async def chat_with_pdf(
         logger.error(f"Error in chat endpoint: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.post("/chat/stream")
+async def stream_chat_with_pdf(
+    request: ChatRequest,
+    http_request: Request,
+    storage_service: StorageService = Depends(get_storage_service),
+    pdf_service: PDFService = Depends(get_pdf_service),
+    ai_service: LLMRouter = Depends(get_ai_service),
+    chunking_service: ChunkingService = Depends(get_chunking_service),
+    chat_history_service: ChatHistoryService = Depends(get_chat_history_service)
+):
+    """
+    Chat with a PDF document, streaming the answer as server-sent events
+    
+    Emits `delta` events with answer text as it is generated, then a `done`
+    event with the session_id and reasoning token usage once the messages
+    are saved, or an `error` event if generation fails. A cached first-turn
+    answer arrives as a single `delta`. Generation stops, and nothing is
+    saved, once the client disconnects.
+    """
+    try:
+        answer_key = await get_answer_cache_key(request, storage_service)
+        cached_answer = answer_cache.get(answer_key) if answer_key else None
+        if cached_answer is not None:
+            logger.info(f"Answer cache hit for job {request.job_id}")
+            pdf_filename = find_pdf(request.job_id, storage_service).name
+            session_id = resolve_session(request, pdf_filename, chat_history_service)
+            current_question = request.messages[-1]['content']
+        else:
+            context, session_id, current_question = await cancel_on_disconnect(http_request, prepare_chat(
+                request, storage_service, pdf_service, chunking_service, chat_history_service
+            ))
+            messages = await cancel_on_disconnect(http_request, history_manager.prepare(
+                request.messages, ai_service.complete, session_id, chat_history_service
+            ))
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error in chat stream endpoint: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+    
+    async def event_stream():
+        if cached_answer is not None:
+            yield sse_event("delta", {"text": cached_answer})
+            await run_in_threadpool(chat_history_service.add_messages, session_id, current_question, cached_answer)
+            yield sse_event("done", {"session_id": session_id, "cached": True})
+            return
+        
+        parts = []
+        stats = {"cached": False}
+        try:
+            async for delta in stream_until_disconnect(
+                http_request, ai_service.stream_chat_with_pdf(context, messages, stats=stats)
+            ):
+                parts.append(delta)
+                yield sse_event("delta", {"text": delta})
+        except ClientDisconnected:
+            return
+        except Exception as e:
+            logger.error(f"Error streaming chat response: {e}")
+            yield sse_event("error", {"detail": str(e)})
+            return
+        
+        answer = "".join(parts)
+        if answer_key and not unsure_answer(answer):
+            answer_cache.set(answer_key, answer)
+        
+        if await http_request.is_disconnected():
+            return
+        
+        # Save messages to history once the full answer exists
+        await run_in_threadpool(
+            chat_history_service.add_messages, session_id, current_question, answer
+        )
+        yield sse_event("done", {"session_id": session_id, **stats})
+    
+    return StreamingResponse(event_stream(), media_type="text/event-stream", headers=SSE_HEADERS)
+
+@router.get("/search")
+async def search_library(
+    q: str,
+    limit: int = 20,
+    user: dict = Depends(get_current_user),
+    chunking_service: ChunkingService = Depends(get_chunking_service)
+):
+    """
+    Search every page of all the user's documents in one indexed query
+    """
+    try:
+        keywords = chunking_service.extract_keywords(q)
+        pages = db.search_pages(user.id, keywords, limit=min(limit, 100))
+        
+        results = [
+            {
+                "job_id": page["job_id"],
+                "pdf_filename": page["pdf_filename"],
+                "page_num": page["page_num"],
+                "title": page["title"],
+                "snippet": page["snippet"],
+                "score": -page["rank"]
+            }
+            for page in pages
+        ]
+        return {"results": results}
+    except Exception as e:
+        logger.error(f"Error searching library: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/library/chat")
+async def chat_with_library(
+    request: LibraryChatRequest,
+    http_request: Request,
+    user: dict = Depends(get_current_user),
+    ai_service: LLMRouter = Depends(get_ai_service),
+    chunking_service: ChunkingService = Depends(get_chunking_service)
+):
+    """
+    Chat across all of the user's documents at once
+    
+    Pages are retrieved from the full-text index instead of re-extracting
+    each PDF. Library conversations are not saved to chat history, since
+    sessions belong to a single job.
+    """
+    try:
+        current_question = request.messages[-1]['content'] if request.messages else ""
+        keywords = chunking_service.extract_keywords(current_question)
+        pages = db.search_pages(user.id, keywords, limit=min(request.max_pages, 20))
+        
+        if not pages:
+            raise HTTPException(status_code=404, detail="No matching pages found in your documents")
+        
+        # Each page is cut to its most relevant part, so every retrieved page
+        # gets a share of the context rather than the first few whole pages
+        context, included = chunking_service.build_excerpt_context([
+            (f"[{page['pdf_filename']}, page {page['page_num']}]", page['original_text'])
+            for page in pages
+        ], current_question)
+        
+        logger.info(f"Using {len(included)} of {len(pages)} retrieved library pages for context")
+        # Only pages the model actually saw are cited
+        pages = [pages[i] for i in included]
+        
+        messages = await cancel_on_disconnect(
+            http_request, history_manager.prepare(request.messages, ai_service.complete, f"library:{user.id}")
+        )
+        response = await cancel_on_disconnect(http_request, ai_service.chat_with_pdf(context, messages))
+        
+        sources = [
+            {"job_id": page["job_id"], "pdf_filename": page["pdf_filename"], "page_num": page["page_num"]}
+            for page in pages
+        ]
+        return {"response": response, "sources": sources}
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error in library chat endpoint: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+def validate_summary_length(length: str):
+    """Reject unknown summary lengths"""
+    valid_lengths = ['brief', 'standard', 'detailed']
+    if length not in valid_lengths:
+        raise HTTPException(
+            status_code=400, 
+            detail=f"Invalid length. Must be one of: {', '.join(valid_lengths)}"
+        )
+
+def save_summary(
+    summary_history_service: SummaryHistoryService,
+    request: SummaryRequest,
+    summary: str,
+    pdf_filename: str
+):
+    """Save a summary to history without failing the request"""
+    try:
+        summary_history_service.create_summary(
+            job_id=request.job_id,
+            length=request.length,
+            summary_text=summary,
+            pdf_filename=pdf_filename
+        )
+        logger.info(f"Saved summary for job {request.job_id}")
+    except Exception as save_err:
+        logger.error(f"Failed to save summary: {save_err}")
+        # Don't fail the request if saving fails, just log it
+
+async def get_document_hash(request: SummaryRequest, storage_service: StorageService) -> Tuple[str, str]:
+    """
+    Hash a job's PDF bytes, so cache lookups need no text extraction
+    
+    Hashing runs off the event loop and is only done once per file.
+    
+    Returns:
+        Tuple of (document_hash, pdf_filename)
+    """
+    pdf_file = find_pdf(request.job_id, storage_service)
+    return await run_in_threadpool(file_hash, str(pdf_file)), pdf_file.name
+
+def get_cached_summary(ai_service: LLMRouter, document_hash: str, length: str) -> Optional[str]:
+    """A cached summary of the document at this length from any provider"""
+    for key in ai_service.summary_cache_keys(document_hash, length):
+        summary = summary_cache.get(key)
+        if summary is not None:
+            return summary
+    return None
+
+def cache_summary(ai_service: LLMRouter, document_hash: str, length: str, summary: str, stats: Dict):
+    """Cache a summary under the key of the provider that generated it"""
+    if summary:
+        summary_cache.set(ai_service.summary_cache_key(document_hash, length, stats.get("provider")), summary)
+
+async def get_detailed_summary(
+    request: SummaryRequest,
+    document_hash: str,
+    storage_service: StorageService,
+    pdf_service: PDFService,
+    ai_service: LLMRouter,
+    precompute_service: SummaryPrecomputeService
+) -> Optional[str]:
+    """
+    Detailed summary a shorter requested length can be derived from
+    
+    Uses the cached or in-flight precomputed detailed summary when there is
+    one. In hierarchical mode it is generated and cached first, so every
+    other length is derived cheaply instead of re-reading the document.
+    """
+    if request.length == "detailed":
+        return None
+    
+    detailed_key = ai_service.summary_cache_key(document_hash, "detailed")
+    detailed_summary = get_cached_summary(ai_service, document_hash, "detailed")
+    if detailed_summary is None:
+        detailed_summary = await precompute_service.attach(detailed_key)
+    
+    if detailed_summary is None and ai_service.hierarchical_summaries:
+        async def generate():
+            full_text, _ = await load_pdf_text(request.job_id, storage_service, pdf_service)
+            stats = {}
+            summary = await ai_service.summarize_pdf(full_text, length="detailed", stats=stats)
+            cache_summary(ai_service, document_hash, "detailed", summary, stats)
+            return summary
+        
+        detailed_summary = await summary_flights.do(detailed_key, generate)
+    
+    return detailed_summary or None
+
+async def generate_summary(
+    request: SummaryRequest,
+    document_hash: str,
+    storage_service: StorageService,
+    pdf_service: PDFService,
+    ai_service: LLMRouter,
+    precompute_service: SummaryPrecomputeService
+) -> str:
+    """Generate and cache a summary missing from the cache"""
+    detailed_summary = await get_detailed_summary(
+        request, document_hash, storage_service, pdf_service, ai_service, precompute_service
+    )
+    stats = {}
+    if detailed_summary:
+        summary = await ai_service.derive_summary(detailed_summary, length=request.length, stats=stats)
+    else:
+        full_text, _ = await load_pdf_text(request.job_id, storage_service, pdf_service)
+        
+        # Get summary from AI service with specified length
+        summary = await ai_service.summarize_pdf(full_text, length=request.length, stats=stats)
+    
+    cache_summary(ai_service, document_hash, request.length, summary, stats)
+    return summary
+
 @router.post("/summary")
 async def summarize_pdf(
     request: SummaryRequest,
+    http_request: Request,
+    background_tasks: BackgroundTasks,
     storage_service: StorageService = Depends(get_storage_service),
     pdf_service: PDFService = Depends(get_pdf_service),
-    ai_service: GroqService = Depends(get_ai_service),
+    ai_service: LLMRouter = Depends(get_ai_service),
+    precompute_service: SummaryPrecomputeService = Depends(get_summary_precompute_service),
     summary_history_service: SummaryHistoryService = Depends(get_summary_history_service)
 ):
     """
     Summarize a PDF document with specified length
+    
+    Summaries are cached by PDF content, length and model, so repeat requests
+    skip both extraction and the LLM call. A speculative summary still being
+    precomputed or requested by someone else is awaited rather than
+    duplicated. Shorter lengths are derived from a detailed summary when one
+    is available. A client that disconnects stops waiting, which cancels
+    generation unless someone else is still waiting on it.
     """
     try:
-        # Validate length parameter
-        valid_lengths = ['brief', 'standard', 'detailed']
-        if request.length not in valid_lengths:
-            raise HTTPException(
-                status_code=400, 
-                detail=f"Invalid length. Must be one of: {', '.join(valid_lengths)}"
-            )
-        
-        # Get PDF content
-        upload_dir = storage_service.get_job_dir(request.job_id, "upload")
-        pdf_files = list(upload_dir.glob("*.pdf"))
-        
-        if not pdf_files:
-            raise HTTPException(status_code=404, detail="PDF file not found")
-            
-        pdf_path = str(pdf_files[0])
-        extraction_result = pdf_service.extract_content(pdf_path, request.job_id)
+        validate_summary_length(request.length)
+        document_hash, pdf_filename = await get_document_hash(request, storage_service)
+        cache_key = ai_service.summary_cache_key(document_hash, request.length)
         
-        # Combine text from all pages
-        full_text = "\n".join([page.text for page in extraction_result.pages if page.text])
+        summary = get_cached_summary(ai_service, document_hash, request.length)
+        if summary is None:
+            summary = await cancel_on_disconnect(http_request, precompute_service.attach(cache_key))
+        if summary is not None:
+            logger.info(f"Summary cache hit for job {request.job_id}")
+            # Still record the summary in this user's history, after responding
+            background_tasks.add_task(save_summary, summary_history_service, request, summary, pdf_filename)
+            return {"summary": summary, "cached": True}
         
-        if not full_text.strip():
-            raise HTTPException(status_code=400, detail="Could not extract text from PDF")
-            
-        # Get summary from AI service with specified length
-        summary = await ai_service.summarize_pdf(full_text, length=request.length)
+        summary = await cancel_on_disconnect(http_request, summary_flights.do(cache_key, lambda: generate_summary(
+            request, document_hash, storage_service, pdf_service, ai_service, precompute_service
+        )))
+        
+        if await http_request.is_disconnected():
+            raise ClientDisconnected()
         
         # Save summary to history
-        try:
-            pdf_filename = pdf_files[0].name
-            saved_summary = summary_history_service.create_summary(
-                job_id=request.job_id,
-                length=request.length,
-                summary_text=summary,
-                pdf_filename=pdf_filename
-            )
-            logger.info(f"Saved summary for job {request.job_id}")
-        except Exception as save_err:
-            logger.error(f"Failed to save summary: {save_err}")
-            # Don't fail the request if saving fails, just log it
-        
-        return {"summary": summary}
+        save_summary(summary_history_service, request, summary, pdf_filename)
+        
+        return {"summary": summary, "cached": False}
         
     except HTTPException:
         raise
@@ -181,6 +633,127 @@ async def summarize_pdf(
         logger.error(f"Error in summary endpoint: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.post("/summary/stream")
+async def stream_summarize_pdf(
+    request: SummaryRequest,
+    http_request: Request,
+    storage_service: StorageService = Depends(get_storage_service),
+    pdf_service: PDFService = Depends(get_pdf_service),
+    ai_service: LLMRouter = Depends(get_ai_service),
+    precompute_service: SummaryPrecomputeService = Depends(get_summary_precompute_service),
+    summary_history_service: SummaryHistoryService = Depends(get_summary_history_service)
+):
+    """
+    Summarize a PDF document, streaming the summary as server-sent events
+    
+    Emits `delta` events with summary text as it is generated, then a `done`
+    event with reasoning token usage once the summary is saved, or an `error`
+    event if generation fails. A cached summary arrives as a single `delta`.
+    Concurrent requests for the same summary share one generation, each
+    receiving every delta. Generation stops once every client following it
+    has disconnected, and nothing is saved for a client that left.
+    """
+    try:
+        validate_summary_length(request.length)
+        document_hash, pdf_filename = await get_document_hash(request, storage_service)
+        cache_key = ai_service.summary_cache_key(document_hash, request.length)
+        
+        cached_summary = get_cached_summary(ai_service, document_hash, request.length)
+        if cached_summary is None:
+            cached_summary = await cancel_on_disconnect(http_request, precompute_service.attach(cache_key))
+        
+        # A summary someone else is generating is followed rather than duplicated,
+        # so its source is only needed when starting a new generation
+        detailed_summary = full_text = None
+        if cached_summary is None and not summary_flights.in_flight(cache_key):
+            detailed_summary = await cancel_on_disconnect(http_request, get_detailed_summary(
+                request, document_hash, storage_service, pdf_service, ai_service, precompute_service
+            ))
+            if detailed_summary is None:
+                full_text, pdf_filename = await load_pdf_text(request.job_id, storage_service, pdf_service)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error in summary stream endpoint: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+    
+    async def event_stream():
+        if cached_summary is not None:
+            logger.info(f"Summary cache hit for job {request.job_id}")
+            yield sse_event("delta", {"text": cached_summary})
+            await run_in_threadpool(save_summary, summary_history_service, request, cached_summary, pdf_filename)
+            yield sse_event("done", {"cached": True})
+            return
+        
+        parts = []
+        stats = {"cached": False}
+        
+        async def generate():
+            # Runs once for every request following it, so the summary is
+            # cached even if the request that started it has gone
+            if detailed_summary is not None:
+                deltas = ai_service.stream_derive_summary(detailed_summary, length=request.length, stats=stats)
+            elif full_text is not None:
+                deltas = ai_service.stream_summarize_pdf(full_text, length=request.length, stats=stats)
+            else:
+                # The generation this request meant to follow finished in the meantime
+                yield get_cached_summary(ai_service, document_hash, request.length) or await generate_summary(
+                    request, document_hash, storage_service, pdf_service, ai_service, precompute_service
+                )
+                return
+            
+            generated = []
+            try:
+                async for delta in deltas:
+                    generated.append(delta)
+                    yield delta
+            finally:
+                await deltas.aclose()
+            cache_summary(ai_service, document_hash, request.length, "".join(generated).strip(), stats)
+        
+        try:
+            async for delta in stream_until_disconnect(http_request, summary_flights.stream(cache_key, generate)):
+                parts.append(delta)
+                yield sse_event("delta", {"text": delta})
+        except ClientDisconnected:
+            return
+        except Exception as e:
+            logger.error(f"Error streaming summary: {e}")
+            yield sse_event("error", {"detail": str(e)})
+            return
+        
+        # Save the summary once it is complete
+        summary = "".join(parts).strip()
+        if await http_request.is_disconnected():
+            return
+        await run_in_threadpool(save_summary, summary_history_service, request, summary, pdf_filename)
+        yield sse_event("done", stats)
+    
+    return StreamingResponse(event_stream(), media_type="text/event-stream", headers=SSE_HEADERS)
+
+@router.get("/providers/stats")
+async def get_provider_stats(ai_service: LLMRouter = Depends(get_ai_service)):
+    """
+    Latency and error rate the router has observed per provider and operation,
+    plus each provider's current concurrency limit and queue
+    """
+    return {"providers": ai_service.stats(), "governors": governor_stats()}
+
+@router.delete("/summary/precompute/{job_id}")
+async def cancel_summary_precompute(
+    job_id: str,
+    user: dict = Depends(get_current_user),
+    precompute_service: SummaryPrecomputeService = Depends(get_summary_precompute_service)
+):
+    """
+    Cancel a speculative background summary for a job
+    """
+    video = db.get_video_by_job_id(job_id)
+    if not video or video.get('user_id') != user.id:
+        raise HTTPException(status_code=404, detail="Job not found")
+    
+    return {"cancelled": precompute_service.cancel(job_id)}
+
 @router.get("/sessions")
 async def get_all_sessions(
     chat_history_service: ChatHistoryService = Depends(get_chat_history_service)
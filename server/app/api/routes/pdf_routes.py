@@ -5,12 +5,15 @@ import os
 import uuid
 import logging
 from fastapi import APIRouter, UploadFile, File, HTTPException, Depends, Header
+from fastapi.concurrency import run_in_threadpool
 from fastapi.responses import JSONResponse
 from app.models.pdf_models import PDFUploadRequest, PDFExtractionResponse, ConversionRequest
 from app.services.pdf_service import PDFService
 from app.services.storage_service import StorageService
 from app.services.database_service import Database
-from app.api.dependencies import get_pdf_service, get_storage_service
+from app.services.precompute_service import SummaryPrecomputeService
+from app.utils.hashing import file_hash
+from app.api.dependencies import get_pdf_service, get_storage_service, get_summary_precompute_service
 
 logger = logging.getLogger(__name__)
 
@@ -93,6 +96,9 @@ async def upload_pdf(
         if not is_valid:
             raise HTTPException(status_code=400, detail=error_msg)
         
+        # Hash once now, so summary and chat cache lookups only stat the file
+        await run_in_threadpool(file_hash, pdf_path)
+        
         # Get page count for database
         import fitz
         doc = fitz.open(pdf_path)
@@ -127,10 +133,14 @@ async def upload_pdf(
 async def extract_pdf_content(
     job_id: str,
     storage_service: StorageService = Depends(get_storage_service),
-    pdf_service: PDFService = Depends(get_pdf_service)
+    pdf_service: PDFService = Depends(get_pdf_service),
+    precompute_service: SummaryPrecomputeService = Depends(get_summary_precompute_service)
 ):
     """
     Extract content from uploaded PDF and save to database
+    
+    When SUMMARY_PRECOMPUTE is enabled, the default summary is also started
+    in the background so it is ready by the time the user asks for it.
     """
     try:
         # Find PDF file in upload directory
@@ -162,6 +172,7 @@ async def extract_pdf_content(
             else:
                 pages = getattr(extraction_result, 'pages', [])
             
+            page_texts = []
             for page_data in pages:
                 # Handle both Pydantic model and dict for page_data
                 if isinstance(page_data, dict):
@@ -174,6 +185,9 @@ async def extract_pdf_content(
                     p_text = getattr(page_data, 'text', None)
                     p_title = getattr(page_data, 'title', None)
                     p_images = getattr(page_data, 'images', [])
+                
+                if p_text:
+                    page_texts.append(p_text)
 
                 page_id = db.create_page(
                     video_id=video['id'],
@@ -200,6 +214,12 @@ async def extract_pdf_content(
         
         logger.info(f"Saved {len(pages)} pages to database for job {job_id}")
         
+        try:
+            await precompute_service.schedule(job_id, video.get('user_id'), pdf_path, "\n".join(page_texts))
+        except Exception as e:
+            # Speculative work must never fail extraction
+            logger.warning(f"Could not schedule summary precompute: {e}")
+        
         return extraction_result
     
     except HTTPException:
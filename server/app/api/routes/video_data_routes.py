@@ -2,6 +2,7 @@
 API endpoint for generating scripts, fetching images, and preparing video data
 """
 import os
+import shutil
 from fastapi import APIRouter, HTTPException
 from app.services.database_service import Database
 from app.services.groq_script_service import GroqScriptService
@@ -44,14 +45,27 @@ async def generate_scripts_and_assets(job_id: str):
         
         # 2. Generate Groq teacher scripts for each page
         logger.info(f"Generating teacher scripts for {len(pages)} pages")
+        
+        # Pages whose content is unchanged from an earlier upload reuse its work
+        reused_pages = {}
+        pending_pages = []
+        
         for page in pages:
-            # Generate script
-            teacher_script = groq_service.generate_teacher_script(
-                page_title=page.get('title', ''),
-                page_text=page['original_text'],
-                page_num=page['page_num']
-            )
-            
+            reused = db.find_reusable_page(page.get('content_hash'), page['id'])
+            if reused:
+                reused_pages[page['id']] = reused
+                db.update_page_script(page['id'], reused['teacher_script'])
+                logger.info(f"Reused script for unchanged page {page['page_num']}")
+                continue
+            pending_pages.append(page)
+        
+        # Generate the remaining scripts concurrently, within provider rate limits
+        teacher_scripts = await groq_service.generate_teacher_scripts([
+            {'title': page.get('title', ''), 'text': page['original_text'], 'page_num': page['page_num']}
+            for page in pending_pages
+        ])
+        
+        for page, teacher_script in zip(pending_pages, teacher_scripts):
             # Force Sync: Ensure script starts with title for audio/caption consistency
             page_title = page.get('title', '').strip()
             if page_title and not teacher_script.strip().lower().startswith(page_title.lower()):
@@ -71,6 +85,19 @@ async def generate_scripts_and_assets(job_id: str):
         for page in pages:
             image_found = False
             
+            # Reuse the image chosen for the same content in an earlier upload
+            reused = reused_pages.get(page['id'])
+            if reused and reused.get('unsplash_image_path') and os.path.exists(reused['unsplash_image_path']):
+                image_path = str(unsplash_dir / f"page_{page['page_num']}.jpg")
+                shutil.copy2(reused['unsplash_image_path'], image_path)
+                db.update_page_unsplash(
+                    page['id'],
+                    image_url=reused.get('unsplash_image_url') or "",
+                    image_path=image_path
+                )
+                logger.info(f"Reused background image for unchanged page {page['page_num']}")
+                continue
+            
             # Strategy A: Try Unsplash
             if page.get('title'):
                 try:
@@ -141,6 +168,22 @@ async def generate_scripts_and_assets(job_id: str):
         pages = db.get_pages_by_job_id(job_id)
         
         for page in pages:
+            # Reuse narration recorded for the identical script in an earlier upload
+            reused = reused_pages.get(page['id'])
+            if (
+                reused
+                and reused.get('audio_path')
+                and reused['teacher_script'] == page.get('teacher_script')
+                and os.path.exists(reused['audio_path'])
+            ):
+                temp_dir = storage_service.get_job_dir(job_id, "temp")
+                temp_dir.mkdir(parents=True, exist_ok=True)
+                audio_path = str(temp_dir / f"page_{page['page_num']}_audio.mp3")
+                shutil.copy2(reused['audio_path'], audio_path)
+                db.update_page_audio(page['id'], audio_path, reused['duration'])
+                logger.info(f"Reused audio for unchanged page {page['page_num']}")
+                continue
+            
             if page.get('teacher_script'):
                 # Generate audio
                 audio_path, duration = tts_service.generate_audio(
@@ -172,6 +215,14 @@ async def generate_scripts_and_assets(job_id: str):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.get("/script-cache/stats")
+async def get_script_cache_stats():
+    """
+    Size and hit rate of the teacher script cache
+    """
+    return groq_service.cache.stats()
+
+
 @router.get("/data/{job_id}")
 async def get_video_data(job_id: str):
     """
@@ -0,0 +1,87 @@
+"""
+Process-wide LLM API clients with pooled HTTP connections
+"""
+import asyncio
+import os
+import threading
+from typing import Optional, Tuple
+from groq import AsyncGroq, DefaultAsyncHttpxClient, DefaultHttpxClient, Groq
+import httpx
+from app.core.llm_governor import notify_rate_limited, parse_retry_after
+
+_lock = threading.Lock()
+_groq_client: Optional[Groq] = None
+# Async HTTP connections belong to the event loop that opened them
+_async_groq_client: Optional[Tuple[asyncio.AbstractEventLoop, AsyncGroq]] = None
+
+
+def _groq_options() -> dict:
+    """Shared Groq client settings from the environment"""
+    options = {
+        "timeout": float(os.getenv("GROQ_TIMEOUT", 60)),
+        "max_retries": int(os.getenv("GROQ_MAX_RETRIES", 2)),
+    }
+    api_key = os.getenv("GROQ_API_KEY")
+    if api_key:
+        options["api_key"] = api_key
+    # e.g. the local stub in benchmarks/llm_stub_server.py for load tests
+    base_url = os.getenv("GROQ_BASE_URL")
+    if base_url:
+        options["base_url"] = base_url
+    return options
+
+
+def _pool_limits() -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=int(os.getenv("GROQ_MAX_CONNECTIONS", 100)),
+        max_keepalive_connections=int(os.getenv("GROQ_MAX_KEEPALIVE_CONNECTIONS", 20)),
+    )
+
+
+def _on_response(response: httpx.Response):
+    # Sees every 429, including those the SDK retries on its own
+    if response.status_code == 429:
+        notify_rate_limited("groq", parse_retry_after(response.headers.get("retry-after")))
+
+
+async def _on_async_response(response: httpx.Response):
+    _on_response(response)
+
+
+def get_async_groq_client() -> AsyncGroq:
+    """
+    Get the async Groq client shared by every request in this process
+
+    A new client is only created when called from a different event loop
+    (e.g. a background thread running its own loop).
+    """
+    global _async_groq_client
+    loop = asyncio.get_running_loop()
+
+    with _lock:
+        if _async_groq_client is None or _async_groq_client[0] is not loop:
+            client = AsyncGroq(
+                http_client=DefaultAsyncHttpxClient(
+                    limits=_pool_limits(),
+                    event_hooks={"response": [_on_async_response]}
+                ),
+                **_groq_options()
+            )
+            _async_groq_client = (loop, client)
+        return _async_groq_client[1]
+
+
+def get_groq_client() -> Groq:
+    """Get the synchronous Groq client shared by every thread in this process"""
+    global _groq_client
+
+    with _lock:
+        if _groq_client is None:
+            _groq_client = Groq(
+                http_client=DefaultHttpxClient(
+                    limits=_pool_limits(),
+                    event_hooks={"response": [_on_response]}
+                ),
+                **_groq_options()
+            )
+        return _groq_client
@@ -0,0 +1,242 @@
+"""
+Process-wide adaptive concurrency governor for outbound LLM calls
+"""
+import asyncio
+import math
+import os
+import threading
+import time
+import logging
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from typing import AsyncIterator, Dict, Iterator, Optional, Tuple
+from fastapi import HTTPException
+
+logger = logging.getLogger(__name__)
+
+# How often a waiting background call checks for a slot no one else wants
+BACKGROUND_POLL_SECONDS = 0.5
+
+
+class Overloaded(HTTPException):
+    """Raised instead of queueing a call that could not start in time; maps to 503"""
+
+    def __init__(self, provider: str, retry_after: float):
+        super().__init__(
+            status_code=503,
+            detail=f"{provider} is overloaded, please retry shortly",
+            headers={"Retry-After": str(max(1, math.ceil(retry_after)))}
+        )
+
+
+class BackgroundWork:
+    """Marks the LLM calls made under `background()` as low priority"""
+
+    def __init__(self):
+        self.active = True
+
+    def promote(self):
+        """Give the remaining calls normal priority, e.g. once a user waits on the result"""
+        self.active = False
+
+
+_background: ContextVar[Optional[BackgroundWork]] = ContextVar("llm_background", default=None)
+
+
+@contextmanager
+def background() -> Iterator[BackgroundWork]:
+    """
+    Run the LLM calls made inside, including those of tasks started inside, at low priority
+
+    Low-priority calls only take a slot that no normal caller is waiting
+    for, wait up to LLM_BACKGROUND_QUEUE_TIMEOUT and never count towards
+    LLM_QUEUE_MAX, so speculative work uses spare capacity without delaying
+    or shedding interactive requests.
+    """
+    work = BackgroundWork()
+    token = _background.set(work)
+    try:
+        yield work
+    finally:
+        _background.reset(token)
+
+
+class LLMGovernor:
+    """
+    AIMD concurrency limit for one provider
+
+    Every successful call raises the limit by 1/limit (about one per round
+    trip of calls), and a rate limit response halves it and pauses new
+    calls for the provider's retry-after. Calls beyond the limit wait in a
+    bounded queue with a deadline; a full queue or an expired deadline
+    raises Overloaded immediately rather than piling onto the provider.
+    Calls made under `background()` wait behind every other caller.
+    """
+
+    def __init__(self, provider: str):
+        self.provider = provider
+        self.min_limit = 1.0
+        self.max_limit = float(os.getenv("LLM_CONCURRENCY_MAX", 64))
+        self.limit = min(self.max_limit, float(os.getenv("LLM_CONCURRENCY_INITIAL", 8)))
+        self.max_queue = int(os.getenv("LLM_QUEUE_MAX", 100))
+        self.queue_timeout = float(os.getenv("LLM_QUEUE_TIMEOUT", 15))
+        self.background_queue_timeout = float(os.getenv("LLM_BACKGROUND_QUEUE_TIMEOUT", 300))
+        self.in_flight = 0
+        self.waiting = 0
+        self.background_waiting = 0
+        self.blocked_until = 0.0
+        self.last_decrease = 0.0
+        self.rate_limited = 0
+        self.rejected = 0
+        self._condition = asyncio.Condition()
+
+    @asynccontextmanager
+    async def slot(self, queue_timeout: Optional[float] = None) -> AsyncIterator[None]:
+        """
+        Hold one concurrency slot for the duration of an LLM call or stream
+
+        Args:
+            queue_timeout: Longest wait for a slot, defaulting to LLM_QUEUE_TIMEOUT;
+                background work that no one is waiting on can afford more
+        """
+        await self.acquire(queue_timeout)
+        ok = False
+        try:
+            yield
+            ok = True
+        except Exception as e:
+            retry_after = rate_limit_retry_after(e)
+            if retry_after is not None:
+                self.on_rate_limited(retry_after)
+            raise
+        finally:
+            await self.release(ok)
+
+    async def acquire(self, queue_timeout: Optional[float] = None):
+        work = _background.get()
+        if work is None and self.waiting - self.background_waiting >= self.max_queue:
+            self.rejected += 1
+            raise Overloaded(self.provider, self._expected_wait())
+
+        if queue_timeout is None:
+            queue_timeout = self.queue_timeout if work is None else self.background_queue_timeout
+        deadline = time.monotonic() + queue_timeout
+        self.waiting += 1
+        if work is not None:
+            self.background_waiting += 1
+        try:
+            async with self._condition:
+                while not self._can_start(work):
+                    now = time.monotonic()
+                    if now >= deadline:
+                        self.rejected += 1
+                        raise Overloaded(self.provider, self._expected_wait())
+
+                    timeout = deadline - now
+                    if self.blocked_until > now:
+                        timeout = min(timeout, self.blocked_until - now)
+                    if work is not None:
+                        # Normal callers leave the queue without notifying, so
+                        # background callers check back for a free slot
+                        timeout = min(timeout, BACKGROUND_POLL_SECONDS)
+                    try:
+                        await asyncio.wait_for(self._condition.wait(), timeout)
+                    except asyncio.TimeoutError:
+                        pass
+
+                self.in_flight += 1
+        finally:
+            self.waiting -= 1
+            if work is not None:
+                self.background_waiting -= 1
+
+    async def release(self, ok: bool):
+        async with self._condition:
+            self.in_flight -= 1
+            if ok:
+                self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+            self._condition.notify_all()
+
+    def on_rate_limited(self, retry_after: float):
+        """Multiplicative decrease, at most once per second of 429s"""
+        now = time.monotonic()
+        self.rate_limited += 1
+        self.blocked_until = max(self.blocked_until, now + retry_after)
+
+        if now - self.last_decrease >= 1.0:
+            self.limit = max(self.min_limit, self.limit / 2)
+            self.last_decrease = now
+            logger.warning(
+                f"{self.provider} rate limited; concurrency limit now {self.limit:.1f}, "
+                f"pausing {retry_after:.1f}s"
+            )
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "limit": round(self.limit, 2),
+            "in_flight": self.in_flight,
+            "waiting": self.waiting,
+            "background_waiting": self.background_waiting,
+            "rate_limited": self.rate_limited,
+            "rejected": self.rejected
+        }
+
+    def _can_start(self, work: Optional[BackgroundWork] = None) -> bool:
+        if self.in_flight >= int(self.limit) or time.monotonic() < self.blocked_until:
+            return False
+        # Background calls only take slots no normal caller is waiting for
+        return work is None or not work.active or self.waiting == self.background_waiting
+
+    def _expected_wait(self) -> float:
+        return max(self.blocked_until - time.monotonic(), 1.0)
+
+
+def rate_limit_retry_after(error: BaseException) -> Optional[float]:
+    """
+    Seconds to back off if an exception is a provider rate limit, else None
+    """
+    status = getattr(error, "status_code", None) or getattr(error, "code", None)
+    if status != 429 and type(error).__name__ not in ("RateLimitError", "ResourceExhausted"):
+        return None
+
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    return parse_retry_after(headers.get("retry-after"))
+
+
+def parse_retry_after(value: Optional[str], default: float = 1.0) -> float:
+    try:
+        return max(0.0, float(value))
+    except (TypeError, ValueError):
+        return default
+
+
+_lock = threading.Lock()
+# Asyncio primitives belong to the event loop that created them
+_governors: Dict[Tuple[str, int], Tuple[asyncio.AbstractEventLoop, LLMGovernor]] = {}
+
+
+def get_governor(provider: str) -> LLMGovernor:
+    """Get the governor for a provider on the running event loop"""
+    loop = asyncio.get_running_loop()
+    key = (provider, id(loop))
+
+    with _lock:
+        entry = _governors.get(key)
+        if entry is None or entry[0] is not loop:
+            entry = (loop, LLMGovernor(provider))
+            _governors[key] = entry
+        return entry[1]
+
+
+def notify_rate_limited(provider: str, retry_after: float):
+    """Report a 429 seen outside a governed call, e.g. one the SDK retried"""
+    with _lock:
+        governors = [governor for (name, _), (_, governor) in _governors.items() if name == provider]
+    for governor in governors:
+        governor.on_rate_limited(retry_after)
+
+
+def governor_stats() -> Dict[str, Dict[str, float]]:
+    with _lock:
+        return {name: governor.stats() for (name, _), (_, governor) in _governors.items()}
@@ -54,6 +54,13 @@ os.makedirs("storage", exist_ok=True)
 app.mount("/static", StaticFiles(directory="storage"), name="static")
 
 
+@app.on_event("shutdown")
+async def cancel_background_work():
+    """Stop speculative work so shutdown does not wait on LLM calls"""
+    from app.api.dependencies import get_summary_precompute_service
+    get_summary_precompute_service().cancel_all()
+
+
 @app.get("/")
 async def root():
     """Root endpoint"""
@@ -0,0 +1,248 @@
+"""
+Caching service: in-memory LRU layered in front of a durable SQLite store
+"""
+import os
+import sqlite3
+import threading
+import time
+import logging
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class LRUCache:
+    """Thread-safe in-memory LRU cache with optional expiry"""
+
+    def __init__(self, max_entries: int = 1024, ttl_seconds: Optional[float] = None):
+        """
+        Args:
+            max_entries: Entries kept before the least recently used is evicted
+            ttl_seconds: Lifetime of an entry, or None to keep until evicted
+        """
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            value, expires_at = entry
+            if expires_at is not None and expires_at < time.monotonic():
+                del self._entries[key]
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: str, value: Any):
+        expires_at = time.monotonic() + self.ttl_seconds if self.ttl_seconds else None
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key: str):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0
+            }
+
+
+class PersistentCache:
+    """SQLite-backed text cache with least-recently-used eviction"""
+
+    def __init__(self, namespace: str, db_path: str = "data/cache.db", max_entries: int = 10000):
+        """
+        Args:
+            namespace: Keeps different kinds of entries apart in one database
+            db_path: SQLite file holding every namespace
+            max_entries: Entries kept in this namespace before eviction
+        """
+        self.namespace = namespace
+        self.db_path = db_path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+        self.init_database()
+
+    def get_connection(self):
+        """Get database connection"""
+        return sqlite3.connect(self.db_path, timeout=30)
+
+    def init_database(self):
+        """Initialize cache schema"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS cache_entries (
+                namespace TEXT NOT NULL,
+                key TEXT NOT NULL,
+                value TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                accessed_at REAL NOT NULL,
+                PRIMARY KEY (namespace, key)
+            )
+        """)
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_cache_entries_accessed
+            ON cache_entries(namespace, accessed_at)
+        """)
+
+        conn.commit()
+        conn.close()
+
+    def get(self, key: str) -> Optional[str]:
+        conn = self.get_connection()
+        cursor = conn.cursor()
+
+        cursor.execute(
+            "SELECT value FROM cache_entries WHERE namespace = ? AND key = ?",
+            (self.namespace, key)
+        )
+        row = cursor.fetchone()
+
+        if row:
+            cursor.execute(
+                "UPDATE cache_entries SET accessed_at = ? WHERE namespace = ? AND key = ?",
+                (time.time(), self.namespace, key)
+            )
+            conn.commit()
+            self.hits += 1
+        else:
+            self.misses += 1
+
+        conn.close()
+        return row[0] if row else None
+
+    def set(self, key: str, value: str):
+        now = time.time()
+        conn = self.get_connection()
+        cursor = conn.cursor()
+
+        cursor.execute("""
+            INSERT OR REPLACE INTO cache_entries (namespace, key, value, created_at, accessed_at)
+            VALUES (?, ?, ?, ?, ?)
+        """, (self.namespace, key, value, now, now))
+
+        # Evict least recently used entries beyond the size bound
+        cursor.execute("""
+            DELETE FROM cache_entries
+            WHERE namespace = ? AND key IN (
+                SELECT key FROM cache_entries
+                WHERE namespace = ?
+                ORDER BY accessed_at DESC
+                LIMIT -1 OFFSET ?
+            )
+        """, (self.namespace, self.namespace, self.max_entries))
+
+        conn.commit()
+        conn.close()
+
+    def delete(self, key: str):
+        conn = self.get_connection()
+        conn.execute("DELETE FROM cache_entries WHERE namespace = ? AND key = ?", (self.namespace, key))
+        conn.commit()
+        conn.close()
+
+    def stats(self) -> Dict[str, Any]:
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        cursor.execute("SELECT COUNT(*) FROM cache_entries WHERE namespace = ?", (self.namespace,))
+        entries = cursor.fetchone()[0]
+        conn.close()
+
+        lookups = self.hits + self.misses
+        return {
+            "entries": entries,
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0
+        }
+
+
+class TieredCache:
+    """In-memory LRU in front of a persistent cache for the same namespace"""
+
+    def __init__(self, namespace: str, memory: LRUCache, persistent: PersistentCache):
+        self.namespace = namespace
+        self.memory = memory
+        self.persistent = persistent
+
+    def get(self, key: str) -> Optional[str]:
+        value = self.memory.get(key)
+        if value is not None:
+            return value
+
+        try:
+            value = self.persistent.get(key)
+        except sqlite3.Error as e:
+            logger.warning(f"Persistent cache read failed for {self.namespace}: {e}")
+            return None
+
+        if value is not None:
+            self.memory.set(key, value)
+        return value
+
+    def set(self, key: str, value: str):
+        self.memory.set(key, value)
+        try:
+            self.persistent.set(key, value)
+        except sqlite3.Error as e:
+            # A failed durable write only costs a future miss
+            logger.warning(f"Persistent cache write failed for {self.namespace}: {e}")
+
+    def delete(self, key: str):
+        self.memory.delete(key)
+        self.persistent.delete(key)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"memory": self.memory.stats(), "persistent": self.persistent.stats()}
+
+
+_caches: Dict[str, TieredCache] = {}
+_caches_lock = threading.Lock()
+
+
+def get_cache(namespace: str) -> TieredCache:
+    """
+    Get the process-wide tiered cache for a namespace
+
+    Sizes come from CACHE_MEMORY_ENTRIES and CACHE_MAX_ENTRIES, and the
+    durable store lives at CACHE_DB_PATH.
+    """
+    with _caches_lock:
+        if namespace not in _caches:
+            _caches[namespace] = TieredCache(
+                namespace,
+                LRUCache(max_entries=int(os.getenv("CACHE_MEMORY_ENTRIES", 512))),
+                PersistentCache(
+                    namespace,
+                    db_path=os.getenv("CACHE_DB_PATH", "data/cache.db"),
+                    max_entries=int(os.getenv("CACHE_MAX_ENTRIES", 10000))
+                )
+            )
+        return _caches[namespace]
@@ -236,6 +236,41 @@ class ChatHistoryService:
             logger.error(f"Error adding messages: {e}")
             return False
     
+    def get_history_summary(self, session_id: str) -> Optional[Dict]:
+        """
+        Get the rolling summary of a session's older messages
+        
+        Stored in the `history_summary` jsonb column of chat_sessions as
+        {"summary", "covered", "hash"}; see chat_sessions_history_summary.sql.
+        """
+        try:
+            response = self.client.table("chat_sessions")\
+                .select("history_summary")\
+                .eq("id", session_id)\
+                .execute()
+            
+            if not response.data:
+                return None
+            return response.data[0].get("history_summary")
+            
+        except Exception as e:
+            logger.warning(f"Could not load history summary for session {session_id}: {e}")
+            return None
+    
+    def save_history_summary(self, session_id: str, record: Dict) -> bool:
+        """
+        Save the rolling summary of a session's older messages
+        """
+        try:
+            self.client.table("chat_sessions").update({
+                "history_summary": record
+            }).eq("id", session_id).execute()
+            return True
+            
+        except Exception as e:
+            logger.warning(f"Could not save history summary for session {session_id}: {e}")
+            return False
+    
     def delete_session(self, session_id: str) -> bool:
         """
         Delete a session and its messages (Manual Cascade)
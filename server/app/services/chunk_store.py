@@ -0,0 +1,209 @@
+"""
+Offset-based chunk store backed by a single memory-mapped text file per job
+"""
+import bisect
+import json
+import logging
+import mmap
+import os
+from pathlib import Path
+from typing import List, Optional, Pattern, Tuple
+from app.services.chunking_service import ChunkingService, fold_case
+
+logger = logging.getLogger(__name__)
+
+
+class ChunkStore:
+    """
+    Read-only view over a document's chunks
+
+    The document text is written once as UTF-8 to ``text.bin`` and chunks are
+    kept as (start, end) byte offsets into it. Text is only decoded when a
+    chunk is actually needed for the final context, and the mapping is shared
+    through the page cache by every worker process reading the same job.
+    A lowercased copy with identical offsets (see fold_case) is kept next to
+    it so keyword matching never has to lowercase chunks per query.
+    """
+
+    # Bump whenever the files' contents change meaning so old stores are rebuilt
+    FORMAT_VERSION = 2
+
+    TEXT_FILE = "text.bin"
+    LOWER_FILE = "text.lower.bin"
+    META_FILE = "meta.json"
+
+    def __init__(self, directory: Path):
+        """
+        Open an existing chunk store
+
+        Args:
+            directory: Directory previously populated by ChunkStore.build
+        """
+        self.directory = Path(directory)
+
+        with open(self.directory / self.META_FILE, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+
+        self.chunk_size: int = meta["chunk_size"]
+        self.overlap: int = meta["overlap"]
+        self.boundaries: str = meta.get("boundaries", "fixed")
+        self.spans: List[Tuple[int, int]] = [tuple(span) for span in meta["spans"]]
+
+        self._files = []
+        self._buffer = self._map(self.directory / self.TEXT_FILE)
+        self._lower = self._map(self.directory / self.LOWER_FILE)
+
+    def _map(self, path: Path):
+        """Memory-map a file read-only"""
+        f = open(path, "rb")
+        self._files.append(f)
+        # mmap cannot map empty files; an empty document has nothing to slice anyway
+        if not os.fstat(f.fileno()).st_size:
+            return b""
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    @classmethod
+    def exists(cls, directory: Path, chunking_service: Optional[ChunkingService] = None) -> bool:
+        """
+        Check whether a complete store exists, optionally for matching chunk settings
+        """
+        meta_path = Path(directory) / cls.META_FILE
+        for name in (cls.TEXT_FILE, cls.LOWER_FILE, cls.META_FILE):
+            if not (Path(directory) / name).exists():
+                return False
+
+        try:
+            with open(meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Unreadable chunk store metadata in {directory}: {e}")
+            return False
+
+        if meta.get("version", 1) != cls.FORMAT_VERSION:
+            return False
+
+        if chunking_service is None:
+            return True
+
+        return (
+            meta.get("chunk_size") == chunking_service.chunk_size
+            and meta.get("overlap") == chunking_service.overlap
+            and meta.get("boundaries", "fixed") == chunking_service.boundaries
+        )
+
+    @classmethod
+    def build(cls, text: str, directory: Path, chunking_service: ChunkingService) -> "ChunkStore":
+        """
+        Chunk a document and persist it as a chunk store
+
+        Args:
+            text: Full document text
+            directory: Directory to write the store into
+            chunking_service: Service defining the chunk boundaries
+
+        Returns:
+            The opened chunk store
+        """
+        directory = Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+
+        char_spans = chunking_service.create_chunk_spans(text)
+        byte_spans = cls._to_byte_spans(text, char_spans)
+
+        # Write to temp files and rename so concurrent readers never see partial stores
+        data = text.encode("utf-8")
+        lower = fold_case(text).encode("utf-8")
+        for name, content in ((cls.TEXT_FILE, data), (cls.LOWER_FILE, lower)):
+            tmp_path = directory / f"{name}.{os.getpid()}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(content)
+            os.replace(tmp_path, directory / name)
+
+        meta_tmp = directory / f"{cls.META_FILE}.{os.getpid()}.tmp"
+        with open(meta_tmp, "w", encoding="utf-8") as f:
+            json.dump({
+                "version": cls.FORMAT_VERSION,
+                "chunk_size": chunking_service.chunk_size,
+                "overlap": chunking_service.overlap,
+                "boundaries": chunking_service.boundaries,
+                "spans": byte_spans
+            }, f)
+        os.replace(meta_tmp, directory / cls.META_FILE)
+
+        logger.info(f"Built chunk store with {len(byte_spans)} chunks in {directory}")
+        return cls(directory)
+
+    @staticmethod
+    def _to_byte_spans(text: str, char_spans: List[Tuple[int, int]]) -> List[Tuple[int, int]]:
+        """Convert character offsets into UTF-8 byte offsets in a single pass"""
+        offsets = sorted({offset for span in char_spans for offset in span})
+        byte_offsets = {}
+        char_pos = 0
+        byte_pos = 0
+
+        for offset in offsets:
+            byte_pos += len(text[char_pos:offset].encode("utf-8"))
+            char_pos = offset
+            byte_offsets[offset] = byte_pos
+
+        return [(byte_offsets[start], byte_offsets[end]) for start, end in char_spans]
+
+    def __len__(self) -> int:
+        return len(self.spans)
+
+    def keyword_counts(self, patterns: List[Pattern[bytes]]) -> List[List[int]]:
+        """
+        Count matches of lowercase byte patterns in every chunk
+
+        Each pattern is scanned once over the whole lowercased document and
+        match positions are bucketed into chunks by bisection, so overlapping
+        chunks cost nothing extra.
+
+        Args:
+            patterns: Compiled patterns of lowercase keyword bytes
+
+        Returns:
+            One count vector per chunk, in pattern order
+        """
+        vectors = [[0] * len(patterns) for _ in self.spans]
+
+        for column, pattern in enumerate(patterns):
+            positions = [match.start() for match in pattern.finditer(self._lower)]
+            if not positions:
+                continue
+
+            width = len(pattern.pattern)
+            for vector, (start, end) in zip(vectors, self.spans):
+                vector[column] = (
+                    bisect.bisect_right(positions, end - width)
+                    - bisect.bisect_left(positions, start)
+                )
+
+        return vectors
+
+    def contains(self, keyword: str) -> bool:
+        """Whether a keyword occurs anywhere in the document, case-insensitively"""
+        return self._lower.find(fold_case(keyword.lower()).encode("utf-8")) != -1
+
+    def text(self, index: int) -> str:
+        """Decode a single chunk"""
+        start, end = self.spans[index]
+        return self.slice(start, end)
+
+    def slice(self, start: int, end: int) -> str:
+        """Decode an arbitrary byte range of the document"""
+        return self._buffer[start:end].decode("utf-8", errors="ignore")
+
+    def close(self):
+        """Release the memory mapping"""
+        for buffer in (self._buffer, self._lower):
+            if isinstance(buffer, mmap.mmap):
+                buffer.close()
+        for f in self._files:
+            f.close()
+
+    def __enter__(self) -> "ChunkStore":
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
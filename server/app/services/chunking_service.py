@@ -2,25 +2,57 @@
 Text Chunking Service for handling large PDF documents
 """
 import logging
+import math
+import random
 import re
-from typing import List, Tuple
+from typing import Callable, List, Optional, Pattern, Tuple, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from app.services.chunk_store import ChunkStore
 
 logger = logging.getLogger(__name__)
 
+# Shortest excerpt worth giving the model when packing many sections
+MIN_EXCERPT_CHARS = 200
+
+# Fixed random table for the gear rolling hash; the seed must never change or
+# every stored chunk boundary and hash would shift
+_GEAR = tuple(map(random.Random(0x6765_6172).getrandbits, [32] * 256))
+
+
+def fold_case(text: str) -> str:
+    """
+    Lowercase text without changing its UTF-8 encoded length
+
+    Every character is lowercased as str.lower() would, except the few
+    whose lowercase form encodes to a different number of bytes (e.g. the
+    Kelvin sign), which are kept, so byte offsets into the folded text
+    match the original.
+    """
+    table = {}
+    for char in set(text):
+        lowered = char.lower()
+        if lowered != char and len(lowered.encode("utf-8")) == len(char.encode("utf-8")):
+            table[ord(char)] = lowered
+    return text.translate(table)
+
 
 class ChunkingService:
     """Service for chunking large text documents"""
     
-    def __init__(self, chunk_size: int = 2000, overlap: int = 200):
+    def __init__(self, chunk_size: int = 2000, overlap: int = 200, boundaries: str = "fixed"):
         """
         Initialize chunking service
         
         Args:
             chunk_size: Maximum characters per chunk
-            overlap: Character overlap between chunks
+            overlap: Character overlap between chunks (fixed boundaries only)
+            boundaries: 'fixed' for sliding windows or 'content' for
+                content-defined boundaries that survive edits elsewhere
         """
         self.chunk_size = chunk_size
         self.overlap = overlap
+        self.boundaries = boundaries
     
     def create_chunks(self, text: str) -> List[str]:
         """
@@ -32,10 +64,25 @@ class ChunkingService:
         Returns:
             List of text chunks
         """
+        return [text[start:end] for start, end in self.create_chunk_spans(text)]
+    
+    def create_chunk_spans(self, text: str) -> List[Tuple[int, int]]:
+        """
+        Split text into overlapping chunks, returning offsets instead of strings
+        
+        Args:
+            text: Full text to chunk
+            
+        Returns:
+            List of (start, end) character offsets into text
+        """
         if len(text) <= self.chunk_size:
-            return [text]
+            return [(0, len(text))]
+        
+        if self.boundaries == "content":
+            return self.create_content_defined_spans(text)
         
-        chunks = []
+        spans = []
         start = 0
         
         while start < len(text):
@@ -57,7 +104,10 @@ class ChunkingService:
                     chunk = chunk[:last_period + 1]
                     end = start + last_period + 1
             
-            chunks.append(chunk.strip())
+            # Trim surrounding whitespace without copying the chunk
+            span_start = start + len(chunk) - len(chunk.lstrip())
+            span_end = max(span_start, start + len(chunk.rstrip()))
+            spans.append((span_start, span_end))
             
             # Move to next chunk with overlap
             start = end - self.overlap
@@ -66,8 +116,61 @@ class ChunkingService:
             if start >= len(text):
                 break
         
-        logger.info(f"Created {len(chunks)} chunks from {len(text)} characters")
-        return chunks
+        logger.info(f"Created {len(spans)} chunks from {len(text)} characters")
+        return spans
+    
+    def create_content_defined_spans(self, text: str) -> List[Tuple[int, int]]:
+        """
+        Split text at content-defined boundaries
+        
+        A gear rolling hash over roughly the last 32 characters picks cut
+        points at whitespace, so boundaries depend only on nearby content.
+        Editing one paragraph moves at most the boundaries around it, and
+        every other chunk keeps its exact text and hash across re-uploads.
+        Chunks do not overlap; they fall between chunk_size / 4 and
+        chunk_size characters.
+        
+        Args:
+            text: Full text to chunk
+            
+        Returns:
+            List of (start, end) character offsets into text
+        """
+        min_size = max(1, self.chunk_size // 4)
+        # Aim for about half way between the minimum and maximum size,
+        # with roughly one whitespace cut candidate every 6 characters
+        mask_bits = max(1, int(math.log2(max(2, (self.chunk_size - min_size) / 2 / 6))))
+        shift = 32 - mask_bits
+        
+        spans = []
+        start = 0
+        rolling = 0
+        
+        for i, char in enumerate(text):
+            rolling = ((rolling << 1) + _GEAR[ord(char) & 0xFF]) & 0xFFFFFFFF
+            size = i + 1 - start
+            
+            if size < min_size:
+                continue
+            
+            if (char.isspace() and rolling >> shift == 0) or size >= self.chunk_size:
+                spans.append((start, i + 1))
+                start = i + 1
+        
+        if start < len(text):
+            spans.append((start, len(text)))
+        
+        # Trim surrounding whitespace and drop whitespace-only chunks
+        trimmed = []
+        for span_start, span_end in spans:
+            chunk = text[span_start:span_end]
+            stripped = chunk.strip()
+            if stripped:
+                lead = len(chunk) - len(chunk.lstrip())
+                trimmed.append((span_start + lead, span_start + lead + len(stripped)))
+        
+        logger.info(f"Created {len(trimmed)} content-defined chunks from {len(text)} characters")
+        return trimmed
     
     def extract_keywords(self, query: str, min_length: int = 3) -> List[str]:
         """
@@ -161,6 +264,271 @@ class ChunkingService:
         logger.info(f"Selected {len(relevant_chunks)} relevant chunks from {len(chunks)} total")
         return relevant_chunks
     
+    def get_relevant_spans(
+        self,
+        store: "ChunkStore",
+        query: str,
+        max_chunks: int = 5
+    ) -> List[int]:
+        """
+        Get the most relevant chunks of an offset-based chunk store
+        
+        Scores chunks in place over the memory-mapped text, so no chunk
+        strings or lowercase copies are created per query.
+        
+        Args:
+            store: Chunk store for the document
+            query: User's question
+            max_chunks: Maximum number of chunks to return
+            
+        Returns:
+            Indices of the most relevant chunks in the store
+        """
+        keywords = self.extract_keywords(query)
+        
+        if not keywords:
+            # If no keywords, return first few chunks
+            return list(range(min(max_chunks, len(store))))
+        
+        patterns = self._keyword_patterns(keywords)
+        weights = [len(keyword) for keyword in keywords]
+        
+        # Score all chunks
+        chunk_scores: List[Tuple[int, float]] = [
+            (index, self._weighted_score(vector, weights))
+            for index, vector in enumerate(store.keyword_counts(patterns))
+        ]
+        
+        # Sort by score (descending)
+        chunk_scores.sort(key=lambda x: x[1], reverse=True)
+        
+        relevant_indices = [index for index, score in chunk_scores[:max_chunks]]
+        
+        logger.info(f"Selected {len(relevant_indices)} relevant chunks from {len(store)} total")
+        return relevant_indices
+    
+    def select_context_spans(
+        self,
+        store: "ChunkStore",
+        query: str,
+        max_chunks: int = 5,
+        mmr_lambda: float = 0.7,
+        candidate_pool: int = 20
+    ) -> List[Tuple[int, int]]:
+        """
+        Select relevant yet non-redundant chunks and merge overlapping hits
+        
+        Candidates are picked with maximal marginal relevance: each step takes
+        the chunk with the best trade-off between its own relevance and its
+        similarity to chunks already chosen. Similarity is the larger of the
+        cosine between keyword-count vectors and the fraction of the shorter
+        chunk shared with the other, so overlapping windows and chunks that
+        repeat the same matches are penalized. Selected chunks that overlap or
+        touch are then merged into one span so the shared text appears once.
+        
+        Args:
+            store: Chunk store for the document
+            query: User's question
+            max_chunks: Maximum number of chunks to select before merging
+            mmr_lambda: Relevance weight (1.0 = pure relevance, 0.0 = pure diversity)
+            candidate_pool: Number of top-scoring chunks considered by MMR
+            
+        Returns:
+            Merged (start, end) byte spans, most relevant first
+        """
+        keywords = self.extract_keywords(query)
+        
+        if not keywords:
+            # If no keywords, return first few chunks
+            return self.merge_spans(store.spans[:max_chunks])
+        
+        patterns = self._keyword_patterns(keywords)
+        weights = [len(keyword) for keyword in keywords]
+        
+        # Keyword count vectors double as relevance scores and similarity features
+        vectors = store.keyword_counts(patterns)
+        scores = [self._weighted_score(vector, weights) for vector in vectors]
+        
+        candidates = sorted(range(len(store)), key=lambda i: scores[i], reverse=True)
+        candidates = [i for i in candidates[:candidate_pool] if scores[i] > 0]
+        
+        if not candidates:
+            return self.merge_spans(store.spans[:max_chunks])
+        
+        top_score = scores[candidates[0]]
+        selected: List[int] = []
+        
+        while candidates and len(selected) < max_chunks:
+            best_index, best_value = None, None
+            
+            for i in candidates:
+                redundancy = max(
+                    (self._chunk_similarity(store, vectors, i, j) for j in selected),
+                    default=0.0
+                )
+                value = mmr_lambda * scores[i] / top_score - (1 - mmr_lambda) * redundancy
+                
+                if best_value is None or value > best_value:
+                    best_index, best_value = i, value
+            
+            selected.append(best_index)
+            candidates.remove(best_index)
+        
+        spans = self.merge_spans([store.spans[i] for i in selected])
+        
+        # Order merged spans by the best chunk they contain so truncation drops the weakest
+        rank = {store.spans[i]: position for position, i in enumerate(selected)}
+        spans.sort(key=lambda span: min(
+            position for chunk_span, position in rank.items()
+            if chunk_span[0] >= span[0] and chunk_span[1] <= span[1]
+        ))
+        
+        logger.info(
+            f"Selected {len(selected)} chunks merged into {len(spans)} spans "
+            f"from {len(store)} total"
+        )
+        return spans
+    
+    def merge_spans(self, spans: List[Tuple[int, int]], gap: int = 0) -> List[Tuple[int, int]]:
+        """
+        Merge overlapping or adjacent spans
+        
+        Args:
+            spans: (start, end) offsets in any order
+            gap: Maximum distance between spans that still get merged
+            
+        Returns:
+            Merged spans in document order
+        """
+        merged: List[Tuple[int, int]] = []
+        
+        for start, end in sorted(spans):
+            if merged and start <= merged[-1][1] + gap:
+                merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+            else:
+                merged.append((start, end))
+        
+        return merged
+    
+    def _chunk_similarity(
+        self,
+        store: "ChunkStore",
+        vectors: List[List[int]],
+        i: int,
+        j: int
+    ) -> float:
+        """Similarity of two stored chunks for redundancy checks"""
+        a, b = vectors[i], vectors[j]
+        norm = math.sqrt(sum(x * x for x in a)) * math.sqrt(sum(y * y for y in b))
+        cosine = sum(x * y for x, y in zip(a, b)) / norm if norm else 0.0
+        
+        (start_a, end_a), (start_b, end_b) = store.spans[i], store.spans[j]
+        shared = max(0, min(end_a, end_b) - max(start_a, start_b))
+        shortest = min(end_a - start_a, end_b - start_b)
+        overlap = shared / shortest if shortest else 0.0
+        
+        return max(cosine, overlap)
+    
+    def keyword_coverage(
+        self,
+        query: str,
+        text: str,
+        in_document: Optional[Callable[[str], bool]] = None
+    ) -> float:
+        """
+        Share of a query's keywords found in a text, weighted by length as in retrieval
+        
+        Args:
+            query: User's question
+            text: Context the question would be answered from
+            in_document: Optional check whether a keyword occurs in the whole
+                document; keywords it rejects (e.g. "elaborate") cannot be
+                retrieved anyway and are ignored
+        
+        Returns:
+            Coverage between 0.0 and 1.0; 1.0 when no keyword counts
+        """
+        keywords = self.extract_keywords(query)
+        if in_document is not None:
+            lowered = text.lower()
+            keywords = [keyword for keyword in keywords if keyword.lower() in lowered or in_document(keyword)]
+        if not keywords:
+            return 1.0
+        
+        lowered = text.lower()
+        found = sum(len(keyword) for keyword in keywords if keyword.lower() in lowered)
+        return found / sum(len(keyword) for keyword in keywords)
+    
+    def _weighted_score(self, counts: List[int], weights: List[int]) -> float:
+        """Score a keyword count vector the same way score_chunk does"""
+        return float(sum(count * weight for count, weight in zip(counts, weights)))
+    
+    def _keyword_patterns(self, keywords: List[str]) -> List[Pattern[bytes]]:
+        """Compile keywords into byte patterns for the case-folded copy in chunk stores"""
+        return [re.compile(re.escape(fold_case(keyword.lower()).encode("utf-8"))) for keyword in keywords]
+    
+    def best_window(self, text: str, query: str, max_chars: int) -> str:
+        """
+        Most relevant stretch of a text that fits in `max_chars` characters
+        
+        Args:
+            text: Text to cut down, e.g. a whole page
+            query: User's question
+            max_chars: Longest excerpt to return
+            
+        Returns:
+            The whole text if it fits, otherwise its best-scoring window
+        """
+        if len(text) <= max_chars:
+            return text
+        
+        windows = ChunkingService(chunk_size=max_chars, overlap=max_chars // 4).create_chunks(text)
+        return self.get_relevant_chunks(windows, query, max_chunks=1)[0]
+    
+    def build_excerpt_context(
+        self,
+        sections: List[Tuple[str, str]],
+        query: str,
+        max_chars: int = 10000
+    ) -> Tuple[str, List[int]]:
+        """
+        Build context string from whole sections, e.g. pages, cut to their relevant parts
+        
+        Unlike build_context, which stops at the first chunk that does not
+        fit, each section gets an equal share of the budget left when its
+        turn comes, at least MIN_EXCERPT_CHARS, and is cut to its best window
+        within that share. One long section therefore cannot crowd out the
+        rest, and short sections pass their unused share on to later ones.
+        
+        Args:
+            sections: (header, text) pairs, most relevant first
+            query: User's question
+            max_chars: Maximum total characters
+            
+        Returns:
+            Tuple of (context, indices of the sections it includes)
+        """
+        context_parts = []
+        included = []
+        remaining = max_chars
+        
+        for i, (header, text) in enumerate(sections):
+            if not (text or '').strip():
+                continue
+            
+            marker = f"\n--- Section {len(context_parts) + 1} ---\n{header}\n"
+            # Too many sections for equal shares: the weakest ones are dropped
+            share = max(remaining // (len(sections) - i) - len(marker) - 1, MIN_EXCERPT_CHARS)
+            if len(marker) + share + 1 > remaining:
+                break
+            
+            part = f"{marker}{self.best_window(text.strip(), query, share)}\n"
+            context_parts.append(part)
+            included.append(i)
+            remaining -= len(part)
+        
+        return "".join(context_parts), included
+    
     def build_context(self, chunks: List[str], max_chars: int = 10000) -> str:
         """
         Build context string from chunks
@@ -0,0 +1,178 @@
+"""
+Extractive compression of LLM inputs, run locally before the API call
+"""
+import os
+import re
+import logging
+from typing import List, Optional, Tuple
+import numpy as np
+from fastapi.concurrency import run_in_threadpool
+from app.services.chunking_service import ChunkingService
+
+logger = logging.getLogger(__name__)
+
+# Sentence ends, or line breaks that end table rows, list items and references
+_SENTENCE_END = re.compile(r'(?<=[.!?])\s+|\n+')
+
+
+class CompressionService:
+    """
+    Shrinks text to a token budget by keeping its most central sentences
+
+    Sentences are ranked with TextRank over TF-IDF cosine similarity, all in
+    NumPy on the CPU. Duplicate sentences and rows that are mostly numbers
+    or symbols (tables, reference lists) are dropped first. Kept sentences
+    stay in their original order.
+    """
+
+    def __init__(self, ratio: Optional[float] = None, block_sentences: int = 800):
+        """
+        Args:
+            ratio: Fraction of input tokens to keep; 1.0 disables compression
+            block_sentences: Sentences ranked together, bounding the
+                similarity matrix for very long documents
+        """
+        self.ratio = ratio if ratio is not None else float(os.getenv("INPUT_COMPRESSION_RATIO", 1.0))
+        self.block_sentences = block_sentences
+        self.chunking_service = ChunkingService()
+
+    @property
+    def enabled(self) -> bool:
+        return self.ratio < 1.0
+
+    def estimate_tokens(self, text: str) -> int:
+        """Rough token count (about four characters per token)"""
+        return len(text) // 4
+
+    async def compress_async(self, text: str, max_tokens: Optional[int] = None, min_sentences: int = 6) -> str:
+        """
+        `compress` for async callers
+
+        Ranking a long document takes long enough to stall every other
+        request on the event loop, so it runs in the thread pool.
+        """
+        if not self.enabled and max_tokens is None:
+            return text
+        return await run_in_threadpool(self.compress, text, max_tokens, min_sentences)
+
+    def compress(self, text: str, max_tokens: Optional[int] = None, min_sentences: int = 6) -> str:
+        """
+        Keep the most salient sentences within the token budget
+
+        Args:
+            text: Text to compress
+            max_tokens: Optional hard budget on top of the configured ratio
+            min_sentences: Shorter texts are returned unchanged
+
+        Returns:
+            Compressed text, or the original if compression is disabled or
+            would not help
+        """
+        budget = self.estimate_tokens(text) * self.ratio
+        if max_tokens is not None:
+            budget = min(budget, max_tokens)
+        if budget >= self.estimate_tokens(text):
+            return text
+
+        spans = self._sentence_spans(text)
+        if len(spans) < min_sentences:
+            return text
+
+        sentences = [text[start:end] for start, end in spans]
+        keep = self._filter_noise(sentences)
+
+        scores = np.zeros(len(sentences))
+        for block_start in range(0, len(keep), self.block_sentences):
+            block = keep[block_start:block_start + self.block_sentences]
+            scores[block] = self._textrank([sentences[i] for i in block])
+
+        selected = []
+        used = 0
+        for index in sorted(keep, key=lambda i: -scores[i]):
+            cost = self.estimate_tokens(sentences[index]) + 1
+            if used + cost > budget and selected:
+                continue
+            selected.append(index)
+            used += cost
+
+        compressed = self._join(text, spans, sorted(selected))
+        logger.info(
+            f"Compressed input from ~{self.estimate_tokens(text)} to ~{self.estimate_tokens(compressed)} tokens "
+            f"({len(selected)}/{len(spans)} sentences)"
+        )
+        return compressed
+
+    def _sentence_spans(self, text: str) -> List[Tuple[int, int]]:
+        spans = []
+        start = 0
+        for match in _SENTENCE_END.finditer(text):
+            if text[start:match.start()].strip():
+                spans.append((start, match.start()))
+            start = match.end()
+        if text[start:].strip():
+            spans.append((start, len(text)))
+        return spans
+
+    def _filter_noise(self, sentences: List[str]) -> List[int]:
+        """Indices of sentences worth ranking: unique and mostly words"""
+        seen = set()
+        keep = []
+        for index, sentence in enumerate(sentences):
+            normalized = re.sub(r'\W+', ' ', sentence.lower()).strip()
+            if not normalized or normalized in seen:
+                continue
+            seen.add(normalized)
+
+            letters = sum(ch.isalpha() for ch in sentence)
+            if letters < 0.5 * len(sentence.strip()) or len(normalized.split()) < 3:
+                continue
+            keep.append(index)
+        return keep
+
+    def _textrank(self, sentences: List[str], damping: float = 0.85, iterations: int = 50) -> np.ndarray:
+        """PageRank over the sentence similarity graph"""
+        count = len(sentences)
+        if count <= 2:
+            return np.ones(count)
+
+        vocabulary = {}
+        rows = []
+        for sentence in sentences:
+            rows.append([
+                vocabulary.setdefault(word, len(vocabulary))
+                for word in self.chunking_service.extract_keywords(sentence)
+            ])
+
+        counts = np.zeros((count, max(1, len(vocabulary))))
+        for row, columns in enumerate(rows):
+            np.add.at(counts[row], columns, 1)
+
+        document_frequency = np.count_nonzero(counts, axis=0)
+        tfidf = counts * (np.log((1 + count) / (1 + document_frequency)) + 1)
+        norms = np.linalg.norm(tfidf, axis=1, keepdims=True)
+        tfidf = np.divide(tfidf, norms, out=np.zeros_like(tfidf), where=norms > 0)
+
+        similarity = tfidf @ tfidf.T
+        np.fill_diagonal(similarity, 0)
+        out_weight = similarity.sum(axis=1, keepdims=True)
+        transition = np.divide(similarity, out_weight, out=np.full_like(similarity, 1 / count), where=out_weight > 0)
+
+        scores = np.full(count, 1 / count)
+        for _ in range(iterations):
+            updated = (1 - damping) / count + damping * (transition.T @ scores)
+            if np.abs(updated - scores).sum() < 1e-6:
+                return updated
+            scores = updated
+        return scores
+
+    def _join(self, text: str, spans: List[Tuple[int, int]], selected: List[int]) -> str:
+        """Rejoin kept sentences, preserving line breaks between them"""
+        parts = []
+        previous_end = None
+        for index in selected:
+            start, end = spans[index]
+            if previous_end is not None:
+                parts.append("\n" if "\n" in text[previous_end:start] else " ")
+            parts.append(text[start:end].strip())
+            previous_end = end
+        return "".join(parts)
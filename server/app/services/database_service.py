@@ -8,6 +8,7 @@ from typing import List, Dict, Optional
 from datetime import datetime
 import json
 import os
+from app.utils.hashing import content_hash
 
 
 class Database:
@@ -63,10 +64,26 @@ class Database:
                 unsplash_image_path TEXT,
                 audio_path TEXT,
                 duration REAL,
+                content_hash TEXT,
                 FOREIGN KEY (video_id) REFERENCES videos(id) ON DELETE CASCADE
             )
         """)
         
+        # Check if content_hash column exists (migration for existing db)
+        cursor.execute("PRAGMA table_info(pages)")
+        columns = [column[1] for column in cursor.fetchall()]
+        if 'content_hash' not in columns:
+            print("Migrating database: Adding content_hash to pages table")
+            cursor.execute("ALTER TABLE pages ADD COLUMN content_hash TEXT")
+            cursor.execute("SELECT id, title, original_text FROM pages")
+            for page_id, title, text in cursor.fetchall():
+                cursor.execute(
+                    "UPDATE pages SET content_hash = ? WHERE id = ?",
+                    (content_hash(title or '', text), page_id)
+                )
+        
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_pages_content_hash ON pages(content_hash)")
+        
         # Images extracted from PDF pages
         cursor.execute("""
             CREATE TABLE IF NOT EXISTS page_images (
@@ -78,9 +95,62 @@ class Database:
             )
         """)
         
+        self.fts_enabled = self._init_page_search(cursor)
+        
         conn.commit()
         conn.close()
     
+    def _init_page_search(self, cursor) -> bool:
+        """
+        Create the FTS5 index over pages and the triggers keeping it in sync
+        
+        Returns False if this SQLite build has no FTS5 support.
+        """
+        cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name = 'pages_fts'")
+        is_new = cursor.fetchone() is None
+        
+        try:
+            cursor.execute("""
+                CREATE VIRTUAL TABLE IF NOT EXISTS pages_fts USING fts5(
+                    title,
+                    original_text,
+                    content='pages',
+                    content_rowid='id',
+                    tokenize='porter unicode61'
+                )
+            """)
+        except sqlite3.OperationalError as e:
+            print(f"Full-text search disabled: {e}")
+            return False
+        
+        cursor.execute("""
+            CREATE TRIGGER IF NOT EXISTS pages_fts_insert AFTER INSERT ON pages BEGIN
+                INSERT INTO pages_fts(rowid, title, original_text)
+                VALUES (new.id, new.title, new.original_text);
+            END
+        """)
+        cursor.execute("""
+            CREATE TRIGGER IF NOT EXISTS pages_fts_delete AFTER DELETE ON pages BEGIN
+                INSERT INTO pages_fts(pages_fts, rowid, title, original_text)
+                VALUES ('delete', old.id, old.title, old.original_text);
+            END
+        """)
+        cursor.execute("""
+            CREATE TRIGGER IF NOT EXISTS pages_fts_update AFTER UPDATE OF title, original_text ON pages BEGIN
+                INSERT INTO pages_fts(pages_fts, rowid, title, original_text)
+                VALUES ('delete', old.id, old.title, old.original_text);
+                INSERT INTO pages_fts(rowid, title, original_text)
+                VALUES (new.id, new.title, new.original_text);
+            END
+        """)
+        
+        if is_new:
+            # Index pages created before the search table existed (migration for existing db)
+            print("Migrating database: Building full-text index for pages")
+            cursor.execute("INSERT INTO pages_fts(pages_fts) VALUES ('rebuild')")
+        
+        return True
+    
     # Video operations
     def create_video(self, job_id: str, pdf_filename: str, total_pages: int, user_id: Optional[str] = None) -> int:
         """Create a new video entry"""
@@ -153,9 +223,9 @@ class Database:
         cursor = conn.cursor()
         
         cursor.execute("""
-            INSERT INTO pages (video_id, page_num, title, original_text, pdf_image_path)
-            VALUES (?, ?, ?, ?, ?)
-        """, (video_id, page_num, title, text, pdf_image_path))
+            INSERT INTO pages (video_id, page_num, title, original_text, pdf_image_path, content_hash)
+            VALUES (?, ?, ?, ?, ?, ?)
+        """, (video_id, page_num, title, text, pdf_image_path, content_hash(title or '', text)))
         
         page_id = cursor.lastrowid
         conn.commit()
@@ -221,6 +291,32 @@ class Database:
         
         return [dict(row) for row in rows]
     
+    def find_reusable_page(self, page_content_hash: str, exclude_page_id: int) -> Optional[Dict]:
+        """
+        Find the latest other page with identical content that already has a script
+        
+        Used to carry scripts, images and audio over from earlier versions
+        of the same document.
+        """
+        if not page_content_hash:
+            return None
+        
+        conn = self.get_connection()
+        conn.row_factory = sqlite3.Row
+        cursor = conn.cursor()
+        
+        cursor.execute("""
+            SELECT * FROM pages
+            WHERE content_hash = ? AND id != ? AND teacher_script IS NOT NULL
+            ORDER BY id DESC
+            LIMIT 1
+        """, (page_content_hash, exclude_page_id))
+        
+        row = cursor.fetchone()
+        conn.close()
+        
+        return dict(row) if row else None
+    
     def get_full_page_data(self, job_id: str) -> List[Dict]:
         """Get complete page data for video rendering"""
         pages = self.get_pages_by_job_id(job_id)
@@ -243,6 +339,46 @@ class Database:
         
         return pages
     
+    def search_pages(self, user_id: str, keywords: List[str], limit: int = 20) -> List[Dict]:
+        """
+        Full-text search across every page of a user's documents
+        
+        Args:
+            user_id: Owner of the documents
+            keywords: Search terms; pages matching any of them are returned
+            limit: Maximum number of pages to return
+            
+        Returns:
+            Matching pages ranked by BM25, best first
+        """
+        if not self.fts_enabled or not keywords:
+            return []
+        
+        # Quote each term so user input can never be parsed as FTS5 query syntax
+        match_query = " OR ".join('"{}"'.format(keyword.replace('"', '""')) for keyword in keywords)
+        
+        conn = self.get_connection()
+        conn.row_factory = sqlite3.Row
+        cursor = conn.cursor()
+        
+        cursor.execute("""
+            SELECT v.job_id, v.pdf_filename, p.id AS page_id, p.page_num, p.title,
+                   p.original_text,
+                   snippet(pages_fts, 1, '**', '**', '...', 24) AS snippet,
+                   bm25(pages_fts) AS rank
+            FROM pages_fts
+            JOIN pages p ON p.id = pages_fts.rowid
+            JOIN videos v ON v.id = p.video_id
+            WHERE pages_fts MATCH ? AND v.user_id = ?
+            ORDER BY rank
+            LIMIT ?
+        """, (match_query, user_id, limit))
+        
+        rows = cursor.fetchall()
+        conn.close()
+        
+        return [dict(row) for row in rows]
+    
     # Page image operations
     def add_page_image(self, page_id: int, image_path: str, position: int = 0):
         """Add an image extracted from PDF page"""
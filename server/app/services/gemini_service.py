@@ -4,10 +4,19 @@ Gemini Service for interactions with Google's Gemini API
 import os
 import logging
 import google.generativeai as genai
-from typing import List, Dict, Optional, Generator
+from typing import AsyncIterator, List, Dict, Optional, Generator
+from app.core.llm_governor import get_governor
+from app.services.compression_service import CompressionService
+from app.services.groq_service import SUMMARY_LENGTH_CONFIGS, SUMMARY_PROMPT_VERSION
+from app.services.summarization_service import MapReduceSummarizer, SINGLE_PASS_CHARS
 
 logger = logging.getLogger(__name__)
 
+GEMINI_MODEL = "gemini-2.5-flash"
+
+# Model handles are reused across requests instead of being rebuilt per call
+_models: Dict[str, "genai.GenerativeModel"] = {}
+
 class GeminiService:
     """Service for interacting with Google Gemini API"""
 
@@ -18,76 +27,185 @@ class GeminiService:
         else:
             genai.configure(api_key=self.api_key)
             logger.info("Gemini API configured")
+        self.summary_mode = os.getenv("SUMMARY_MODE", "map_reduce")
+        self.hierarchical_summaries = os.getenv("SUMMARY_HIERARCHICAL", "false").lower() == "true"
+        self.summarizer = MapReduceSummarizer(self._complete, GEMINI_MODEL)
+        self.compression_service = CompressionService()
 
-    def get_model(self, model_name: str = "gemini-2.5-flash"):
+    def get_model(self, model_name: str = GEMINI_MODEL):
         """Get Gemini model instance"""
         if not self.api_key:
             raise ValueError("GOOGLE_API_KEY not found in environment variables")
-        return genai.GenerativeModel(model_name)
+        if model_name not in _models:
+            _models[model_name] = genai.GenerativeModel(model_name)
+        return _models[model_name]
+
+    def summary_cache_key(self, document_hash: str, length: str) -> str:
+        """Cache key for a summary of a document, covering everything that changes the output"""
+        return (
+            f"{document_hash}:{length}:{GEMINI_MODEL}:{self.summary_mode}:"
+            f"r{self.compression_service.ratio:g}:v{SUMMARY_PROMPT_VERSION}"
+        )
 
     async def chat_with_pdf(self, context: str, messages: List[Dict[str, str]]) -> str:
         """
         Chat with a PDF document using provided context
-        
+
         Args:
             context: Relevant text context from the PDF (pre-chunked)
             messages: List of message dictionaries {'role': 'user'|'model', 'content': '...'}
         """
         try:
-            model = self.get_model()
-            
-            # Create a chat session
-            # We initialize context with the PDF content
-            history = [
-                {
-                    "role": "user",
-                    "parts": [f"Here is relevant content from a PDF document I want to discuss:\n\n{context}\n\nPlease answer my questions based on this document content."]
-                },
-                {
-                    "role": "model",
-                    "parts": ["I understand. I have read the document content provided. Please ask your questions."]
-                }
-            ]
-            
-            # Append previous messages to history
-            # Skip the last message which is the current query (we'll send it via send_message)
-            current_query = messages[-1]['content']
-            
-            for msg in messages[:-1]:
-                role = "user" if msg['role'] == 'user' else "model"
-                history.append({
-                    "role": role,
-                    "parts": [msg['content']]
-                })
-            
-            chat = model.start_chat(history=history)
-            response = chat.send_message(current_query)
-            
+            chat, current_query = self._start_chat(context, messages)
+            async with get_governor("gemini").slot():
+                response = await chat.send_message_async(current_query)
+
             return response.text
-            
+
         except Exception as e:
             logger.error(f"Error in chat_with_pdf: {e}")
             raise
 
-    async def summarize_pdf(self, pdf_text: str) -> str:
+    async def stream_chat_with_pdf(
+        self,
+        context: str,
+        messages: List[Dict[str, str]],
+        stats: Optional[Dict] = None
+    ) -> AsyncIterator[str]:
         """
-        Generate a summary of the PDF document
+        Stream a chat answer as text deltas while it is generated
+
+        Gemini returns no reasoning text, so `stats` is left unchanged.
+        """
+        chat, current_query = self._start_chat(context, messages)
+        async with get_governor("gemini").slot():
+            response = await chat.send_message_async(current_query, stream=True)
+
+            async for chunk in response:
+                if chunk.text:
+                    yield chunk.text
+
+    def _start_chat(self, context: str, messages: List[Dict[str, str]]):
+        """
+        Create a chat session primed with the PDF context and history
+
+        Returns:
+            Tuple of (chat, current_query)
+        """
+        model = self.get_model()
+
+        # Create a chat session
+        # We initialize context with the PDF content
+        history = [
+            {
+                "role": "user",
+                "parts": [f"Here is relevant content from a PDF document I want to discuss:\n\n{context}\n\nPlease answer my questions based on this document content."]
+            },
+            {
+                "role": "model",
+                "parts": ["I understand. I have read the document content provided. Please ask your questions."]
+            }
+        ]
+
+        # Append previous messages to history
+        # Skip the last message which is the current query (we'll send it via send_message)
+        current_query = messages[-1]['content']
+
+        for msg in messages[:-1]:
+            role = "user" if msg['role'] == 'user' else "model"
+            history.append({
+                "role": role,
+                "parts": [msg['content']]
+            })
+
+        return model.start_chat(history=history), current_query
+
+    async def summarize_pdf(self, pdf_text: str, length: str = "standard") -> str:
+        """
+        Generate a summary of the PDF document with specified length
         """
         try:
-            model = self.get_model()
-            
-            prompt = f"""
-            Please provide a comprehensive summary of the following document. 
-            Include the main topics, key points, and overall conclusion.
-            Format the output with Markdown headings and bullet points.
-            
-            Document Content:
-            {pdf_text[:30000]}... (truncated if too long)
-            """
-            
-            response = model.generate_content(prompt)
+            prompt = await self._build_summary_prompt(pdf_text, length)
+
+            async with get_governor("gemini").slot():
+                response = await self.get_model().generate_content_async(prompt)
             return response.text
-            
+
         except Exception as e:
             logger.error(f"Error in summarize_pdf: {e}")
             raise
+
+    async def stream_summarize_pdf(
+        self,
+        pdf_text: str,
+        length: str = "standard",
+        stats: Optional[Dict] = None
+    ) -> AsyncIterator[str]:
+        """Stream a summary as text deltas while it is generated"""
+        prompt = await self._build_summary_prompt(pdf_text, length)
+
+        async for delta in self._stream_content(prompt):
+            yield delta
+
+    async def derive_summary(self, detailed_summary: str, length: str = "standard") -> str:
+        """Shorten an existing detailed summary to the requested length"""
+        try:
+            async with get_governor("gemini").slot():
+                response = await self.get_model().generate_content_async(
+                    self._build_derived_summary_prompt(detailed_summary, length)
+                )
+            return response.text
+
+        except Exception as e:
+            logger.error(f"Error in derive_summary: {e}")
+            raise
+
+    async def stream_derive_summary(
+        self,
+        detailed_summary: str,
+        length: str = "standard",
+        stats: Optional[Dict] = None
+    ) -> AsyncIterator[str]:
+        """Stream a summary derived from an existing detailed summary"""
+        async for delta in self._stream_content(self._build_derived_summary_prompt(detailed_summary, length)):
+            yield delta
+
+    async def _stream_content(self, prompt: str) -> AsyncIterator[str]:
+        async with get_governor("gemini").slot():
+            response = await self.get_model().generate_content_async(prompt, stream=True)
+
+            async for chunk in response:
+                if chunk.text:
+                    yield chunk.text
+
+    async def _build_summary_prompt(self, pdf_text: str, length: str) -> str:
+        config = SUMMARY_LENGTH_CONFIGS.get(length, SUMMARY_LENGTH_CONFIGS["standard"])
+        pdf_text = await self.compression_service.compress_async(pdf_text)
+
+        if self.summary_mode == "map_reduce" and len(pdf_text) > SINGLE_PASS_CHARS:
+            # Condense long documents into section summaries instead of truncating
+            pdf_text = await self.summarizer.condense(pdf_text)
+
+        return f"""{config["prompt"]}
+
+Document Content:
+{pdf_text[:SINGLE_PASS_CHARS]}... (truncated if too long)
+"""
+
+    def _build_derived_summary_prompt(self, detailed_summary: str, length: str) -> str:
+        config = SUMMARY_LENGTH_CONFIGS.get(length, SUMMARY_LENGTH_CONFIGS["standard"])
+
+        return f"""{config["prompt"]}
+
+Base it only on this detailed summary of the document:
+{detailed_summary}
+"""
+
+    async def _complete(self, instructions: str, text: str, max_tokens: int) -> str:
+        """Run one summary-style generation over a piece of text"""
+        async with get_governor("gemini").slot():
+            response = await self.get_model().generate_content_async(
+                f"{instructions}\n\nText:\n{text}",
+                generation_config={"max_output_tokens": max_tokens}
+            )
+        return response.text
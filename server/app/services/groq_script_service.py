@@ -2,12 +2,40 @@
 Groq AI service for generating teacher-style narration scripts
 Converts dry PDF content into engaging, conversational teaching scripts
 """
+import asyncio
+import json
 import os
+import time
 import logging
-from groq import Groq
+from typing import Dict, List, Optional, Tuple
+from fastapi.concurrency import run_in_threadpool
+from app.core.llm_clients import get_async_groq_client
+from app.core.llm_governor import get_governor
+from app.services.cache_service import get_cache
+from app.services.compression_service import CompressionService
+from app.services.model_cascade import ModelCascade
+from app.utils.hashing import content_hash
+from app.utils.rate_limiter import RateLimiter
+from app.utils.singleflight import SingleFlight
 
 logger = logging.getLogger(__name__)
 
+SCRIPT_MODEL = "llama-3.3-70b-versatile"
+SCRIPT_MAX_TOKENS = 500
+
+# Bump whenever the script prompt changes so cached scripts are not reused
+SCRIPT_PROMPT_VERSION = 1
+
+SCRIPT_GUIDELINES = """Guidelines:
+- Speak naturally and conversationally, as if teaching in a classroom
+- Use simple, clear language that students can easily understand
+- Add smooth transitions and explanations where needed
+- Include brief examples or analogies if helpful
+- Keep the tone warm, encouraging, and enthusiastic
+- Aim for 30-60 seconds when spoken aloud
+- Don't add greetings or closing statements
+- Focus only on explaining the core concepts"""
+
 
 class GroqScriptService:
     """Service for generating AI teacher scripts using Groq"""
@@ -16,9 +44,31 @@ class GroqScriptService:
         self.api_key = os.getenv("GROQ_API_KEY")
         if not self.api_key:
             logger.warning("GROQ_API_KEY not set - script generation will fail")
-            self.client = None
-        else:
-            self.client = Groq(api_key=self.api_key)
+        # Trims tables, reference lists and repetition from page text before the call
+        self.compression_service = CompressionService()
+        # Scripts for previously seen page content, shared across uploads
+        self.cache = get_cache("teacher_script")
+        # Short pages can be narrated by the fast model when the cascade is on
+        self.cascade = ModelCascade()
+        self.fast_page_tokens = int(os.getenv("SCRIPT_FAST_PAGE_TOKENS", 200))
+        
+        # Concurrent generation stays within the provider's per-minute quotas
+        self.concurrency = int(os.getenv("SCRIPT_CONCURRENCY", 8))
+        self.rate_limiter = RateLimiter(
+            requests_per_minute=int(os.getenv("SCRIPT_RPM", 30)),
+            tokens_per_minute=int(os.getenv("SCRIPT_TPM", 12000))
+        )
+        # Scripts are background work, so they wait out the shared governor's
+        # queue far longer than interactive requests before giving up
+        self.queue_timeout = float(os.getenv("SCRIPT_QUEUE_TIMEOUT", 300))
+        # Decks being generated at the same time share scripts for identical pages
+        self.flights = SingleFlight("teacher script")
+        
+        # Batched mode packs short pages into one structured-output request
+        self.batching = os.getenv("SCRIPT_BATCHING", "false").lower() == "true"
+        self.batch_tokens = int(os.getenv("SCRIPT_BATCH_TOKENS", 2000))
+        self.batch_max_pages = int(os.getenv("SCRIPT_BATCH_MAX_PAGES", 6))
+        self.batch_page_tokens = int(os.getenv("SCRIPT_BATCH_PAGE_TOKENS", 200))
     
     def generate_teacher_script(
         self,
@@ -29,6 +79,9 @@ class GroqScriptService:
         """
         Generate engaging teacher-style narration from PDF content
         
+        Blocking wrapper around generate_teacher_scripts for code without an
+        event loop; must not be called from a running one.
+        
         Args:
             page_title: Title of the page/section
             page_text: Original text from PDF
@@ -37,71 +90,282 @@ class GroqScriptService:
         Returns:
             Teacher-style narration script
         """
-        if not self.client:
+        return asyncio.run(self.generate_teacher_scripts([
+            {'title': page_title, 'text': page_text, 'page_num': page_num}
+        ]))[0]
+    
+    async def _generate_script_async(self, page_title: str, page_text: str, page_num: int) -> str:
+        """Generate and cache one script without consulting the cache"""
+        cache_key = self.cache_key(page_title, page_text)
+        return await self.flights.do(
+            f"script:{cache_key}", lambda: self._request_script(page_title, page_text, page_num, cache_key)
+        )
+    
+    async def _request_script(self, page_title: str, page_text: str, page_num: int, cache_key: str) -> str:
+        try:
+            # Compression is CPU-bound, so the prompt is built off the event loop
+            prompt = await run_in_threadpool(self._build_prompt, page_title, page_text, page_num)
+            await self.rate_limiter.acquire(len(prompt) // 4 + SCRIPT_MAX_TOKENS)
+            
+            model = self._script_model(page_text)
+            async with get_governor("groq").slot(self.queue_timeout):
+                started = time.monotonic()
+                response = await get_async_groq_client().chat.completions.create(
+                    model=model,
+                    messages=[{
+                        "role": "user",
+                        "content": prompt
+                    }],
+                    temperature=0.7,
+                    max_tokens=SCRIPT_MAX_TOKENS,
+                    top_p=0.9,
+                    **self.cascade.request_options(model)
+                )
+            
+            script = response.choices[0].message.content.strip()
+            if script:
+                self.cache.set(cache_key, script)
+            
+            logger.info(
+                f"Generated teacher script for page {page_num} with {model} "
+                f"in {time.monotonic() - started:.2f}s: {len(script)} chars"
+            )
+            return script
+        
+        except Exception as e:
+            logger.error(f"Error generating teacher script: {e}")
+            # Fallback to original text
+            return page_text
+    
+    async def generate_teacher_scripts(self, pages_data: List[Dict], batch: Optional[bool] = None) -> List[str]:
+        """
+        Generate teacher scripts for many pages concurrently
+        
+        At most SCRIPT_CONCURRENCY calls are in flight, and every call waits
+        for room under the SCRIPT_RPM / SCRIPT_TPM provider limits. Pages
+        repeated within the deck are generated once. In batched mode, short
+        pages are packed into shared requests up to SCRIPT_BATCH_TOKENS; a
+        batch whose response cannot be parsed falls back to one call per page.
+        
+        Args:
+            pages_data: List of dicts with page_num, title, text
+            batch: Override SCRIPT_BATCHING for this call
+            
+        Returns:
+            Scripts in the same order as pages_data
+        """
+        if not self.api_key:
             logger.error("Groq client not initialized")
-            return page_text  # Fallback to original text
+            return [page.get('text', '') for page in pages_data]  # Fallback to original text
+        
+        # First page with each content hash stands in for its repeats
+        unique_pages = {}
+        for page in pages_data:
+            unique_pages.setdefault(self._page_key(page), page)
+        
+        scripts, pending = self._split_cached(list(unique_pages.values()))
+        batch = self.batching if batch is None else batch
+        groups = self._plan_batches(pending) if batch else [[page] for page in pending]
+        semaphore = asyncio.Semaphore(self.concurrency)
+        
+        async def generate_single(page: Dict) -> str:
+            async with semaphore:
+                return await self._generate_script_async(
+                    page.get('title', ''), page.get('text', ''), page.get('page_num', 1)
+                )
+        
+        async def generate_group(group: List[Dict]) -> List[str]:
+            if len(group) > 1:
+                async with semaphore:
+                    batch_scripts = await self._generate_batch_async(group)
+                if batch_scripts is not None:
+                    return batch_scripts
+            return list(await asyncio.gather(*(generate_single(page) for page in group)))
+        
+        results = await asyncio.gather(*(generate_group(group) for group in groups))
+        for group, group_scripts in zip(groups, results):
+            for page, script in zip(group, group_scripts):
+                scripts[self._page_key(page)] = script
+        
+        return [scripts[self._page_key(page)] for page in pages_data]
+    
+    def cache_key(self, page_title: str, page_text: str) -> str:
+        """Script cache key covering everything that changes the generated script"""
+        return (
+            f"{content_hash(page_title or '', page_text or '')}:{self._script_model(page_text)}:"
+            f"r{self.compression_service.ratio:g}:v{SCRIPT_PROMPT_VERSION}"
+        )
+    
+    def _page_key(self, page: Dict) -> str:
+        return self.cache_key(page.get('title', ''), page.get('text', ''))
+    
+    def _script_model(self, page_text: str) -> str:
+        return self.cascade.pick(len(page_text or '') // 4 <= self.fast_page_tokens, SCRIPT_MODEL)
+    
+    def _split_cached(self, pages_data: List[Dict]) -> Tuple[Dict[str, str], List[Dict]]:
+        """
+        Look up every page in the script cache
+        
+        Returns:
+            Tuple of (scripts by cache key, pages still needing a script)
+        """
+        scripts = {}
+        pending = []
+        for page in pages_data:
+            cached = self.cache.get(self._page_key(page))
+            if cached is not None:
+                scripts[self._page_key(page)] = cached
+            else:
+                pending.append(page)
         
+        if scripts:
+            logger.info(f"Script cache hits for {len(scripts)} of {len(pages_data)} pages")
+        return scripts, pending
+    
+    def _plan_batches(self, pages_data: List[Dict]) -> List[List[Dict]]:
+        """
+        Group short pages, in deck order, up to the batch token budget
+        
+        Long pages get a request of their own, and a batch only holds pages
+        narrated by the same model.
+        """
+        groups = []
+        current = []
+        tokens = 0
+        
+        for page in pages_data:
+            size = len(page.get('text') or '') // 4
+            if size > self.batch_page_tokens:
+                groups.append([page])
+                continue
+            
+            if current and (
+                tokens + size > self.batch_tokens
+                or len(current) >= self.batch_max_pages
+                or self._script_model(page.get('text')) != self._script_model(current[0].get('text'))
+            ):
+                groups.append(current)
+                current = []
+                tokens = 0
+            current.append(page)
+            tokens += size
+        
+        if current:
+            groups.append(current)
+        return groups
+    
+    def _batch_request(self, pages_data: List[Dict]) -> Dict:
+        """Chat completion arguments for one batched, JSON-mode request"""
+        sections = "\n\n".join(
+            f"[{index}] Page {page.get('page_num', index)}: {page.get('title') or 'Content'}\n"
+            f"{self.compression_service.compress(page.get('text', ''))}"
+            for index, page in enumerate(pages_data, start=1)
+        )
+        
+        prompt = f"""You are an enthusiastic and friendly teacher explaining educational content to students.
+
+Original Content of {len(pages_data)} pages:
+
+{sections}
+
+Task: Transform each page's content into its own engaging, conversational teaching script.
+
+{SCRIPT_GUIDELINES}
+
+Respond with only a JSON object of the form {{"scripts": [{{"id": <page id in brackets>, "script": "<teacher script>"}}]}} with one entry for every page."""
+        
+        model = self._script_model(pages_data[0].get('text'))
+        return {
+            "model": model,
+            "messages": [{"role": "user", "content": prompt}],
+            "temperature": 0.7,
+            "max_tokens": SCRIPT_MAX_TOKENS * len(pages_data),
+            "top_p": 0.9,
+            "response_format": {"type": "json_object"},
+            **self.cascade.request_options(model)
+        }
+    
+    def _parse_batch(self, content: str, pages_data: List[Dict]) -> Optional[List[str]]:
+        """
+        Map a batched response back to per-page scripts and cache them
+        
+        Returns:
+            Scripts in page order, or None unless every page got a script
+        """
+        try:
+            entries = json.loads(content)["scripts"]
+            by_id = {int(entry["id"]): str(entry["script"]).strip() for entry in entries}
+        except (ValueError, KeyError, TypeError) as e:
+            logger.warning(f"Could not parse batched scripts: {e}")
+            return None
+        
+        scripts = [by_id.get(index, "") for index in range(1, len(pages_data) + 1)]
+        if not all(scripts):
+            logger.warning(f"Batched response covered {sum(map(bool, scripts))} of {len(pages_data)} pages")
+            return None
+        
+        for page, script in zip(pages_data, scripts):
+            self.cache.set(self._page_key(page), script)
+        
+        logger.info(f"Generated {len(scripts)} teacher scripts in one batched request")
+        return scripts
+    
+    async def _generate_batch_async(self, pages_data: List[Dict]) -> Optional[List[str]]:
+        """Generate scripts for several pages in one request, or None on failure"""
+        batch_key = content_hash(*(self._page_key(page) for page in pages_data))
+        return await self.flights.do(f"batch:{batch_key}", lambda: self._request_batch(pages_data))
+    
+    async def _request_batch(self, pages_data: List[Dict]) -> Optional[List[str]]:
         try:
-            # Create an engaging prompt for teacher-style narration
-            prompt = f"""You are an enthusiastic and friendly teacher explaining educational content to students.
+            request = await run_in_threadpool(self._batch_request, pages_data)
+            await self.rate_limiter.acquire(len(request["messages"][0]["content"]) // 4 + request["max_tokens"])
+            
+            async with get_governor("groq").slot(self.queue_timeout):
+                started = time.monotonic()
+                response = await get_async_groq_client().chat.completions.create(**request)
+            self._log_batch(request, len(pages_data), started)
+            return self._parse_batch(response.choices[0].message.content, pages_data)
+        except Exception as e:
+            logger.error(f"Error generating batched teacher scripts: {e}")
+            return None
+    
+    def _log_batch(self, request: Dict, page_count: int, started: float):
+        logger.info(
+            f"Batched script request for {page_count} pages with {request['model']} "
+            f"took {time.monotonic() - started:.2f}s"
+        )
+    
+    def _build_prompt(self, page_title: str, page_text: str, page_num: int) -> str:
+        """Create an engaging prompt for teacher-style narration"""
+        return f"""You are an enthusiastic and friendly teacher explaining educational content to students.
 
 Page {page_num}: {page_title or 'Content'}
 
 Original Content:
-{page_text}
+{self.compression_service.compress(page_text)}
 
 Task: Transform this content into an engaging, conversational teaching script.
 
-Guidelines:
-- Speak naturally and conversationally, as if teaching in a classroom
-- Use simple, clear language that students can easily understand
-- Add smooth transitions and explanations where needed
-- Include brief examples or analogies if helpful
-- Keep the tone warm, encouraging, and enthusiastic
-- Aim for 30-60 seconds when spoken aloud
-- Don't add greetings or closing statements
-- Focus only on explaining the core concepts
+{SCRIPT_GUIDELINES}
 
 Teacher Script:"""
-            
-            # Call Groq API
-            response = self.client.chat.completions.create(
-                model="llama-3.3-70b-versatile",  # Fast and high quality
-                messages=[{
-                    "role": "user",
-                    "content": prompt
-                }],
-                temperature=0.7,  # Balanced creativity
-                max_tokens=500,   # ~60 seconds of speech
-                top_p=0.9
-            )
-            
-            script = response.choices[0].message.content.strip()
-            
-            logger.info(f"Generated teacher script for page {page_num}: {len(script)} chars")
-            return script
-        
-        except Exception as e:
-            logger.error(f"Error generating teacher script: {e}")
-            # Fallback to original text
-            return page_text
     
-    def generate_scripts_for_pages(self, pages_data: list) -> list:
+    def generate_scripts_for_pages(self, pages_data: list, batch: Optional[bool] = None) -> list:
         """
         Generate teacher scripts for multiple pages
         
+        Blocking wrapper around generate_teacher_scripts for code without an
+        event loop; must not be called from a running one.
+        
         Args:
             pages_data: List of dicts with page_num, title, text
+            batch: Override SCRIPT_BATCHING for this call
             
         Returns:
             List of dicts with added teacher_script field
         """
-        for page in pages_data:
-            script = self.generate_teacher_script(
-                page_title=page.get('title', ''),
-                page_text=page.get('text', ''),
-                page_num=page.get('page_num', 1)
-            )
+        scripts = asyncio.run(self.generate_teacher_scripts(pages_data, batch))
+        for page, script in zip(pages_data, scripts):
             page['teacher_script'] = script
         
         return pages_data
@@ -2,12 +2,71 @@
 Groq Service for interactions with Groq API (alternative to Gemini)
 """
 import os
+import time
 import logging
-from typing import List, Dict
-from groq import Groq
+from typing import AsyncIterator, List, Dict, Optional, Tuple
+from groq import AsyncGroq
+from app.core.llm_clients import get_async_groq_client
+from app.core.llm_governor import get_governor
+from app.services.compression_service import CompressionService
+from app.services.model_cascade import ModelCascade, NOT_IN_DOCUMENT
+from app.services.summarization_service import MapReduceSummarizer, SINGLE_PASS_CHARS
+from app.utils.reasoning_filter import ReasoningFilter
 
 logger = logging.getLogger(__name__)
 
+CHAT_MODEL = "qwen/qwen3-32b"
+SUMMARY_MODEL = "qwen/qwen3-32b"
+
+# Bump whenever summary prompts change so cached summaries are not reused
+SUMMARY_PROMPT_VERSION = 2
+
+SUMMARY_SYSTEM_PROMPT = "You are a helpful AI assistant that provides clear, well-structured summaries. Do not include your reasoning process in the response."
+
+# Heading for long documents condensed by map-reduce before the final summary
+CONDENSED_SOURCE_HEADING = "Summaries of consecutive sections, covering the whole document:"
+
+# Prompts and settings for each summary length
+SUMMARY_LENGTH_CONFIGS = {
+    "brief": {
+        "prompt": """Provide a BRIEF summary (200-300 words) with only the most important points.
+Focus on the absolute essentials and main takeaways.
+Use bullet points for clarity.
+Be concise and direct.
+Provide only the summary without showing your reasoning process.""",
+        "max_tokens": 512
+    },
+    "standard": {
+        "prompt": """Provide a comprehensive summary (500-800 words) covering:
+- Main topics and themes
+- Key points and important details
+- Overall conclusion and implications
+
+Use proper Markdown formatting with headings (##) and bullet points.
+Structure your summary logically for easy reading.
+Provide only the summary without showing your reasoning process.""",
+        "max_tokens": 1024
+    },
+    "detailed": {
+        "prompt": """Provide a DETAILED and comprehensive summary (1000-1500 words) that includes:
+- In-depth analysis of main topics and themes
+- Key points with supporting details and examples
+- Important context and background information
+- Thorough explanations of complex concepts
+- Overall conclusion and broader implications
+
+Use proper Markdown formatting with:
+- Main headings (##) for major sections
+- Subheadings (###) for subsections
+- Bullet points for lists
+- **Bold** for emphasis on key terms
+
+Provide a well-structured, comprehensive analysis.
+Provide only the summary without showing your reasoning process.""",
+        "max_tokens": 2048
+    }
+}
+
 
 class GroqService:
     """Service for interacting with Groq API"""
@@ -16,23 +75,74 @@ class GroqService:
         self.api_key = os.getenv("GROQ_API_KEY")
         if not self.api_key:
             logger.warning("GROQ_API_KEY not set. Using environment default.")
-        self.client = Groq(api_key=self.api_key) if self.api_key else Groq()
+        # 'map_reduce' covers long documents in full, 'truncate' keeps only the start
+        self.summary_mode = os.getenv("SUMMARY_MODE", "map_reduce")
+        # Generate the detailed summary first and derive shorter lengths from it
+        self.hierarchical_summaries = os.getenv("SUMMARY_HIERARCHICAL", "false").lower() == "true"
+        self.summarizer = MapReduceSummarizer(self._complete, SUMMARY_MODEL)
+        # Drops low-salience sentences locally before any summary call
+        self.compression_service = CompressionService()
+        # Sends brief summaries and simple first questions to a fast model
+        self.cascade = ModelCascade()
         logger.info("Groq API configured")
-
+    
+    @property
+    def client(self) -> AsyncGroq:
+        """Process-wide async client, so calls never block the event loop"""
+        return get_async_groq_client()
+    
     async def chat_with_pdf(self, context: str, messages: List[Dict[str, str]]) -> str:
         """
         Chat with a PDF document using provided context
-        
+
         Args:
             context: Relevant text context from the PDF (pre-chunked)
             messages: List of message dictionaries {'role': 'user'|'model', 'content': '...'}
         """
         try:
-            # Build conversation history for Groq
-            groq_messages = [
-                {
-                    "role": "system",
-                    "content": f"""You are an expert AI assistant analyzing a PDF document. Here is the relevant content from the document:
+            groq_messages = self._build_chat_messages(context, messages)
+            model = self.cascade.pick(self.cascade.simple_question(messages), CHAT_MODEL)
+            
+            answer = await self._create_completion(groq_messages, 4096, model, "chat_with_pdf")
+            if self.cascade.should_escalate(model, answer):
+                logger.info(f"chat_with_pdf: {model} answer looked unsure, retrying with {CHAT_MODEL}")
+                answer = await self._create_completion(groq_messages, 4096, CHAT_MODEL, "chat_with_pdf")
+            return answer
+        
+        except Exception as e:
+            logger.error(f"Error in chat_with_pdf: {e}")
+            raise
+    
+    async def stream_chat_with_pdf(
+        self,
+        context: str,
+        messages: List[Dict[str, str]],
+        stats: Optional[Dict] = None
+    ) -> AsyncIterator[str]:
+        """
+        Stream a chat answer as text deltas while it is generated
+
+        Args:
+            context: Relevant text context from the PDF (pre-chunked)
+            messages: List of message dictionaries {'role': 'user'|'model', 'content': '...'}
+            stats: Optional dict that receives reasoning usage when the stream ends
+
+        Yields:
+            Answer text deltas
+        """
+        groq_messages = self._build_chat_messages(context, messages)
+        # Streamed text cannot be taken back, so unsure fast answers are not escalated
+        model = self.cascade.pick(self.cascade.simple_question(messages), CHAT_MODEL)
+        
+        async for delta in self._stream_completion(groq_messages, 4096, "stream_chat_with_pdf", stats, model):
+            yield delta
+    
+    def _build_chat_messages(self, context: str, messages: List[Dict[str, str]]) -> List[Dict[str, str]]:
+        """Build the Groq conversation for a chat turn"""
+        groq_messages = [
+            {
+                "role": "system",
+                "content": f"""You are an expert AI assistant analyzing a PDF document. Here is the relevant content from the document:
 
 {context}
 
@@ -46,51 +156,91 @@ Instructions for providing excellent responses:
 3. Be conversational and helpful in your tone
 4. If the answer is in the document, provide it clearly and concisely
 5. If the information is NOT in the document:
-   - Clearly state "I don't see that specific information in this document"
+   - Clearly state "{NOT_IN_DOCUMENT}"
    - Then provide 2-3 related questions the user might ask that ARE covered in the document
    - Format suggestions as: "However, I can help you with: [suggested questions]"
 6. Do not show your reasoning process - provide only the final answer
 7. Always format your response with proper markdown for better readability"""
-                }
-            ]
+            }
+        ]
+        
+        # Add conversation history (convert 'model' role to 'assistant' for Groq)
+        for msg in messages:
+            role = "assistant" if msg['role'] == 'model' else msg['role']
+            groq_messages.append({
+                "role": role,
+                "content": msg['content']
+            })
+        
+        return groq_messages
+    
+    async def _stream_completion(
+        self,
+        groq_messages: List[Dict[str, str]],
+        max_tokens: int,
+        operation: str,
+        stats: Optional[Dict] = None,
+        model: str = CHAT_MODEL
+    ) -> AsyncIterator[str]:
+        """
+        Run a streaming completion and yield its content deltas
+
+        Reasoning blocks are removed incrementally as tokens arrive, and the
+        tokens spent inside them are logged and reported through `stats`.
+        """
+        reasoning_filter = ReasoningFilter()
+        started = time.monotonic()
+        first_token = None
+        
+        try:
+            # The slot is held until the stream ends
+            async with get_governor("groq").slot():
+                stream = await self.client.chat.completions.create(
+                    model=model,
+                    messages=groq_messages,
+                    temperature=0.6,
+                    max_completion_tokens=max_tokens,
+                    top_p=0.95,
+                    stream=True,
+                    stop=None,
+                    **self.cascade.request_options(model)
+                )
+
+                # Closing releases the HTTP response, which is what stops Groq
+                # generating when the stream is abandoned before its end
+                async with stream:
+                    async for chunk in stream:
+                        if chunk.choices and chunk.choices[0].delta.content:
+                            text = reasoning_filter.feed(chunk.choices[0].delta.content)
+                            if text:
+                                if first_token is None:
+                                    first_token = time.monotonic() - started
+                                yield text
             
-            # Add conversation history (convert 'model' role to 'assistant' for Groq)
-            for msg in messages:
-                role = "assistant" if msg['role'] == 'model' else msg['role']
-                groq_messages.append({
-                    "role": role,
-                    "content": msg['content']
-                })
+            text = reasoning_filter.flush()
+            if text:
+                yield text
             
-            # Make API call
-            completion = self.client.chat.completions.create(
-                model="qwen/qwen3-32b",
-                messages=groq_messages,
-                temperature=0.6,
-                max_completion_tokens=4096,
-                top_p=0.95,
-                stream=False,
-                stop=None
+            logger.info(
+                f"{operation}: {model} streamed in {time.monotonic() - started:.2f}s "
+                f"(first token {first_token or 0:.2f}s), {reasoning_filter.reasoning_tokens} reasoning tokens "
+                f"({reasoning_filter.reasoning_chars} chars) filtered"
             )
-            
-            response_text = completion.choices[0].message.content
-            
-            # Filter out thinking tokens if present
-            response_text = self._filter_thinking(response_text)
-            
-            return response_text
-            
+            if stats is not None:
+                stats["reasoning_tokens"] = reasoning_filter.reasoning_tokens
+                stats["reasoning_chars"] = reasoning_filter.reasoning_chars
+        
         except Exception as e:
-            logger.error(f"Error in chat_with_pdf: {e}")
+            logger.error(f"Error in {operation}: {e}")
             raise
     
     def _filter_thinking(self, text: str) -> str:
         """
         Filter out thinking/reasoning tokens from the response
-        
+
         Args:
             text: Raw response text
-            
+
         Returns:
             Filtered text with only the final answer
         """
@@ -112,92 +262,211 @@ Instructions for providing excellent responses:
         text = re.sub(r'\n\n+', '\n\n', text).strip()
         
         return text
-
+    
     async def summarize_pdf(self, pdf_text: str, length: str = "standard") -> str:
         """
         Generate a summary of the PDF document with specified length
-        
+
         Args:
             pdf_text: The full text content of the PDF
             length: Summary length - 'brief', 'standard', or 'detailed'
         """
         try:
-            # Define prompts and settings for each length
-            length_configs = {
-                "brief": {
-                    "prompt": """Provide a BRIEF summary (200-300 words) with only the most important points.
-Focus on the absolute essentials and main takeaways.
-Use bullet points for clarity.
-Be concise and direct.
-Provide only the summary without showing your reasoning process.""",
-                    "max_tokens": 512
-                },
-                "standard": {
-                    "prompt": """Provide a comprehensive summary (500-800 words) covering:
-- Main topics and themes
-- Key points and important details
-- Overall conclusion and implications
-
-Use proper Markdown formatting with headings (##) and bullet points.
-Structure your summary logically for easy reading.
-Provide only the summary without showing your reasoning process.""",
-                    "max_tokens": 1024
-                },
-                "detailed": {
-                    "prompt": """Provide a DETAILED and comprehensive summary (1000-1500 words) that includes:
-- In-depth analysis of main topics and themes
-- Key points with supporting details and examples
-- Important context and background information
-- Thorough explanations of complex concepts
-- Overall conclusion and broader implications
-
-Use proper Markdown formatting with:
-- Main headings (##) for major sections
-- Subheadings (###) for subsections
-- Bullet points for lists
-- **Bold** for emphasis on key terms
-
-Provide a well-structured, comprehensive analysis.
-Provide only the summary without showing your reasoning process.""",
-                    "max_tokens": 2048
-                }
-            }
-            
-            # Get config for requested length (default to standard if invalid)
-            config = length_configs.get(length, length_configs["standard"])
+            pdf_text = await self._summary_source(pdf_text)
+            messages, max_tokens = self._build_summary_messages(pdf_text, length)
             
-            full_prompt = f"""{config["prompt"]}
+            return await self._create_completion(messages, max_tokens, self._summary_model(length), "summarize_pdf")
+        
+        except Exception as e:
+            logger.error(f"Error in summarize_pdf: {e}")
+            raise
+    
+    async def stream_summarize_pdf(
+        self,
+        pdf_text: str,
+        length: str = "standard",
+        stats: Optional[Dict] = None
+    ) -> AsyncIterator[str]:
+        """
+        Stream a summary as text deltas while it is generated
 
-Document Content:
-{pdf_text[:30000]}... (truncated if too long)
-"""
+        Args:
+            pdf_text: The full text content of the PDF
+            length: Summary length - 'brief', 'standard', or 'detailed'
+            stats: Optional dict that receives reasoning usage when the stream ends
+
+        Yields:
+            Summary text deltas
+        """
+        pdf_text = await self._summary_source(pdf_text)
+        messages, max_tokens = self._build_summary_messages(pdf_text, length)
+        
+        async for delta in self._stream_completion(
+            messages, max_tokens, "stream_summarize_pdf", stats, self._summary_model(length)
+        ):
+            yield delta
+    
+    async def derive_summary(self, detailed_summary: str, length: str = "standard") -> str:
+        """
+        Shorten an existing detailed summary to the requested length
+        
+        Much cheaper than summarizing the document again, since the prompt is
+        only the detailed summary rather than up to 30k characters of source.
+        
+        Args:
+            detailed_summary: A 'detailed' summary of the document
+            length: Summary length - 'brief' or 'standard'
+        """
+        try:
+            messages, max_tokens = self._build_derived_summary_messages(detailed_summary, length)
             
-            completion = self.client.chat.completions.create(
-                model="qwen/qwen3-32b",
-                messages=[
-                    {
-                        "role": "system",
-                        "content": "You are a helpful AI assistant that provides clear, well-structured summaries. Do not include your reasoning process in the response."
-                    },
-                    {
-                        "role": "user",
-                        "content": full_prompt
-                    }
-                ],
+            return await self._create_completion(messages, max_tokens, self._summary_model(length), "derive_summary")
+        
+        except Exception as e:
+            logger.error(f"Error in derive_summary: {e}")
+            raise
+    
+    async def stream_derive_summary(
+        self,
+        detailed_summary: str,
+        length: str = "standard",
+        stats: Optional[Dict] = None
+    ) -> AsyncIterator[str]:
+        """
+        Stream a summary derived from an existing detailed summary
+        
+        Yields:
+            Summary text deltas
+        """
+        messages, max_tokens = self._build_derived_summary_messages(detailed_summary, length)
+        
+        async for delta in self._stream_completion(
+            messages, max_tokens, "stream_derive_summary", stats, self._summary_model(length)
+        ):
+            yield delta
+    
+    async def _summary_source(self, pdf_text: str) -> str:
+        """
+        Text the final summary prompt is built from
+        
+        The text is first compressed extractively when INPUT_COMPRESSION_RATIO
+        is set. Documents still longer than one prompt are condensed into
+        section summaries in map-reduce mode, so later pages are not dropped.
+        """
+        pdf_text = await self.compression_service.compress_async(pdf_text)
+        
+        if self.summary_mode != "map_reduce" or len(pdf_text) <= SINGLE_PASS_CHARS:
+            return pdf_text
+        
+        condensed = await self.summarizer.condense(
+            pdf_text, SINGLE_PASS_CHARS - len(CONDENSED_SOURCE_HEADING) - 2
+        )
+        return f"{CONDENSED_SOURCE_HEADING}\n\n{condensed}"
+    
+    async def _complete(self, instructions: str, text: str, max_tokens: int) -> str:
+        """Run one summary-style completion over a piece of text"""
+        messages = [
+            {"role": "system", "content": SUMMARY_SYSTEM_PROMPT},
+            {"role": "user", "content": f"{instructions}\n\nText:\n{text}"}
+        ]
+        return await self._create_completion(messages, max_tokens, SUMMARY_MODEL, "summary_section")
+    
+    def _summary_model(self, length: str) -> str:
+        """Brief summaries are cheap enough for the fast model"""
+        return self.cascade.pick(length == "brief", SUMMARY_MODEL)
+    
+    async def _create_completion(
+        self,
+        messages: List[Dict[str, str]],
+        max_tokens: int,
+        model: str,
+        operation: str
+    ) -> str:
+        """Run a non-streaming completion and return its text without reasoning"""
+        started = time.monotonic()
+        async with get_governor("groq").slot():
+            completion = await self.client.chat.completions.create(
+                model=model,
+                messages=messages,
                 temperature=0.6,
-                max_completion_tokens=config["max_tokens"],
+                max_completion_tokens=max_tokens,
                 top_p=0.95,
                 stream=False,
-                stop=None
+                stop=None,
+                **self.cascade.request_options(model)
             )
-            
-            response_text = completion.choices[0].message.content
-            
-            # Filter out thinking tokens if present
-            response_text = self._filter_thinking(response_text)
-            
-            return response_text
-            
-        except Exception as e:
-            logger.error(f"Error in summarize_pdf: {e}")
-            raise
+        logger.info(f"{operation}: {model} answered in {time.monotonic() - started:.2f}s")
+        
+        response_text = completion.choices[0].message.content
+        
+        # Filter out thinking tokens if present
+        return self._filter_thinking(response_text)
+    
+    def summary_cache_key(self, document_hash: str, length: str) -> str:
+        """
+        Cache key for a summary of a document
+
+        Covers everything that changes the output, so the same PDF uploaded
+        by different users shares one entry.
+        """
+        return (
+            f"{document_hash}:{length}:{self._summary_model(length)}:{self.summary_mode}:"
+            f"r{self.compression_service.ratio:g}:v{SUMMARY_PROMPT_VERSION}"
+        )
+    
+    def _build_summary_messages(self, pdf_text: str, length: str) -> Tuple[List[Dict[str, str]], int]:
+        """
+        Build the summary prompt for the requested length
+
+        Returns:
+            Tuple of (messages, max_completion_tokens)
+        """
+        # Get config for requested length (default to standard if invalid)
+        config = SUMMARY_LENGTH_CONFIGS.get(length, SUMMARY_LENGTH_CONFIGS["standard"])
+        
+        full_prompt = f"""{config["prompt"]}
+
+Document Content:
+{pdf_text[:SINGLE_PASS_CHARS]}... (truncated if too long)
+"""
+        
+        messages = [
+            {
+                "role": "system",
+                "content": SUMMARY_SYSTEM_PROMPT
+            },
+            {
+                "role": "user",
+                "content": full_prompt
+            }
+        ]
+        
+        return messages, config["max_tokens"]
+    
+    def _build_derived_summary_messages(self, detailed_summary: str, length: str) -> Tuple[List[Dict[str, str]], int]:
+        """
+        Build the prompt that shortens a detailed summary to the requested length
+        
+        Returns:
+            Tuple of (messages, max_completion_tokens)
+        """
+        config = SUMMARY_LENGTH_CONFIGS.get(length, SUMMARY_LENGTH_CONFIGS["standard"])
+        
+        full_prompt = f"""{config["prompt"]}
+
+Base it only on this detailed summary of the document:
+{detailed_summary}
+"""
+        
+        messages = [
+            {
+                "role": "system",
+                "content": SUMMARY_SYSTEM_PROMPT
+            },
+            {
+                "role": "user",
+                "content": full_prompt
+            }
+        ]
+        
+        return messages, config["max_tokens"]
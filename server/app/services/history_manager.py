@@ -0,0 +1,169 @@
+"""
+Token budgeting of chat history with a rolling summary of older turns
+"""
+import json
+import os
+import logging
+from typing import Awaitable, Callable, Dict, List, Optional
+from fastapi.concurrency import run_in_threadpool
+from app.services.cache_service import get_cache
+from app.services.chat_history_service import ChatHistoryService
+from app.utils.hashing import content_hash
+
+logger = logging.getLogger(__name__)
+
+FOLD_PROMPT = """You maintain a running summary of a study conversation about a document.
+Update the existing summary with the new exchanges below. Keep the questions asked, the facts and explanations given, and anything the student said they understood or struggled with.
+Use concise bullet points.
+Provide only the updated summary without showing your reasoning process."""
+
+SUMMARY_INTRO = "Summary of our earlier conversation about this document:"
+SUMMARY_ACK = "Understood, I'll keep that earlier discussion in mind."
+
+# complete(instructions, text, max_tokens) -> generated text
+Completion = Callable[[str, str, int], Awaitable[str]]
+
+
+class HistoryManager:
+    """
+    Keeps the chat history sent to the LLM within a fixed token budget
+
+    The last CHAT_HISTORY_TURNS exchanges are sent verbatim, as far as
+    CHAT_HISTORY_TOKENS allows. Older messages are folded into a rolling
+    summary that is updated incrementally: each fold only summarizes the
+    messages the previous summary did not cover. Summaries are cached per
+    session and saved on the chat session, so other workers and restarts
+    continue from them instead of re-reading the whole conversation.
+    """
+
+    def __init__(self):
+        self.max_turns = int(os.getenv("CHAT_HISTORY_TURNS", 6))
+        self.max_tokens = int(os.getenv("CHAT_HISTORY_TOKENS", 3000))
+        self.summary_tokens = int(os.getenv("CHAT_HISTORY_SUMMARY_TOKENS", 500))
+        self.cache = get_cache("chat_history_summary")
+
+    def estimate_tokens(self, text: str) -> int:
+        """Rough token count (about four characters per token)"""
+        return len(text) // 4
+
+    async def prepare(
+        self,
+        messages: List[Dict[str, str]],
+        complete: Completion,
+        session_key: str,
+        chat_history_service: Optional[ChatHistoryService] = None
+    ) -> List[Dict[str, str]]:
+        """
+        Fit a conversation into the history budget
+
+        Args:
+            messages: Full conversation, ending with the current question
+            complete: Completion used to fold older messages into the summary
+            session_key: Chat session id, or another stable identity for
+                conversations that are not saved
+            chat_history_service: Stores the summary on the session when given
+
+        Returns:
+            Messages to send: an optional summary exchange, the recent
+            messages that fit, and the current question
+        """
+        history, current = messages[:-1], messages[-1:]
+        if len(history) <= 2 * self.max_turns and self._tokens(history) <= self.max_tokens:
+            return messages
+
+        # Recent messages are kept whole, newest first, within what the summary leaves
+        keep_budget = self.max_tokens - self.summary_tokens - self._tokens(self._summary_exchange(""))
+        start = len(history)
+        used = 0
+        while start > 0 and len(history) - start < 2 * self.max_turns:
+            cost = self._tokens(history[start - 1:start])
+            if used + cost > keep_budget:
+                break
+            used += cost
+            start -= 1
+
+        if start < len(history) and history[start].get('role') != 'user':
+            # Resume on a question so user and model turns still alternate
+            used -= self._tokens(history[start:start + 1])
+            start += 1
+
+        older, recent = history[:start], history[start:]
+        if not older:
+            return recent + current
+
+        summary = await self._summarize(older, complete, session_key, chat_history_service)
+        logger.info(
+            f"Chat history: {len(older)} older messages folded into a summary, {len(recent)} kept "
+            f"(~{used} of {self.max_tokens} tokens)"
+        )
+        if not summary:
+            return recent + current
+
+        return self._summary_exchange(summary) + recent + current
+
+    def _summary_exchange(self, summary: str) -> List[Dict[str, str]]:
+        return [
+            {"role": "user", "content": f"{SUMMARY_INTRO}\n{summary}"},
+            {"role": "model", "content": SUMMARY_ACK}
+        ]
+
+    async def _summarize(
+        self,
+        older: List[Dict[str, str]],
+        complete: Completion,
+        session_key: str,
+        chat_history_service: Optional[ChatHistoryService]
+    ) -> Optional[str]:
+        """Rolling summary covering exactly the `older` messages"""
+        record = await self._load(session_key, chat_history_service)
+
+        previous = ""
+        covered = 0
+        if record and record["covered"] <= len(older) and record["hash"] == self._hash(older[:record["covered"]]):
+            previous, covered = record["summary"], record["covered"]
+        if covered == len(older):
+            return previous
+
+        transcript = "\n\n".join(
+            f"{'Student' if msg['role'] == 'user' else 'Assistant'}: {msg['content']}" for msg in older[covered:]
+        )
+        try:
+            summary = (await complete(
+                FOLD_PROMPT,
+                f"Existing summary:\n{previous or '(none yet)'}\n\nNew exchanges:\n{transcript}",
+                self.summary_tokens
+            )).strip()
+        except Exception as e:
+            # Dropping the older turns still keeps the prompt within budget
+            logger.warning(f"Could not fold chat history into a summary: {e}")
+            return previous or None
+
+        # The model may overrun its brief; the budget must hold regardless
+        summary = summary[:self.summary_tokens * 4]
+        record = {"summary": summary, "covered": len(older), "hash": self._hash(older)}
+        self.cache.set(session_key, json.dumps(record))
+        if chat_history_service is not None:
+            await run_in_threadpool(chat_history_service.save_history_summary, session_key, record)
+        return summary
+
+    async def _load(
+        self,
+        session_key: str,
+        chat_history_service: Optional[ChatHistoryService]
+    ) -> Optional[Dict]:
+        cached = self.cache.get(session_key)
+        if cached is not None:
+            return json.loads(cached)
+        if chat_history_service is not None:
+            record = await run_in_threadpool(chat_history_service.get_history_summary, session_key)
+            if record:
+                self.cache.set(session_key, json.dumps(record))
+            return record
+        return None
+
+    def _tokens(self, messages: List[Dict[str, str]]) -> int:
+        # A few tokens of per-message overhead on top of the content
+        return sum(self.estimate_tokens(msg.get('content', '')) + 4 for msg in messages)
+
+    def _hash(self, messages: List[Dict[str, str]]) -> str:
+        return content_hash(*(f"{msg.get('role')}:{msg.get('content', '')}" for msg in messages))
@@ -0,0 +1,359 @@
+"""
+Latency-aware routing of AI requests across LLM providers
+"""
+import asyncio
+import math
+import os
+import time
+import logging
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple
+from app.core.llm_governor import Overloaded
+
+logger = logging.getLogger(__name__)
+
+
+class ProviderStats:
+    """Exponentially weighted latency and error rate for one provider and operation"""
+
+    def __init__(self, alpha: float = 0.2):
+        self.alpha = alpha
+        self.samples = 0
+        self.latency = 0.0
+        self.latency_variance = 0.0
+        self.error_rate = 0.0
+        self.last_failure = 0.0
+
+    def record(self, latency: Optional[float], ok: bool):
+        """Add one observation; latency is None for failures"""
+        self.error_rate += self.alpha * ((0.0 if ok else 1.0) - self.error_rate)
+        if not ok:
+            self.last_failure = time.monotonic()
+        if latency is None:
+            return
+
+        if self.samples == 0:
+            self.latency = latency
+        else:
+            delta = latency - self.latency
+            self.latency += self.alpha * delta
+            self.latency_variance = (1 - self.alpha) * (self.latency_variance + self.alpha * delta * delta)
+        self.samples += 1
+
+    def healthy(self, max_error_rate: float, retry_after: float) -> bool:
+        """Within the error budget, or failing long enough ago to probe again"""
+        return self.error_rate <= max_error_rate or time.monotonic() - self.last_failure > retry_after
+
+    @property
+    def p95(self) -> float:
+        """Normal approximation of the 95th percentile latency"""
+        return self.latency + 1.645 * math.sqrt(self.latency_variance)
+
+    def to_dict(self) -> Dict[str, float]:
+        return {
+            "samples": self.samples,
+            "latency": round(self.latency, 3),
+            "p95": round(self.p95, 3),
+            "error_rate": round(self.error_rate, 3)
+        }
+
+
+class Provider:
+    """An AI service plus its observed performance per operation"""
+
+    def __init__(self, name: str, service: Any):
+        self.name = name
+        self.service = service
+        self.stats: Dict[str, ProviderStats] = {}
+
+    def stats_for(self, operation: str) -> ProviderStats:
+        if operation not in self.stats:
+            self.stats[operation] = ProviderStats()
+        return self.stats[operation]
+
+
+class LLMRouter:
+    """
+    Sends each request to the fastest healthy provider, hedging slow ones
+
+    Providers are ranked per operation by EWMA latency, with unmeasured
+    ones tried first so every provider gets measured. One whose EWMA error
+    rate exceeds LLM_MAX_ERROR_RATE is only used when nothing else is
+    healthy, until LLM_RETRY_AFTER_SECONDS without failures lets it be
+    probed again. If the chosen provider has not answered (or, for streams,
+    produced its first delta) within its p95 latency, the same request is
+    sent to the next provider and whichever finishes first wins; the other
+    is cancelled. A provider that fails outright fails over immediately.
+    Full summaries are never hedged: for long documents they are a whole
+    map-reduce of calls, and a hedge would pay for a second one.
+
+    Exposes the same interface as GroqService, so routes use it unchanged.
+    """
+
+    def __init__(self, providers: List[Provider]):
+        """
+        Args:
+            providers: Providers in order of preference before any latency is known
+        """
+        if not providers:
+            raise ValueError("LLMRouter needs at least one provider")
+        self.providers = providers
+        self.max_error_rate = float(os.getenv("LLM_MAX_ERROR_RATE", 0.5))
+        self.retry_after = float(os.getenv("LLM_RETRY_AFTER_SECONDS", 30))
+        # Hedge delay while a provider has too few samples for a p95 estimate
+        self.default_hedge_after = float(os.getenv("LLM_HEDGE_AFTER_SECONDS", 10))
+        self.min_hedge_samples = 5
+
+    @property
+    def primary(self) -> Any:
+        return self.providers[0].service
+
+    @property
+    def hierarchical_summaries(self) -> bool:
+        return getattr(self.primary, "hierarchical_summaries", False)
+
+    def summary_cache_key(self, document_hash: str, length: str, provider: Optional[str] = None) -> str:
+        """
+        Cache key for a summary generated by `provider`, the primary by default
+
+        The primary's key also identifies a summary request while it is in
+        flight, whichever provider ends up answering it.
+        """
+        service = self.primary
+        for candidate in self.providers:
+            if candidate.name == provider:
+                service = candidate.service
+        return service.summary_cache_key(document_hash, length)
+
+    def summary_cache_keys(self, document_hash: str, length: str) -> List[str]:
+        """Keys a cached summary may be under, one per provider, primary first"""
+        keys = [provider.service.summary_cache_key(document_hash, length) for provider in self.providers]
+        return list(dict.fromkeys(keys))
+
+    def stats(self) -> Dict[str, Dict[str, Dict[str, float]]]:
+        return {
+            provider.name: {operation: stats.to_dict() for operation, stats in provider.stats.items()}
+            for provider in self.providers
+        }
+
+    async def chat_with_pdf(self, context: str, messages: List[Dict[str, str]]) -> str:
+        return await self._call("chat", lambda service: service.chat_with_pdf(context, messages))
+
+    async def summarize_pdf(self, pdf_text: str, length: str = "standard", stats: Optional[Dict] = None) -> str:
+        """`stats`, when given, receives the name of the provider that answered"""
+        return await self._call(
+            f"summary:{length}", lambda service: service.summarize_pdf(pdf_text, length=length),
+            stats=stats, hedge=False
+        )
+
+    async def derive_summary(
+        self,
+        detailed_summary: str,
+        length: str = "standard",
+        stats: Optional[Dict] = None
+    ) -> str:
+        """`stats`, when given, receives the name of the provider that answered"""
+        return await self._call(
+            f"derive:{length}", lambda service: service.derive_summary(detailed_summary, length=length),
+            stats=stats
+        )
+
+    async def complete(self, instructions: str, text: str, max_tokens: int) -> str:
+        """One summary-style completion over a piece of text, e.g. older chat turns"""
+        return await self._call("complete", lambda service: service._complete(instructions, text, max_tokens))
+
+    def stream_chat_with_pdf(
+        self,
+        context: str,
+        messages: List[Dict[str, str]],
+        stats: Optional[Dict] = None
+    ) -> AsyncIterator[str]:
+        return self._stream(
+            "stream_chat", lambda service: service.stream_chat_with_pdf(context, messages, stats=stats), stats=stats
+        )
+
+    def stream_summarize_pdf(
+        self,
+        pdf_text: str,
+        length: str = "standard",
+        stats: Optional[Dict] = None
+    ) -> AsyncIterator[str]:
+        return self._stream(
+            f"stream_summary:{length}",
+            lambda service: service.stream_summarize_pdf(pdf_text, length=length, stats=stats),
+            stats=stats, hedge=False
+        )
+
+    def stream_derive_summary(
+        self,
+        detailed_summary: str,
+        length: str = "standard",
+        stats: Optional[Dict] = None
+    ) -> AsyncIterator[str]:
+        return self._stream(
+            f"stream_derive:{length}",
+            lambda service: service.stream_derive_summary(detailed_summary, length=length, stats=stats),
+            stats=stats
+        )
+
+    def _rank(self, operation: str) -> List[Provider]:
+        """Healthy providers first, then unmeasured ones, then by EWMA latency"""
+        def key(item: Tuple[int, Provider]):
+            index, provider = item
+            stats = provider.stats_for(operation)
+            unhealthy = not stats.healthy(self.max_error_rate, self.retry_after)
+            return (unhealthy, stats.latency if stats.samples else 0.0, index)
+
+        return [provider for _, provider in sorted(enumerate(self.providers), key=key)]
+
+    def _hedge_after(self, provider: Provider, operation: str) -> float:
+        stats = provider.stats_for(operation)
+        if stats.samples < self.min_hedge_samples:
+            return self.default_hedge_after
+        return stats.p95
+
+    async def _race(
+        self,
+        operation: str,
+        start: Callable[[Provider], Awaitable[Any]],
+        cleanup: Optional[Callable[[Provider], Awaitable[None]]] = None,
+        hedge: bool = True
+    ) -> Tuple[Provider, Any]:
+        """
+        Run `start` on the best provider, hedging and failing over to the next ones
+
+        Args:
+            hedge: Whether a slow attempt may be raced against another
+                provider; failover after an error happens either way
+
+        Returns:
+            Tuple of (winning provider, its result)
+        """
+        ranked = self._rank(operation)
+        tasks: Dict[asyncio.Task, Provider] = {}
+        started_at: Dict[asyncio.Task, float] = {}
+        next_index = 0
+        last_error: Optional[BaseException] = None
+        won = False
+
+        async def timed(provider: Provider):
+            started = time.monotonic()
+            try:
+                result = await start(provider)
+            except (asyncio.CancelledError, Overloaded):
+                # Shed by our own governor, not a provider failure
+                raise
+            except Exception:
+                provider.stats_for(operation).record(None, ok=False)
+                raise
+            provider.stats_for(operation).record(time.monotonic() - started, ok=True)
+            return result
+
+        def launch():
+            nonlocal next_index
+            provider = ranked[next_index]
+            next_index += 1
+            task = asyncio.create_task(timed(provider))
+            tasks[task] = provider
+            started_at[task] = time.monotonic()
+            return provider
+
+        primary = launch()
+        try:
+            while tasks:
+                can_hedge = hedge and next_index < len(ranked) and len(tasks) == 1
+                timeout = self._hedge_after(primary, operation) if can_hedge else None
+                done, _ = await asyncio.wait(tasks, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+
+                if not done:
+                    backup = launch()
+                    logger.info(f"{operation}: {primary.name} exceeded {timeout:.1f}s, hedging with {backup.name}")
+                    continue
+
+                for task in done:
+                    provider = tasks.pop(task)
+                    if task.exception() is None:
+                        won = True
+                        return provider, task.result()
+                    last_error = task.exception()
+                    logger.warning(f"{operation} failed on {provider.name}: {last_error}")
+
+                if not tasks and next_index < len(ranked):
+                    primary = launch()
+
+            raise last_error
+        finally:
+            # Cancel the loser, or every attempt if the caller itself was cancelled
+            for task, provider in tasks.items():
+                task.cancel()
+                if won:
+                    # A loser was at least this slow; recording it keeps it from
+                    # looking unmeasured, and so preferred, forever
+                    provider.stats_for(operation).record(time.monotonic() - started_at[task], ok=True)
+            for task, provider in tasks.items():
+                try:
+                    await task
+                except BaseException:
+                    pass
+                if cleanup is not None:
+                    await cleanup(provider)
+
+    async def _call(
+        self,
+        operation: str,
+        invoke: Callable[[Any], Awaitable[Any]],
+        stats: Optional[Dict] = None,
+        hedge: bool = True
+    ) -> Any:
+        provider, result = await self._race(operation, lambda provider: invoke(provider.service), hedge=hedge)
+        if stats is not None:
+            stats["provider"] = provider.name
+        return result
+
+    async def _stream(
+        self,
+        operation: str,
+        open_stream: Callable[[Any], AsyncIterator[str]],
+        stats: Optional[Dict] = None,
+        hedge: bool = True
+    ) -> AsyncIterator[str]:
+        """
+        Stream from the provider that produces a first delta soonest
+
+        Latency for streams is time to first delta; hedging and failover
+        only apply until then, after which the winner's stream is relayed.
+        """
+        streams: Dict[str, AsyncIterator[str]] = {}
+
+        async def first_delta(provider: Provider) -> Optional[str]:
+            stream = streams[provider.name] = open_stream(provider.service)
+            try:
+                return await stream.__anext__()
+            except StopAsyncIteration:
+                return None
+
+        async def close(provider: Provider):
+            stream = streams.pop(provider.name, None)
+            if stream is not None and hasattr(stream, "aclose"):
+                try:
+                    await stream.aclose()
+                except Exception:
+                    pass
+
+        provider, first = await self._race(operation, first_delta, cleanup=close, hedge=hedge)
+        stream = streams.pop(provider.name)
+        if stats is not None:
+            stats["provider"] = provider.name
+        try:
+            if first is None:
+                return
+            yield first
+            async for delta in stream:
+                yield delta
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            provider.stats_for(operation).record(None, ok=False)
+            raise
+        finally:
+            if hasattr(stream, "aclose"):
+                await stream.aclose()
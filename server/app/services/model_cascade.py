@@ -0,0 +1,83 @@
+"""
+Task-aware choice between a small fast model and the large default models
+"""
+import os
+import re
+from typing import Any, Dict, List
+
+# Questions that usually need reasoning across the document rather than a lookup
+COMPLEX_QUESTION = re.compile(
+    r'\b(why|how|explain|compare|contrast|analy[sz]e|evaluate|derive|prove|calculate|'
+    r'summari[sz]e|difference|relationship|implications?)\b',
+    re.IGNORECASE
+)
+
+# What the chat prompt tells a model to say when the document lacks the answer
+NOT_IN_DOCUMENT = "I don't see that specific information in this document"
+
+# Phrases a small model uses when it could not answer from the context
+LOW_CONFIDENCE = re.compile(
+    re.escape(NOT_IN_DOCUMENT) + "|"
+    r"(i don[’']?t know|i do not know|i (?:don[’']?t|do not) see (?:that|this|any)|not sure|"
+    r"unable to (?:find|determine|answer)|"
+    r"cannot (?:find|determine|answer)|does not (?:mention|say|specify)|"
+    r"not (?:mentioned|provided|specified|stated) in)",
+    re.IGNORECASE
+)
+
+
+def unsure_answer(answer: str) -> bool:
+    """Whether an answer is empty or says the context did not contain what was asked"""
+    return not (answer or '').strip() or bool(LOW_CONFIDENCE.search(answer))
+
+
+class ModelCascade:
+    """
+    Routes cheap requests to a fast model and everything else to the large one
+
+    Callers decide what counts as cheap for their task (brief summaries,
+    short pages) or use `simple_question` for chat. Non-streaming answers
+    from the fast model that come back empty or hedging can be retried on
+    the large model via `should_escalate`. The fast model always runs with
+    reasoning disabled; the large models use LLM_REASONING_EFFORT if set.
+    """
+
+    def __init__(self):
+        self.enabled = os.getenv("LLM_CASCADE", "false").lower() == "true"
+        self.fast_model = os.getenv("LLM_FAST_MODEL", "llama-3.1-8b-instant")
+        self.chat_max_words = int(os.getenv("LLM_FAST_CHAT_MAX_WORDS", 12))
+        self.reasoning_effort = os.getenv("LLM_REASONING_EFFORT") or None
+
+    def pick(self, cheap: bool, large_model: str) -> str:
+        """The fast model for cheap tasks when the cascade is on, otherwise `large_model`"""
+        return self.fast_model if self.enabled and cheap else large_model
+
+    def simple_question(self, messages: List[Dict[str, str]]) -> bool:
+        """
+        Whether a chat turn looks like a simple lookup
+
+        Only short first questions without words that signal explanation or
+        comparison qualify; follow-ups depend on context a small model
+        handles poorly.
+        """
+        if len(messages) != 1:
+            return False
+
+        question = messages[-1].get('content', '')
+        return len(question.split()) <= self.chat_max_words and not COMPLEX_QUESTION.search(question)
+
+    def should_escalate(self, model: str, answer: str) -> bool:
+        """Whether a fast-model answer is too unsure to return"""
+        if not self.enabled or model != self.fast_model:
+            return False
+        return unsure_answer(answer)
+
+    def request_options(self, model: str) -> Dict[str, Any]:
+        """Extra completion arguments for a model, e.g. turning Qwen3 reasoning off"""
+        if not model.startswith("qwen/qwen3"):
+            return {}
+        if model == self.fast_model:
+            return {"reasoning_effort": "none"}
+        if self.reasoning_effort:
+            return {"reasoning_effort": self.reasoning_effort}
+        return {}
@@ -0,0 +1,174 @@
+"""
+Speculative background summaries for freshly extracted PDFs
+"""
+import asyncio
+import os
+import time
+import logging
+from collections import defaultdict, deque
+from typing import Deque, Dict, Optional, Set
+from fastapi.concurrency import run_in_threadpool
+from app.core.llm_governor import BackgroundWork, background
+from app.services.cache_service import get_cache
+from app.utils.hashing import file_hash
+
+logger = logging.getLogger(__name__)
+
+
+class SummaryPrecomputeService:
+    """
+    Generates the default summary in the background right after extraction
+
+    Users usually ask for a summary within minutes of uploading, so the
+    result is written to the summary cache before they click. Jobs run
+    behind a small semaphore and their LLM calls only take governor slots
+    no request is waiting for; each tenant has a rolling budget of
+    speculative jobs, and an in-flight job can be attached to by the
+    summary endpoint, which raises it to normal priority, or cancelled.
+    """
+
+    def __init__(self, ai_service):
+        """
+        Args:
+            ai_service: Summary provider, also used to build cache keys
+        """
+        self.ai_service = ai_service
+        self.cache = get_cache("summary")
+        self.enabled = os.getenv("SUMMARY_PRECOMPUTE", "false").lower() == "true"
+        # Hierarchical mode derives every other length from the detailed summary
+        self.length = (
+            "detailed" if getattr(ai_service, "hierarchical_summaries", False)
+            else os.getenv("SUMMARY_PRECOMPUTE_LENGTH", "standard")
+        )
+        self.concurrency = int(os.getenv("SUMMARY_PRECOMPUTE_CONCURRENCY", 1))
+        self.budget = int(os.getenv("SUMMARY_PRECOMPUTE_BUDGET", 20))
+        self.budget_window = float(os.getenv("SUMMARY_PRECOMPUTE_BUDGET_WINDOW", 24 * 3600))
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._tasks: Dict[str, asyncio.Task] = {}  # cache_key -> task
+        self._jobs: Dict[str, str] = {}  # job_id -> cache_key
+        self._started: Set[str] = set()  # cache keys whose generation is running
+        self._work: Dict[str, BackgroundWork] = {}  # cache_key -> priority of its LLM calls
+        self._usage: Dict[str, Deque[float]] = defaultdict(deque)
+
+    async def schedule(self, job_id: str, user_id: Optional[str], pdf_path: str, full_text: str) -> bool:
+        """
+        Start a speculative summary for an extracted job
+
+        Returns:
+            True if a background job was started
+        """
+        if not self.enabled or not full_text.strip():
+            return False
+
+        # Hashing the PDF and reading SQLite both block, so they run off the loop
+        document_hash = await run_in_threadpool(file_hash, pdf_path)
+        cache_key = self.ai_service.summary_cache_key(document_hash, self.length)
+        if cache_key in self._tasks or await run_in_threadpool(self._is_cached, document_hash):
+            return False
+        if cache_key in self._tasks:
+            # Scheduled by another extraction while the cache was checked
+            return False
+
+        tenant = user_id or "anonymous"
+        if not self._take_budget(tenant):
+            logger.info(f"Skipping summary precompute for job {job_id}: budget spent for {tenant}")
+            return False
+
+        task = asyncio.create_task(self._run(cache_key, document_hash, full_text))
+        self._tasks[cache_key] = task
+        self._jobs[job_id] = cache_key
+        task.add_done_callback(lambda t: self._finish(job_id, cache_key, t))
+
+        logger.info(f"Scheduled {self.length} summary precompute for job {job_id}")
+        return True
+
+    async def attach(self, cache_key: str) -> Optional[str]:
+        """
+        Wait for an in-flight precompute of this summary
+
+        A job still queued behind other speculative work is cancelled instead,
+        since the caller generating it directly is faster.
+
+        Returns:
+            The summary, or None if there is no usable job
+        """
+        task = self._tasks.get(cache_key)
+        if task is None:
+            return None
+
+        if cache_key not in self._started:
+            task.cancel()
+            return None
+
+        logger.info("Attaching to in-flight summary precompute")
+        # Someone is waiting now, so the job no longer yields to other requests
+        self._work[cache_key].promote()
+        try:
+            # Shielded, so a disconnecting caller does not cancel the shared job
+            return await asyncio.shield(task)
+        except asyncio.CancelledError:
+            if task.cancelled():
+                return None
+            raise
+        except Exception:
+            return None
+
+    def cancel(self, job_id: str) -> bool:
+        """Cancel a job's speculative summary, returning whether one was running"""
+        cache_key = self._jobs.get(job_id)
+        task = self._tasks.get(cache_key) if cache_key else None
+        if task is None or task.done():
+            return False
+        task.cancel()
+        logger.info(f"Cancelled summary precompute for job {job_id}")
+        return True
+
+    def cancel_all(self):
+        """Cancel every speculative summary, e.g. on shutdown"""
+        for task in list(self._tasks.values()):
+            task.cancel()
+
+    async def _run(self, cache_key: str, document_hash: str, full_text: str) -> str:
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+
+        async with self._semaphore:
+            self._started.add(cache_key)
+            stats = {}
+            with background() as work:
+                self._work[cache_key] = work
+                summary = await self.ai_service.summarize_pdf(full_text, length=self.length, stats=stats)
+
+        if summary:
+            # Keyed by the provider that wrote it; attached callers get it directly
+            self.cache.set(
+                self.ai_service.summary_cache_key(document_hash, self.length, stats.get("provider")), summary
+            )
+        return summary
+
+    def _finish(self, job_id: str, cache_key: str, task: asyncio.Task):
+        self._tasks.pop(cache_key, None)
+        self._jobs.pop(job_id, None)
+        self._started.discard(cache_key)
+        self._work.pop(cache_key, None)
+
+        if not task.cancelled() and task.exception() is not None:
+            logger.warning(f"Summary precompute failed for job {job_id}: {task.exception()}")
+
+    def _is_cached(self, document_hash: str) -> bool:
+        return any(
+            self.cache.get(key) is not None for key in self.ai_service.summary_cache_keys(document_hash, self.length)
+        )
+
+    def _take_budget(self, tenant: str) -> bool:
+        """Count a job against the tenant's rolling budget if it has room"""
+        now = time.monotonic()
+        usage = self._usage[tenant]
+        while usage and usage[0] <= now - self.budget_window:
+            usage.popleft()
+
+        if len(usage) >= self.budget:
+            return False
+
+        usage.append(now)
+        return True
@@ -0,0 +1,156 @@
+"""
+Map-reduce summarization so long documents are covered beyond one prompt
+"""
+import asyncio
+import os
+import logging
+from typing import Awaitable, Callable, List, Optional
+from app.services.cache_service import get_cache
+from app.services.chunking_service import ChunkingService
+from app.utils.hashing import content_hash
+
+logger = logging.getLogger(__name__)
+
+# Characters a single summary prompt is given before switching to map-reduce
+SINGLE_PASS_CHARS = 30000
+
+MAP_PROMPT = """Summarize this section of a longer document.
+Keep the key points, definitions, names, numbers and conclusions so this summary can later be combined with summaries of the other sections.
+Use concise bullet points.
+Provide only the summary without showing your reasoning process."""
+
+COMBINE_PROMPT = """Combine these summaries of consecutive sections of a document into one summary.
+Keep the key points, definitions, names, numbers and conclusions, and keep the order of the sections.
+Use concise bullet points.
+Provide only the summary without showing your reasoning process."""
+
+SHORTEN_PROMPT = """Shorten this summary of one part of a document to at most {chars} characters.
+Keep the most important points, names, numbers and conclusions.
+Use concise bullet points.
+Provide only the summary without showing your reasoning process."""
+
+# complete(instructions, text, max_tokens) -> generated text
+Completion = Callable[[str, str, int], Awaitable[str]]
+
+
+class MapReduceSummarizer:
+    """
+    Summarizes sections concurrently, then combines the partial summaries
+
+    Every section summary is cached by its content hash, instructions and
+    model. Section boundaries are content-defined, so re-uploading an edited
+    document only re-summarizes the sections that changed.
+    """
+
+    def __init__(
+        self,
+        complete: Completion,
+        model: str,
+        section_chars: int = None,
+        max_concurrency: int = None,
+        map_max_tokens: int = 1024
+    ):
+        """
+        Args:
+            complete: Async callable running one completion for the provider
+            model: Model name, part of every cache key
+            section_chars: Maximum characters per mapped section
+            max_concurrency: Section summaries generated at once
+            map_max_tokens: Completion budget for each section summary
+        """
+        self.complete = complete
+        self.model = model
+        self.section_chars = section_chars or int(os.getenv("SUMMARY_SECTION_CHARS", 12000))
+        self.max_concurrency = max_concurrency or int(os.getenv("SUMMARY_MAP_CONCURRENCY", 4))
+        self.map_max_tokens = map_max_tokens
+        self.cache = get_cache("summary_section")
+
+    async def condense(self, text: str, limit: int = SINGLE_PASS_CHARS) -> str:
+        """
+        Reduce a document to section summaries that fit in one prompt
+
+        Text that already fits is returned unchanged. Otherwise sections are
+        summarized in parallel and, if their summaries are still too long,
+        combined in further passes. Summaries too long to combine in pairs
+        are each shortened to their share of the limit.
+
+        Returns:
+            Text of at most roughly `limit` characters covering the whole document
+        """
+        if len(text) <= limit:
+            return text
+
+        chunking_service = ChunkingService(chunk_size=self.section_chars, overlap=0, boundaries="content")
+        sections = chunking_service.create_chunks(text)
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        partials = await self._summarize_all(sections, MAP_PROMPT, semaphore)
+        logger.info(f"Mapped {len(text)} characters into {len(partials)} section summaries")
+
+        passes = 0
+        shortened = False
+        while len(self._join(partials)) > limit and len(partials) > 1:
+            groups = self._group(partials, limit)
+            if len(groups) == len(partials):
+                if shortened:
+                    break
+                # No two summaries fit in one prompt, so combining cannot shrink them;
+                # shorten each to its share of the limit instead
+                share = limit // len(partials) - 2
+                partials = await self._summarize_all(
+                    partials, SHORTEN_PROMPT.format(chars=share), semaphore, max_tokens=max(1, share // 4)
+                )
+                shortened = True
+            else:
+                partials = await self._summarize_all([self._join(group) for group in groups], COMBINE_PROMPT, semaphore)
+            passes += 1
+
+        if passes:
+            logger.info(f"Combined section summaries in {passes} reduce passes")
+
+        return self._join(partials)[:limit]
+
+    async def _summarize_all(
+        self,
+        texts: List[str],
+        instructions: str,
+        semaphore: asyncio.Semaphore,
+        max_tokens: Optional[int] = None
+    ) -> List[str]:
+        return list(await asyncio.gather(
+            *(self._summarize_part(text, instructions, semaphore, max_tokens) for text in texts)
+        ))
+
+    async def _summarize_part(
+        self,
+        text: str,
+        instructions: str,
+        semaphore: asyncio.Semaphore,
+        max_tokens: Optional[int] = None
+    ) -> str:
+        key = f"{content_hash(instructions, text)}:{self.model}"
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached
+
+        async with semaphore:
+            summary = await self.complete(instructions, text, max_tokens or self.map_max_tokens)
+
+        if summary:
+            self.cache.set(key, summary)
+        return summary
+
+    def _group(self, partials: List[str], limit: int) -> List[List[str]]:
+        """Pack consecutive summaries into groups that each fit in one prompt"""
+        groups = [[]]
+        size = 0
+        for partial in partials:
+            if groups[-1] and size + len(partial) > limit:
+                groups.append([])
+                size = 0
+            groups[-1].append(partial)
+            size += len(partial) + 2
+        return groups
+
+    def _join(self, partials: List[str]) -> str:
+        return "\n\n".join(partials)
@@ -0,0 +1,83 @@
+"""
+Cancellation of request work once the client has disconnected
+"""
+import asyncio
+import os
+import logging
+from typing import AsyncIterator, Awaitable, TypeVar
+from fastapi import HTTPException, Request
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# How often a waiting handler checks whether its client is still there
+DISCONNECT_POLL_SECONDS = float(os.getenv("DISCONNECT_POLL_SECONDS", 1.0))
+
+
+class ClientDisconnected(HTTPException):
+    """The client closed the connection before its response was ready"""
+
+    def __init__(self):
+        # 499 is the conventional "client closed request" status; nobody reads it
+        super().__init__(status_code=499, detail="Client closed request")
+
+
+async def cancel_on_disconnect(request: Request, work: Awaitable[T]) -> T:
+    """
+    Await `work`, cancelling it if the client disconnects first
+
+    Starlette does not cancel a non-streaming handler when its client goes
+    away, so an abandoned request would otherwise hold its LLM call,
+    governor slot and tokens until generation finishes. Cancellation
+    reaches everything the work fans out to: hedged provider attempts,
+    map-reduce sections and shared in-flight work this caller was the last
+    one waiting on.
+
+    Args:
+        request: The incoming HTTP request
+        work: Coroutine or future to run
+
+    Returns:
+        Result of `work`
+
+    Raises:
+        ClientDisconnected: If the client went away before `work` finished
+    """
+    task = asyncio.ensure_future(work)
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=DISCONNECT_POLL_SECONDS)
+            if done:
+                return task.result()
+            if await request.is_disconnected():
+                logger.info(f"Client disconnected from {request.url.path}, cancelling its work")
+                raise ClientDisconnected()
+    finally:
+        if not task.done():
+            task.cancel()
+            # Let the work unwind, releasing its slot and connection, before returning
+            await asyncio.wait({task})
+
+
+async def stream_until_disconnect(request: Request, deltas: AsyncIterator[str]) -> AsyncIterator[str]:
+    """
+    Relay a text stream, closing it as soon as the client disconnects
+
+    A write to a closed connection only fails once the next delta is ready,
+    which for a model still reading a long prompt can be many seconds away;
+    this checks while waiting as well.
+
+    Raises:
+        ClientDisconnected: If the client went away mid-stream
+    """
+    try:
+        while True:
+            try:
+                delta = await cancel_on_disconnect(request, deltas.__anext__())
+            except StopAsyncIteration:
+                return
+            yield delta
+    finally:
+        if hasattr(deltas, "aclose"):
+            await deltas.aclose()
@@ -0,0 +1,90 @@
+"""
+Content hashing utilities for recognizing unchanged content across uploads
+"""
+import hashlib
+import os
+import re
+from functools import lru_cache
+
+
+def normalize_text(text: str) -> str:
+    """Collapse whitespace so re-extraction noise does not change hashes"""
+    return re.sub(r'\s+', ' ', text or '').strip()
+
+
+def content_hash(*parts: str) -> str:
+    """
+    Stable hash of one or more pieces of text
+
+    Parts are whitespace-normalized and separated unambiguously, so
+    ("ab", "c") and ("a", "bc") hash differently.
+
+    Returns:
+        Hex SHA-256 digest
+    """
+    digest = hashlib.sha256()
+    for part in parts:
+        encoded = normalize_text(part).encode("utf-8")
+        digest.update(len(encoded).to_bytes(8, "big"))
+        digest.update(encoded)
+    return digest.hexdigest()
+
+
+def file_hash(path: str, block_size: int = 1 << 20) -> str:
+    """
+    Hash of a file's raw bytes, e.g. to recognize the same PDF across uploads
+
+    Digests are remembered by path, size and modification time, so only the
+    first call for a file reads it; later calls cost one stat.
+
+    Returns:
+        Hex SHA-256 digest
+    """
+    stat = os.stat(path)
+    return _file_hash(os.path.abspath(path), stat.st_size, stat.st_mtime_ns, block_size)
+
+
+@lru_cache(maxsize=4096)
+def _file_hash(path: str, size: int, mtime_ns: int, block_size: int) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+# Filler that does not change what a question asks; question words are kept,
+# since "why X" and "how X" need different answers
+_QUESTION_STOP_WORDS = {
+    'the', 'is', 'at', 'on', 'a', 'an', 'and', 'or', 'in', 'with', 'to', 'for',
+    'of', 'as', 'by', 'from', 'this', 'that', 'these', 'those', 'can', 'could',
+    'would', 'should', 'do', 'does', 'did', 'have', 'has', 'had', 'be', 'been',
+    'are', 'was', 'were', 'it', 'its', 'me', 'you', 'your', 'i', 'we', 'us',
+    'please', 'tell', 'explain', 'describe', 'about', 'document', 'pdf', 'text'
+}
+_SUFFIXES = ('ations', 'ation', 'ments', 'ment', 'ness', 'ings', 'ing', 'ies', 'ied', 'ed', 'ly', 'es', 's')
+
+
+def _stem(word: str) -> str:
+    """Strip one common English suffix, keeping a stem of at least three letters"""
+    for suffix in _SUFFIXES:
+        if word.endswith(suffix) and len(word) - len(suffix) >= 3:
+            return word[:-len(suffix)] + ('y' if suffix in ('ies', 'ied') else '')
+    return word
+
+
+def question_fingerprint(question: str) -> str:
+    """
+    Fingerprint of what a question asks
+
+    Lowercases, drops punctuation and filler words, and stems the rest, so
+    "What is the main idea?" and "what's the main ideas of this document"
+    match. Word order is kept, since "is X better than Y" and "is Y better
+    than X" are different questions.
+
+    Returns:
+        Space-separated stems in question order, or "" if nothing meaningful is left
+    """
+    words = re.findall(r"[a-z0-9]+", (question or "").lower())
+    stems = (_stem(word) for word in words if len(word) > 1 and word not in _QUESTION_STOP_WORDS)
+    return " ".join(dict.fromkeys(stems))
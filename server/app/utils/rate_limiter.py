@@ -0,0 +1,61 @@
+"""
+Async rate limiter for provider request and token quotas
+"""
+import asyncio
+import time
+from collections import deque
+from typing import Deque, Optional, Tuple
+
+
+class RateLimiter:
+    """
+    Sliding one-minute window over requests and tokens
+
+    Callers await `acquire` with the tokens a request is expected to use;
+    it returns once the request fits both the RPM and TPM limits. Waiters
+    are served in arrival order.
+    """
+
+    def __init__(self, requests_per_minute: Optional[int] = None, tokens_per_minute: Optional[int] = None):
+        """
+        Args:
+            requests_per_minute: Request limit, or None for unlimited
+            tokens_per_minute: Token limit, or None for unlimited
+        """
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.window = 60.0
+        self._events: Deque[Tuple[float, int]] = deque()
+        self._tokens_in_window = 0
+        self._lock = asyncio.Lock()
+
+    async def acquire(self, tokens: int = 0):
+        """Wait until a request using `tokens` tokens may be sent"""
+        if self.tokens_per_minute:
+            # A single request larger than the limit would otherwise wait forever
+            tokens = min(tokens, self.tokens_per_minute)
+
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._expire(now)
+
+                if self._fits(tokens):
+                    self._events.append((now, tokens))
+                    self._tokens_in_window += tokens
+                    return
+
+                # Sleep until the oldest request leaves the window
+                await asyncio.sleep(max(0.0, self._events[0][0] + self.window - now))
+
+    def _expire(self, now: float):
+        while self._events and self._events[0][0] <= now - self.window:
+            _, tokens = self._events.popleft()
+            self._tokens_in_window -= tokens
+
+    def _fits(self, tokens: int) -> bool:
+        if self.requests_per_minute and len(self._events) >= self.requests_per_minute:
+            return False
+        if self.tokens_per_minute and self._tokens_in_window + tokens > self.tokens_per_minute:
+            return False
+        return True
@@ -0,0 +1,134 @@
+"""
+Incremental filter that strips model reasoning blocks from streamed text
+"""
+from typing import Optional, Tuple
+
+# (opening, closing) markers of reasoning spans, matched case-insensitively
+REASONING_MARKERS: Tuple[Tuple[str, str], ...] = (
+    ("<think>", "</think>"),
+    ("<reasoning>", "</reasoning>"),
+    ("```thinking\n", "\n```"),
+    ("```reasoning\n", "\n```"),
+)
+
+# Lines starting with these are reasoning up to the end of the line
+REASONING_LINE_PREFIXES: Tuple[str, ...] = ("Thinking:", "Reasoning:")
+
+
+class ReasoningFilter:
+    """
+    State machine that removes reasoning spans from token deltas as they arrive
+
+    Feed each delta to `feed` and forward what it returns; call `flush` when
+    the stream ends. Text is only held back while it could still be the
+    start of a marker, so lookahead never exceeds the longest marker.
+    Lines starting with a reasoning prefix are dropped up to their line
+    break, which is kept. Unterminated reasoning at the end of the stream
+    is dropped.
+    """
+
+    def __init__(
+        self,
+        markers: Tuple[Tuple[str, str], ...] = REASONING_MARKERS,
+        line_prefixes: Tuple[str, ...] = REASONING_LINE_PREFIXES
+    ):
+        # A prefix line is a span from a line break plus prefix to the next line break
+        markers = markers + tuple((f"\n{prefix}", "\n") for prefix in line_prefixes)
+        self.markers = tuple((opening.lower(), closing.lower()) for opening, closing in markers)
+        self.lookahead = max(len(marker) for pair in self.markers for marker in pair)
+        self.reasoning_chars = 0
+        self.reasoning_tokens = 0
+        # The stream starts on a new line; the leading break is stripped with other whitespace
+        self._buffer = "\n"
+        self._closing: Optional[str] = None
+        self._started = False
+
+    @property
+    def in_reasoning(self) -> bool:
+        return self._closing is not None
+
+    def feed(self, delta: str) -> str:
+        """
+        Consume one streamed delta
+
+        Returns:
+            Clean text that is safe to emit now (may be empty)
+        """
+        before = self.reasoning_chars
+        # A delta that starts inside a span is reasoning even if still buffered
+        inside = self.in_reasoning
+
+        self._buffer += delta
+        output = self._drain(final=False)
+
+        # Streaming deltas are roughly one token each
+        if inside or self.reasoning_chars > before:
+            self.reasoning_tokens += 1
+
+        return output
+
+    def flush(self) -> str:
+        """Emit whatever is left once the stream has ended"""
+        return self._drain(final=True)
+
+    def _drain(self, final: bool) -> str:
+        emitted = []
+
+        while self._buffer:
+            lowered = self._buffer.lower()
+
+            if self._closing is not None:
+                end = lowered.find(self._closing)
+                if end >= 0:
+                    # A prefix line keeps its line break, which may start another one
+                    consumed = end if self._closing == "\n" else end + len(self._closing)
+                    self.reasoning_chars += consumed
+                    self._buffer = self._buffer[consumed:]
+                    self._closing = None
+                    continue
+
+                # Keep a possible partial closing marker, drop the rest
+                keep = 0 if final else len(self._closing) - 1
+                consumed = max(0, len(self._buffer) - keep)
+                self.reasoning_chars += consumed
+                self._buffer = self._buffer[consumed:]
+                break
+
+            start, pair = self._find_opening(lowered)
+            if pair is not None:
+                emitted.append(self._buffer[:start])
+                self.reasoning_chars += len(pair[0])
+                self._buffer = self._buffer[start + len(pair[0]):]
+                self._closing = pair[1]
+                continue
+
+            hold = 0 if final else self._partial_opening(lowered)
+            emitted.append(self._buffer[:len(self._buffer) - hold])
+            self._buffer = self._buffer[len(self._buffer) - hold:]
+            break
+
+        return self._strip_leading("".join(emitted))
+
+    def _find_opening(self, lowered: str):
+        """Earliest complete opening marker in the buffer"""
+        best = (-1, None)
+        for pair in self.markers:
+            index = lowered.find(pair[0])
+            if index >= 0 and (best[1] is None or index < best[0]):
+                best = (index, pair)
+        return best
+
+    def _partial_opening(self, lowered: str) -> int:
+        """Length of the buffer tail that could still grow into an opening marker"""
+        for size in range(min(len(lowered), self.lookahead - 1), 0, -1):
+            tail = lowered[-size:]
+            if any(opening.startswith(tail) for opening, _ in self.markers):
+                return size
+        return 0
+
+    def _strip_leading(self, text: str) -> str:
+        """Drop whitespace left before the answer, e.g. after a leading think block"""
+        if not self._started:
+            text = text.lstrip()
+            self._started = bool(text)
+        return text
@@ -0,0 +1,164 @@
+"""
+Coalescing of identical concurrent work into a single execution
+"""
+import asyncio
+import logging
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class _Call:
+    def __init__(self, key: str):
+        self.key = key
+        self.task: Optional[asyncio.Task] = None
+        self.waiters = 0
+        # Streamed work only: deltas so far, for callers who join late
+        self.streamed = False
+        self.parts: List[str] = []
+        self.finished = False
+        self.error: Optional[Exception] = None
+        self.changed = asyncio.Condition()
+
+
+class SingleFlight:
+    """
+    Runs concurrent calls that share a key once and gives every caller its outcome
+
+    The first caller for a key starts the work as a task; callers arriving
+    while it runs wait on the same task and receive the same result or
+    exception. The work is shielded from any one caller being cancelled
+    and is only cancelled once every waiter has gone. Nothing is kept after
+    the work finishes, so results are cached separately where wanted.
+
+    Streamed work (`stream`) is relayed to every streaming caller as it is
+    produced, replaying earlier deltas to those who join late, while
+    callers using `do` or `join` receive the complete text.
+    """
+
+    def __init__(self, name: str):
+        """
+        Args:
+            name: Label for log messages
+        """
+        self.name = name
+        self._calls: Dict[str, _Call] = {}
+
+    def in_flight(self, key: str) -> bool:
+        return key in self._calls
+
+    async def do(self, key: str, work: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Run `work` for `key`, or join the run already in progress
+
+        Args:
+            key: Identity of the work, e.g. operation plus content hash
+            work: Zero-argument callable returning the awaitable to run
+
+        Returns:
+            Result of the shared run
+        """
+        call = self._calls.get(key)
+        if call is None:
+            call = self._start(key, lambda call: work())
+        else:
+            logger.info(f"Joining in-flight {self.name} work")
+        return await self._wait(call)
+
+    async def join(self, key: str) -> Any:
+        """Wait for the run in progress for `key`; check in_flight first"""
+        logger.info(f"Joining in-flight {self.name} work")
+        return await self._wait(self._calls[key])
+
+    async def stream(self, key: str, open_stream: Callable[[], AsyncIterator[str]]) -> AsyncIterator[str]:
+        """
+        Stream the text deltas of `open_stream()` for `key`, or follow the run in progress
+
+        Joining a streamed run replays the deltas produced so far and then
+        follows it live. Joining a run started with `do` yields its
+        result as a single delta once it is ready.
+
+        Args:
+            key: Identity of the work
+            open_stream: Zero-argument callable returning the text stream
+
+        Yields:
+            Text deltas
+        """
+        call = self._calls.get(key)
+        if call is None:
+            call = self._start(key, lambda call: self._relay(call, open_stream()))
+            call.streamed = True
+        else:
+            logger.info(f"Following in-flight {self.name} work")
+
+        if not call.streamed:
+            yield await self._wait(call)
+            return
+
+        call.waiters += 1
+        sent = 0
+        try:
+            while True:
+                async with call.changed:
+                    await call.changed.wait_for(lambda: sent < len(call.parts) or call.finished)
+                pending = call.parts[sent:]
+                sent += len(pending)
+                for delta in pending:
+                    yield delta
+                if call.finished and sent == len(call.parts):
+                    if call.error is not None:
+                        raise call.error
+                    return
+        finally:
+            self._leave(call)
+
+    def _start(self, key: str, work: Callable[[_Call], Awaitable[Any]]) -> _Call:
+        call = _Call(key)
+        call.task = asyncio.ensure_future(work(call))
+        self._calls[key] = call
+        call.task.add_done_callback(lambda task: self._done(call, task))
+        return call
+
+    def _done(self, call: _Call, task: asyncio.Task):
+        if not task.cancelled():
+            # Streaming callers get a failure through call.error, not the task
+            task.exception()
+        self._forget(call)
+
+    async def _relay(self, call: _Call, deltas: AsyncIterator[str]) -> str:
+        """Read a stream into the call's buffer, waking its followers; returns the full text"""
+        try:
+            async for delta in deltas:
+                call.parts.append(delta)
+                async with call.changed:
+                    call.changed.notify_all()
+            return "".join(call.parts)
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            if hasattr(deltas, "aclose"):
+                await deltas.aclose()
+            call.finished = True
+            async with call.changed:
+                call.changed.notify_all()
+
+    async def _wait(self, call: _Call) -> Any:
+        call.waiters += 1
+        try:
+            return await asyncio.shield(call.task)
+        finally:
+            self._leave(call)
+
+    def _leave(self, call: _Call):
+        call.waiters -= 1
+        if call.waiters == 0 and not call.task.done():
+            # The last interested caller left, so the work is abandoned; later
+            # callers start afresh rather than join a cancelled run
+            call.task.cancel()
+            self._forget(call)
+
+    def _forget(self, call: _Call):
+        if self._calls.get(call.key) is call:
+            del self._calls[call.key]
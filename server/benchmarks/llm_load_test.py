@@ -0,0 +1,368 @@
+#!/usr/bin/env python3
+"""
+Throughput and latency test of the AI routes against the local LLM stub
+
+Serves the FastAPI app from this process with uvicorn and sends concurrent
+HTTP requests to /api/ai/chat, /api/ai/chat/stream, /api/ai/summary and
+/api/video/generate-scripts/{job_id}. Retrieval, the answer and summary
+caches, SingleFlight, disconnect handling and the governor's 503s are
+therefore under load together with the LLM calls. Every request gets its
+own generated PDF so caches do not hide LLM latency; --shared-documents
+spreads requests over fewer PDFs to measure coalescing and caching
+instead, and --abandon-fraction makes some clients hang up early.
+
+Parts of the app that do not call an LLM are replaced for the run:
+authentication is bypassed, chat and summary history (Supabase) are kept
+in memory, and the scripts endpoint's narration audio and Unsplash images
+are skipped. Results are printed (or written) as JSON, like the retrieval
+benchmark.
+
+Usage (from the server directory):
+    python -m benchmarks.llm_load_test --start-stub
+    python -m benchmarks.llm_load_test --base-url http://127.0.0.1:8099 --requests 500 --concurrency 50
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Awaitable, Callable, Dict, List, Optional
+
+import httpx
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from benchmarks.retrieval_benchmark import percentile
+
+OPERATIONS = ("chat", "stream_chat", "summary", "scripts")
+
+LOAD_TEST_USER = SimpleNamespace(id="load-test-user", email="load-test@example.com")
+
+
+def configure_environment(args):
+    """
+    Point every Groq client at the stub and run in a scratch directory
+
+    Must run before app imports, which open the SQLite databases and storage
+    relative to the working directory.
+    """
+    workdir = Path(tempfile.mkdtemp(prefix="llm_load_test_"))
+    os.chdir(workdir)
+    os.environ["GROQ_BASE_URL"] = args.base_url
+    os.environ["GROQ_API_KEY"] = os.environ.get("GROQ_API_KEY") or "stub"
+    os.environ["LLM_PROVIDERS"] = "groq"
+    os.environ["STORAGE_BASE_DIR"] = str(workdir / "storage")
+    os.environ["CACHE_DB_PATH"] = str(workdir / "cache.db")
+    os.environ["UNSPLASH_ACCESS_KEY"] = ""
+    # Real Groq per-minute quotas would dominate the run; set these to test them
+    os.environ.setdefault("SCRIPT_RPM", "100000")
+    os.environ.setdefault("SCRIPT_TPM", "100000000")
+
+
+def document(n: int, chars: int) -> str:
+    """Distinct document text for document n"""
+    sentence = f"Section {n} describes how cells in sample {n} regulate transport across the membrane. "
+    return (sentence * (chars // len(sentence) + 1))[:chars]
+
+
+def write_pdf(path: Path, text: str, chars_per_page: int = 2500):
+    """Write text into a PDF the app's extractor can read back"""
+    import fitz
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    pdf = fitz.open()
+    for start in range(0, len(text), chars_per_page):
+        page = pdf.new_page()
+        page.insert_textbox(fitz.Rect(40, 40, 560, 800), text[start:start + chars_per_page], fontsize=8)
+    pdf.save(str(path))
+    pdf.close()
+
+
+class MemoryChatHistory:
+    """Chat history kept in memory in place of Supabase"""
+
+    sessions: Dict[str, List] = {}
+    history_summaries: Dict[str, Dict] = {}
+
+    def __init__(self):
+        self.user_id = LOAD_TEST_USER.id
+
+    def create_session(self, job_id: str, pdf_filename: str):
+        session_id = str(uuid.uuid4())
+        self.sessions[session_id] = []
+        return SimpleNamespace(session_id=session_id, job_id=job_id, pdf_filename=pdf_filename)
+
+    def add_messages(self, session_id: str, user_message: str, ai_response: str):
+        self.sessions.setdefault(session_id, []).extend([user_message, ai_response])
+
+    def get_history_summary(self, session_key: str) -> Optional[Dict]:
+        return self.history_summaries.get(session_key)
+
+    def save_history_summary(self, session_key: str, record: Dict):
+        self.history_summaries[session_key] = record
+
+
+class MemorySummaryHistory:
+    """Summary history kept in memory in place of Supabase"""
+
+    summaries: List[Dict] = []
+
+    def create_summary(self, job_id: str, length: str, summary_text: str, pdf_filename: Optional[str] = None):
+        self.summaries.append({"job_id": job_id, "length": length, "pdf_filename": pdf_filename})
+
+
+class SilentTTS:
+    """Stands in for narration, which calls a speech service rather than an LLM"""
+
+    def generate_audio(self, text: str, job_id: str, page_num: int, voice_id: str = "en"):
+        return f"page_{page_num}_audio.mp3", len(text.split()) / 2.5
+
+
+def prepare_app(args):
+    """Import the app, bypass what needs Supabase or speech services, and create the test jobs"""
+    from app.main import app
+    from app.api.dependencies import get_current_user, get_storage_service
+    from app.api.routes import ai_routes, video_data_routes
+
+    # The app configures INFO logging on import; per-request logs would drown the report
+    logging.getLogger().setLevel(logging.WARNING)
+
+    app.dependency_overrides[get_current_user] = lambda: LOAD_TEST_USER
+    app.dependency_overrides[ai_routes.get_chat_history_service] = MemoryChatHistory
+    app.dependency_overrides[ai_routes.get_summary_history_service] = MemorySummaryHistory
+    video_data_routes.tts_service = SilentTTS()
+
+    storage_service = get_storage_service()
+    documents = args.shared_documents or args.requests
+    for name in args.operations:
+        for n in range(documents):
+            job_id = f"{name}-{n}"
+            if name == "scripts":
+                video_id = video_data_routes.db.create_video(job_id, f"{job_id}.pdf", args.pages, LOAD_TEST_USER.id)
+                for page in range(1, args.pages + 1):
+                    video_data_routes.db.create_page(
+                        video_id, page, document(n * 100 + page, args.page_chars), title=f"Deck {n} page {page}"
+                    )
+            else:
+                # Distinct text per operation too, so no operation warms another's caches
+                text = document(n + OPERATIONS.index(name) * 1_000_000, args.document_chars)
+                write_pdf(storage_service.get_job_dir(job_id, "upload") / f"{job_id}.pdf", text)
+
+    return app
+
+
+async def wait_for_stub(base_url: str, timeout: float = 15):
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as client:
+        while True:
+            try:
+                await client.get(f"{base_url}/openai/v1/models")
+                return
+            except httpx.TransportError:
+                if time.monotonic() > deadline:
+                    raise RuntimeError(f"LLM stub not reachable at {base_url}")
+                await asyncio.sleep(0.2)
+
+
+async def run_operation(
+    name: str,
+    call: Callable[[int], Awaitable[Dict]],
+    args
+) -> Dict:
+    """Run the operation's requests with at most --concurrency in flight and summarize latencies"""
+    semaphore = asyncio.Semaphore(args.concurrency)
+    latencies: List[float] = []
+    first_tokens: List[float] = []
+    errors: Dict[str, int] = {}
+    abandoned = 0
+
+    async def one(n: int):
+        nonlocal abandoned
+        abandon = random.Random(f"{name}-{n}").random() < args.abandon_fraction
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                if abandon:
+                    # Cancelling closes the connection mid-request, as a user leaving does
+                    result = await asyncio.wait_for(call(n), args.abandon_after)
+                else:
+                    result = await call(n)
+            except asyncio.TimeoutError:
+                abandoned += 1
+                return
+            except httpx.HTTPStatusError as e:
+                key = f"HTTP {e.response.status_code}"
+                errors[key] = errors.get(key, 0) + 1
+                return
+            except Exception as e:
+                errors[type(e).__name__] = errors.get(type(e).__name__, 0) + 1
+                return
+            latencies.append((time.perf_counter() - start) * 1000)
+            if result.get("first_token") is not None:
+                first_tokens.append((result["first_token"] - start) * 1000)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(n) for n in range(args.requests)))
+    elapsed = time.perf_counter() - start
+
+    report = {
+        "requests": args.requests,
+        "succeeded": len(latencies),
+        "abandoned": abandoned,
+        "errors": errors,
+        "throughput_rps": round(len(latencies) / elapsed, 2),
+    }
+    if latencies:
+        report["latency_ms"] = {p: round(percentile(latencies, int(p[1:])), 1) for p in ("p50", "p95", "p99")}
+    if first_tokens:
+        report["first_token_ms"] = {p: round(percentile(first_tokens, int(p[1:])), 1) for p in ("p50", "p95", "p99")}
+    print(f"Load tested {name}", file=sys.stderr)
+    return report
+
+
+async def run(args) -> Dict:
+    import uvicorn
+    from app.core.llm_governor import governor_stats
+
+    await wait_for_stub(args.base_url)
+    app = prepare_app(args)
+
+    server = uvicorn.Server(uvicorn.Config(
+        app, host="127.0.0.1", port=args.app_port, log_level="warning", lifespan="off"
+    ))
+    serving = asyncio.create_task(server.serve())
+    while not server.started:
+        if serving.done():
+            serving.result()
+        await asyncio.sleep(0.05)
+
+    documents = args.shared_documents or args.requests
+    client = httpx.AsyncClient(
+        base_url=f"http://127.0.0.1:{args.app_port}",
+        headers={"Authorization": "Bearer load-test"},
+        timeout=args.timeout,
+        limits=httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    )
+
+    def question(n: int) -> List[Dict[str, str]]:
+        return [{"role": "user", "content": f"What does section {n % documents} say about transport?"}]
+
+    async def chat(n: int) -> Dict:
+        response = await client.post("/api/ai/chat", json={
+            "job_id": f"chat-{n % documents}", "messages": question(n)
+        })
+        response.raise_for_status()
+        return {}
+
+    async def stream_chat(n: int) -> Dict:
+        first_token = None
+        async with client.stream("POST", "/api/ai/chat/stream", json={
+            "job_id": f"stream_chat-{n % documents}", "messages": question(n)
+        }) as response:
+            response.raise_for_status()
+            async for line in response.aiter_lines():
+                if line == "event: delta":
+                    first_token = first_token or time.perf_counter()
+                elif line == "event: error":
+                    raise RuntimeError("stream error event")
+        return {"first_token": first_token}
+
+    async def summary(n: int) -> Dict:
+        response = await client.post("/api/ai/summary", json={
+            "job_id": f"summary-{n % documents}", "length": "standard"
+        })
+        response.raise_for_status()
+        return {}
+
+    async def scripts(n: int) -> Dict:
+        response = await client.post(f"/api/video/generate-scripts/scripts-{n % documents}")
+        response.raise_for_status()
+        return {}
+
+    calls = {"chat": chat, "stream_chat": stream_chat, "summary": summary, "scripts": scripts}
+    results = {}
+    try:
+        for name in args.operations:
+            results[name] = await run_operation(name, calls[name], args)
+    finally:
+        await client.aclose()
+        server.should_exit = True
+        await serving
+
+    return {
+        "benchmark": "llm_load",
+        "timestamp": datetime.now().isoformat(),
+        "python": platform.python_version(),
+        "config": {
+            "base_url": args.base_url,
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "documents": documents,
+            "document_chars": args.document_chars,
+            "pages": args.pages,
+            "abandon_fraction": args.abandon_fraction,
+        },
+        "results": results,
+        "governors": governor_stats(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the AI routes against the local LLM stub")
+    parser.add_argument("--base-url", default="http://127.0.0.1:8099", help="LLM stub (or any Groq-compatible) URL")
+    parser.add_argument("--start-stub", action="store_true",
+                        help="Start benchmarks.llm_stub_server on the --base-url port for the run")
+    parser.add_argument("--app-port", type=int, default=8098, help="Local port the app is served on")
+    parser.add_argument("--operations", nargs="+", default=list(OPERATIONS), choices=list(OPERATIONS))
+    parser.add_argument("--requests", type=int, default=100, help="Requests per operation")
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--shared-documents", type=int, default=0,
+                        help="Spread requests over this many PDFs per operation (default: one each)")
+    parser.add_argument("--document-chars", type=int, default=20000, help="Text per chat or summary PDF")
+    parser.add_argument("--pages", type=int, default=5, help="Pages per script deck")
+    parser.add_argument("--page-chars", type=int, default=1200)
+    parser.add_argument("--abandon-fraction", type=float, default=0.0,
+                        help="Share of requests whose client disconnects after --abandon-after seconds")
+    parser.add_argument("--abandon-after", type=float, default=0.5)
+    parser.add_argument("--timeout", type=float, default=300, help="Client timeout per request")
+    parser.add_argument("--output", help="Write JSON results to this file instead of stdout")
+    args = parser.parse_args()
+
+    output_path = Path(args.output).resolve() if args.output else None
+    server_dir = Path(__file__).resolve().parent.parent
+    configure_environment(args)
+    stub = None
+    if args.start_stub:
+        port = httpx.URL(args.base_url).port or 8099
+        stub = subprocess.Popen(
+            [sys.executable, "-m", "benchmarks.llm_stub_server", "--port", str(port)],
+            cwd=server_dir
+        )
+
+    try:
+        report = asyncio.run(run(args))
+    finally:
+        if stub is not None:
+            stub.terminate()
+            stub.wait()
+
+    output = json.dumps(report, indent=2)
+    if output_path:
+        output_path.write_text(output, encoding="utf-8")
+        print(f"Results written to {output_path}", file=sys.stderr)
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the Groq (OpenAI-compatible) chat completions API
+
+Serves POST /openai/v1/chat/completions, the path the Groq SDK calls, with
+synthetic answers. Time to first token follows a log-normal distribution,
+tokens are emitted at a fixed rate, streaming uses the same SSE chunks as
+the real API, and 429s can be injected at random or by a requests-per-
+minute cap. Qwen3 models answer with a <think> block first unless the
+request sets reasoning_effort to "none", and JSON-mode script batches get
+one script per page, so every AI path in the app runs unchanged.
+
+Point the app at it with:
+    GROQ_BASE_URL=http://127.0.0.1:8099 GROQ_API_KEY=stub
+
+Usage (from the server directory):
+    python -m benchmarks.llm_stub_server
+    python -m benchmarks.llm_stub_server --latency-ms 400 --tokens-per-second 150 --rate-limit-prob 0.05
+"""
+import argparse
+import asyncio
+import json
+import math
+import random
+import re
+import time
+import uuid
+from collections import deque
+from typing import Deque, Dict, List, Optional
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+WORDS = (
+    "the cell membrane controls transport while mitochondria produce energy for "
+    "students to understand how each concept connects to the chapter and its examples "
+    "in practice this process explains the result of the analysis described above"
+).split()
+
+
+class StubConfig:
+    """Behaviour of the stub, set from the command line"""
+
+    def __init__(self, args: argparse.Namespace):
+        self.latency = args.latency_ms / 1000
+        self.latency_sigma = args.latency_sigma
+        self.tokens_per_second = args.tokens_per_second
+        self.output_tokens = args.output_tokens
+        self.think_tokens = args.think_tokens
+        self.rate_limit_prob = args.rate_limit_prob
+        self.rpm = args.rpm
+        self.retry_after = args.retry_after
+        self.random = random.Random(args.seed)
+        self.requests: Deque[float] = deque()
+
+    def first_token_delay(self) -> float:
+        """Log-normal around the configured median"""
+        if self.latency <= 0:
+            return 0.0
+        return self.random.lognormvariate(math.log(self.latency), self.latency_sigma)
+
+    def rate_limited(self) -> bool:
+        now = time.monotonic()
+        while self.requests and self.requests[0] <= now - 60:
+            self.requests.popleft()
+
+        if self.rpm and len(self.requests) >= self.rpm:
+            return True
+        if self.random.random() < self.rate_limit_prob:
+            return True
+
+        self.requests.append(now)
+        return False
+
+    def words(self, count: int) -> List[str]:
+        return [self.random.choice(WORDS) for _ in range(count)]
+
+
+def completion_tokens(config: StubConfig, body: Dict) -> List[str]:
+    """Answer tokens for a request, each a word with its leading space"""
+    limit = body.get("max_completion_tokens") or body.get("max_tokens") or config.output_tokens
+    count = max(1, min(config.output_tokens, limit))
+    tokens = [" " + word for word in config.words(count)]
+
+    reasoning = str(body.get("model", "")).startswith("qwen/qwen3") and body.get("reasoning_effort") != "none"
+    if reasoning and config.think_tokens:
+        tokens = ["<think>"] + [" " + word for word in config.words(config.think_tokens)] + ["</think>\n\n"] + tokens
+    return tokens
+
+
+def json_answer(config: StubConfig, body: Dict) -> str:
+    """JSON-mode answer; script batch prompts get one entry per page"""
+    prompt = body["messages"][-1]["content"] if body.get("messages") else ""
+    match = re.search(r"Original Content of (\d+) pages", prompt)
+    pages = int(match.group(1)) if match else 1
+    return json.dumps({
+        "scripts": [
+            {"id": page, "script": " ".join(config.words(config.output_tokens // max(1, pages) or 1))}
+            for page in range(1, pages + 1)
+        ]
+    })
+
+
+def create_app(config: StubConfig) -> FastAPI:
+    app = FastAPI(title="LLM stub server")
+
+    @app.post("/openai/v1/chat/completions")
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+
+        if config.rate_limited():
+            return JSONResponse(
+                status_code=429,
+                headers={"retry-after": str(config.retry_after)},
+                content={"error": {
+                    "message": "Rate limit reached (stub)",
+                    "type": "tokens",
+                    "code": "rate_limit_exceeded"
+                }}
+            )
+
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:24]}"
+        created = int(time.time())
+        model = body.get("model", "stub")
+        json_mode = (body.get("response_format") or {}).get("type") == "json_object"
+        tokens = [json_answer(config, body)] if json_mode else completion_tokens(config, body)
+        usage = {
+            "prompt_tokens": sum(len(str(m.get("content", ""))) for m in body.get("messages", [])) // 4,
+            "completion_tokens": len(tokens),
+            "total_tokens": 0
+        }
+        usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+        delay = 1 / config.tokens_per_second if config.tokens_per_second else 0.0
+
+        if not body.get("stream"):
+            await asyncio.sleep(config.first_token_delay() + delay * len(tokens))
+            return {
+                "id": completion_id,
+                "object": "chat.completion",
+                "created": created,
+                "model": model,
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": "".join(tokens).strip()},
+                    "finish_reason": "stop"
+                }],
+                "usage": usage
+            }
+
+        def chunk(delta: Dict, finish_reason: Optional[str] = None, **extra) -> str:
+            payload = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": created,
+                "model": model,
+                "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+                **extra
+            }
+            return f"data: {json.dumps(payload)}\n\n"
+
+        async def events():
+            await asyncio.sleep(config.first_token_delay())
+            yield chunk({"role": "assistant", "content": ""})
+            for token in tokens:
+                yield chunk({"content": token})
+                await asyncio.sleep(delay)
+            yield chunk({}, "stop", x_groq={"usage": usage})
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    @app.get("/openai/v1/models")
+    async def list_models():
+        return {"object": "list", "data": [{"id": "stub", "object": "model"}]}
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve a local Groq/OpenAI-compatible chat completions stub")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8099)
+    parser.add_argument("--latency-ms", type=float, default=300, help="Median time to first token")
+    parser.add_argument("--latency-sigma", type=float, default=0.5, help="Log-normal spread of time to first token")
+    parser.add_argument("--tokens-per-second", type=float, default=250, help="Output rate; 0 for instant")
+    parser.add_argument("--output-tokens", type=int, default=200, help="Answer length, capped by max_tokens")
+    parser.add_argument("--think-tokens", type=int, default=60, help="Qwen3 <think> block length; 0 to omit")
+    parser.add_argument("--rate-limit-prob", type=float, default=0.0, help="Chance of answering with a 429")
+    parser.add_argument("--rpm", type=int, default=0, help="Requests per minute before 429s; 0 for no cap")
+    parser.add_argument("--retry-after", type=float, default=1.0, help="retry-after header on 429s")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    uvicorn.run(create_app(StubConfig(args)), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
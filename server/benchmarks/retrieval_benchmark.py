@@ -0,0 +1,317 @@
+#!/usr/bin/env python3
+"""
+Offline retrieval benchmark for ChunkingService
+
+Measures index build time and memory, keyword extraction and chunk scoring
+cost, p50/p99 query latency and recall@k against labelled answer spans for
+each retrieval strategy, on fixture documents and synthetic documents of
+increasing size. Results are printed (or written) as JSON so runs can be
+diffed before and after retrieval changes.
+
+Usage (from the server directory):
+    python -m benchmarks.retrieval_benchmark
+    python -m benchmarks.retrieval_benchmark --sizes 50000 500000 --output results.json
+"""
+import argparse
+import json
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, List, Tuple
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.services.chunking_service import ChunkingService
+from app.services.chunk_store import ChunkStore
+
+FIXTURES_DIR = Path(__file__).parent / "fixtures"
+
+# Vocabulary for synthetic documents; facts are planted with unique entities
+FILLER_WORDS = (
+    "system process model data analysis result method structure value function "
+    "theory practice example student course lecture chapter section concept "
+    "research evidence approach context framework principle detail summary"
+).split()
+ENTITIES = (
+    "aurora basalt cobalt dynamo ember falcon glacier harbor indigo juniper "
+    "kestrel lagoon meridian nebula obsidian pylon quartz riviera sierra tundra"
+).split()
+
+
+def load_fixture_documents() -> List[Dict]:
+    """Load every fixture document with its labelled questions"""
+    documents = []
+
+    for text_path in sorted(FIXTURES_DIR.glob("*.txt")):
+        questions_path = text_path.with_name(f"{text_path.stem}_questions.jsonl")
+        if not questions_path.exists():
+            continue
+
+        text = text_path.read_text(encoding="utf-8")
+        questions = [
+            json.loads(line)
+            for line in questions_path.read_text(encoding="utf-8").splitlines()
+            if line.strip()
+        ]
+
+        for question in questions:
+            if question["answer"] not in text:
+                raise ValueError(f"Answer span not found in {text_path.name}: {question['answer']}")
+
+        documents.append({"name": text_path.stem, "text": text, "questions": questions})
+
+    return documents
+
+
+def generate_synthetic_document(size: int, num_questions: int, seed: int) -> Dict:
+    """
+    Generate filler text of roughly `size` characters with planted facts
+
+    Each fact mentions a unique entity so its question has exactly one
+    correct answer span.
+    """
+    rng = random.Random(seed)
+    sentences = []
+    length = 0
+
+    while length < size:
+        sentence = " ".join(rng.choice(FILLER_WORDS) for _ in range(rng.randint(8, 20)))
+        sentence = sentence.capitalize() + "."
+        sentences.append(sentence)
+        length += len(sentence) + 1
+
+    questions = []
+    for n in range(num_questions):
+        entity = f"{ENTITIES[n % len(ENTITIES)]}{n}"
+        year = rng.randint(1900, 2020)
+        answer = f"The {entity} protocol was introduced in {year} by the {rng.choice(FILLER_WORDS)} committee."
+        position = rng.randrange(len(sentences))
+        sentences.insert(position, answer)
+        questions.append({"question": f"When was the {entity} protocol introduced?", "answer": answer})
+
+    return {"name": f"synthetic_{size}", "text": " ".join(sentences), "questions": questions}
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile"""
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[rank]
+
+
+def timed(fn: Callable, *args) -> Tuple[object, float]:
+    """Run fn and return (result, elapsed milliseconds)"""
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, (time.perf_counter() - start) * 1000
+
+
+class LegacyStrategy:
+    """create_chunks + get_relevant_chunks over in-memory strings"""
+
+    name = "legacy"
+
+    def __init__(self, chunking: ChunkingService, max_chunks: int):
+        self.chunking = chunking
+        self.max_chunks = max_chunks
+        self.chunks: List[str] = []
+
+    def build(self, text: str, workdir: Path):
+        self.chunks = self.chunking.create_chunks(text)
+
+    def query(self, question: str) -> str:
+        relevant = self.chunking.get_relevant_chunks(self.chunks, question, self.max_chunks)
+        return self.chunking.build_context(relevant)
+
+    def close(self):
+        self.chunks = []
+
+
+class StoreStrategy:
+    """ChunkStore + get_relevant_spans over the memory-mapped text"""
+
+    name = "store"
+
+    def __init__(self, chunking: ChunkingService, max_chunks: int):
+        self.chunking = chunking
+        self.max_chunks = max_chunks
+        self.store = None
+
+    def build(self, text: str, workdir: Path):
+        self.store = ChunkStore.build(text, workdir / self.name, self.chunking)
+
+    def query(self, question: str) -> str:
+        indices = self.chunking.get_relevant_spans(self.store, question, self.max_chunks)
+        return self.chunking.build_context([self.store.text(i) for i in indices])
+
+    def close(self):
+        if self.store:
+            self.store.close()
+            self.store = None
+
+
+class MMRStrategy(StoreStrategy):
+    """ChunkStore + select_context_spans (MMR with merged spans)"""
+
+    name = "mmr"
+
+    def query(self, question: str) -> str:
+        spans = self.chunking.select_context_spans(self.store, question, self.max_chunks)
+        return self.chunking.build_context([self.store.slice(start, end) for start, end in spans])
+
+
+STRATEGIES = {
+    strategy.name: strategy
+    for strategy in (LegacyStrategy, StoreStrategy, MMRStrategy)
+}
+
+
+def benchmark_components(chunking: ChunkingService, document: Dict, repeat: int) -> Dict:
+    """Time the individual ChunkingService building blocks"""
+    text = document["text"]
+    questions = [q["question"] for q in document["questions"]]
+
+    chunks, chunk_ms = timed(chunking.create_chunks, text)
+
+    keyword_ms = []
+    score_ms = []
+    for _ in range(repeat):
+        for question in questions:
+            keywords, elapsed = timed(chunking.extract_keywords, question)
+            keyword_ms.append(elapsed)
+            start = time.perf_counter()
+            for chunk in chunks:
+                chunking.score_chunk(chunk, keywords)
+            score_ms.append((time.perf_counter() - start) * 1000 / max(1, len(chunks)))
+
+    return {
+        "num_chunks": len(chunks),
+        "create_chunks_ms": round(chunk_ms, 3),
+        "extract_keywords_p50_ms": round(percentile(keyword_ms, 50), 4),
+        "score_chunk_mean_ms": round(statistics.mean(score_ms), 4),
+    }
+
+
+def benchmark_strategy(
+    strategy_cls,
+    chunking: ChunkingService,
+    document: Dict,
+    max_chunks: int,
+    repeat: int
+) -> Dict:
+    """Measure build cost, query latency and recall@k for one strategy"""
+    text = document["text"]
+    questions = document["questions"]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        workdir = Path(tmp)
+
+        # Memory pass (tracemalloc skews timings, so it runs separately)
+        strategy = strategy_cls(chunking, max_chunks)
+        tracemalloc.start()
+        strategy.build(text, workdir)
+        _, build_peak = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        strategy.query(questions[0]["question"])
+        _, query_peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        strategy.close()
+
+        # Timing pass
+        strategy = strategy_cls(chunking, max_chunks)
+        _, build_ms = timed(strategy.build, text, workdir)
+
+        latencies = []
+        hits = 0
+        context_chars = []
+        for iteration in range(repeat):
+            for question in questions:
+                context, elapsed = timed(strategy.query, question["question"])
+                latencies.append(elapsed)
+                if iteration == 0:
+                    hits += int(question["answer"] in context)
+                    context_chars.append(len(context))
+        strategy.close()
+
+    return {
+        "build_ms": round(build_ms, 3),
+        "build_peak_kib": round(build_peak / 1024, 1),
+        "query_peak_kib": round(query_peak / 1024, 1),
+        "query_p50_ms": round(percentile(latencies, 50), 4),
+        "query_p99_ms": round(percentile(latencies, 99), 4),
+        f"recall@{max_chunks}": round(hits / len(questions), 4),
+        "mean_context_chars": round(statistics.mean(context_chars), 1),
+    }
+
+
+def run(args) -> Dict:
+    chunking = ChunkingService(chunk_size=args.chunk_size, overlap=args.overlap)
+
+    documents = [] if args.no_fixtures else load_fixture_documents()
+    for n, size in enumerate(args.sizes):
+        documents.append(generate_synthetic_document(size, args.questions, seed=args.seed + n))
+
+    results = []
+    for document in documents:
+        entry = {
+            "document": document["name"],
+            "chars": len(document["text"]),
+            "questions": len(document["questions"]),
+            "components": benchmark_components(chunking, document, args.repeat),
+            "strategies": {},
+        }
+        for name in args.strategies:
+            entry["strategies"][name] = benchmark_strategy(
+                STRATEGIES[name], chunking, document, args.max_chunks, args.repeat
+            )
+        results.append(entry)
+        print(f"Benchmarked {document['name']}", file=sys.stderr)
+
+    return {
+        "benchmark": "retrieval",
+        "timestamp": datetime.now().isoformat(),
+        "python": platform.python_version(),
+        "config": {
+            "chunk_size": args.chunk_size,
+            "overlap": args.overlap,
+            "max_chunks": args.max_chunks,
+            "repeat": args.repeat,
+            "seed": args.seed,
+        },
+        "results": results,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark ChunkingService retrieval strategies")
+    parser.add_argument("--sizes", type=int, nargs="*", default=[20000, 200000, 1000000],
+                        help="Synthetic document sizes in characters")
+    parser.add_argument("--questions", type=int, default=20, help="Questions per synthetic document")
+    parser.add_argument("--strategies", nargs="+", default=list(STRATEGIES), choices=list(STRATEGIES))
+    parser.add_argument("--chunk-size", type=int, default=2000)
+    parser.add_argument("--overlap", type=int, default=200)
+    parser.add_argument("--max-chunks", type=int, default=5)
+    parser.add_argument("--repeat", type=int, default=5, help="Passes over the question set for latency")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--no-fixtures", action="store_true", help="Only run synthetic documents")
+    parser.add_argument("--output", help="Write JSON results to this file instead of stdout")
+    args = parser.parse_args()
+
+    report = run(args)
+    output = json.dumps(report, indent=2)
+
+    if args.output:
+        Path(args.output).write_text(output, encoding="utf-8")
+        print(f"Results written to {args.output}", file=sys.stderr)
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
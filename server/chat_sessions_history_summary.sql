@@ -0,0 +1,6 @@
+-- Rolling summary of a chat session's older messages, kept by
+-- app/services/history_manager.py so long conversations stay within the
+-- prompt budget. Stored as {"summary", "covered", "hash"}; NULL until a
+-- session first outgrows its history budget.
+ALTER TABLE public.chat_sessions
+    ADD COLUMN IF NOT EXISTS history_summary jsonb;
@@ -0,0 +1,11 @@
+"""
+Shared test setup: keep persistent caches out of the working tree
+"""
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+os.environ.setdefault("CACHE_DB_PATH", str(Path(tempfile.mkdtemp()) / "cache.db"))
@@ -0,0 +1,89 @@
+"""
+Tests for the in-memory, persistent and tiered caches
+"""
+import sqlite3
+from app.services.cache_service import LRUCache, PersistentCache, TieredCache
+
+
+def test_lru_evicts_least_recently_used():
+    cache = LRUCache(max_entries=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+
+
+def test_lru_entries_expire(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr("app.services.cache_service.time.monotonic", lambda: now[0])
+    cache = LRUCache(ttl_seconds=10)
+    cache.set("a", 1)
+
+    now[0] += 5
+    assert cache.get("a") == 1
+    now[0] += 6
+    assert cache.get("a") is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_persistent_cache_evicts_least_recently_used(tmp_path, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr("app.services.cache_service.time.time", lambda: now[0])
+    cache = PersistentCache("test", db_path=str(tmp_path / "cache.db"), max_entries=2)
+    for key in ("a", "b"):
+        now[0] += 1
+        cache.set(key, key.upper())
+    now[0] += 1
+    cache.get("a")
+    now[0] += 1
+    cache.set("c", "C")
+
+    assert cache.get("b") is None
+    assert cache.get("a") == "A"
+    assert cache.stats()["entries"] == 2
+
+
+def test_persistent_cache_keeps_namespaces_apart(tmp_path):
+    db_path = str(tmp_path / "cache.db")
+    PersistentCache("one", db_path=db_path).set("key", "first")
+
+    assert PersistentCache("two", db_path=db_path).get("key") is None
+
+
+def test_entries_survive_a_new_instance(tmp_path):
+    db_path = str(tmp_path / "cache.db")
+    TieredCache("test", LRUCache(), PersistentCache("test", db_path=db_path)).set("key", "value")
+
+    restarted = TieredCache("test", LRUCache(), PersistentCache("test", db_path=db_path))
+
+    assert restarted.get("key") == "value"
+    assert restarted.persistent.hits == 1
+
+
+def test_memory_misses_fall_back_to_sqlite_and_are_promoted(tmp_path):
+    cache = TieredCache("test", LRUCache(max_entries=1), PersistentCache("test", db_path=str(tmp_path / "cache.db")))
+    cache.set("a", "A")
+    cache.set("b", "B")
+
+    assert cache.memory.get("a") is None
+    assert cache.get("a") == "A"
+    assert cache.memory.get("a") == "A"
+
+
+def test_sqlite_failures_degrade_to_misses(tmp_path):
+    class BrokenStore(PersistentCache):
+        def get(self, key):
+            raise sqlite3.OperationalError("database is locked")
+
+        def set(self, key, value):
+            raise sqlite3.OperationalError("database is locked")
+
+    cache = TieredCache("test", LRUCache(), BrokenStore("test", db_path=str(tmp_path / "cache.db")))
+    cache.set("a", "A")
+
+    assert cache.get("a") == "A"
+    assert cache.get("b") is None
@@ -0,0 +1,96 @@
+"""
+Tests for the memory-mapped chunk store
+"""
+import pytest
+
+from app.services.chunk_store import ChunkStore
+from app.services.chunking_service import ChunkingService, fold_case
+
+
+@pytest.fixture
+def chunking():
+    return ChunkingService(chunk_size=60, overlap=10)
+
+
+def test_keywords_match_non_ascii_case_insensitively(tmp_path, chunking):
+    text = "Rapport sur l'ÉNERGIE solaire. " * 5 + "Ünïcode Straße ΑΘΗΝΑ."
+    with ChunkStore.build(text, tmp_path, chunking) as store:
+        assert store.contains("énergie")
+        assert store.contains("ÉNERGIE")
+        assert store.contains("αθηνα")
+
+        patterns = chunking._keyword_patterns(["énergie", "ünïcode"])
+        totals = [sum(column) for column in zip(*store.keyword_counts(patterns))]
+        assert totals[0] >= 5
+        assert totals[1] >= 1
+
+
+def test_fold_case_keeps_utf8_length():
+    text = "ÉNERGIE K ΣΑΣ İstanbul ß"
+    folded = fold_case(text)
+    assert len(folded.encode("utf-8")) == len(text.encode("utf-8"))
+    assert folded.startswith("énergie")
+
+
+def test_stores_from_an_older_format_are_rebuilt(tmp_path, chunking):
+    ChunkStore.build("some text", tmp_path, chunking).close()
+    meta = tmp_path / ChunkStore.META_FILE
+    meta.write_text(meta.read_text().replace(f'"version": {ChunkStore.FORMAT_VERSION}, ', ""))
+    assert not ChunkStore.exists(tmp_path, chunking)
+
+
+def test_build_and_reopen_round_trip(tmp_path, chunking):
+    text = "First sentence here. Second one follows. " * 10
+    with ChunkStore.build(text, tmp_path, chunking) as built:
+        spans = built.spans
+        chunks = [built.text(i) for i in range(len(built))]
+
+    assert ChunkStore.exists(tmp_path)
+    assert ChunkStore.exists(tmp_path, chunking)
+    assert not ChunkStore.exists(tmp_path, ChunkingService(chunk_size=80, overlap=10))
+    assert not ChunkStore.exists(tmp_path / "missing")
+
+    with ChunkStore(tmp_path) as store:
+        assert store.spans == spans
+        assert (store.chunk_size, store.overlap, store.boundaries) == (60, 10, "fixed")
+        assert [store.text(i) for i in range(len(store))] == chunks
+    assert chunks == chunking.create_chunks(text)
+
+
+@pytest.mark.parametrize("boundaries", ["fixed", "content"])
+def test_byte_spans_decode_to_the_character_chunks(tmp_path, boundaries):
+    chunking = ChunkingService(chunk_size=40, overlap=8, boundaries=boundaries)
+    text = "Größe und Maß. 日本語のテキスト。 Ελληνικά κείμενα. emoji 🎉 here. " * 6
+
+    with ChunkStore.build(text, tmp_path, chunking) as store:
+        expected = [text[start:end] for start, end in chunking.create_chunk_spans(text)]
+        assert [store.text(i) for i in range(len(store))] == expected
+        for start, end in store.spans:
+            assert store.slice(start, end).encode("utf-8") == text.encode("utf-8")[start:end]
+
+
+def test_to_byte_spans_matches_encoded_prefix_lengths():
+    text = "aé日🎉b" * 3
+    char_spans = [(0, 4), (2, 9), (9, 15), (15, 15)]
+    byte_spans = ChunkStore._to_byte_spans(text, char_spans)
+    assert byte_spans == [
+        (len(text[:start].encode("utf-8")), len(text[:end].encode("utf-8"))) for start, end in char_spans
+    ]
+
+
+def test_keyword_counts_bucket_matches_into_overlapping_chunks(tmp_path):
+    chunking = ChunkingService(chunk_size=30, overlap=10)
+    text = "alpha beta gamma delta. " * 4
+    with ChunkStore.build(text, tmp_path, chunking) as store:
+        patterns = chunking._keyword_patterns(["alpha", "delta"])
+        counts = store.keyword_counts(patterns)
+        for index, vector in enumerate(counts):
+            chunk = store.text(index).lower()
+            assert vector == [chunk.count("alpha"), chunk.count("delta")]
+
+
+def test_empty_document(tmp_path, chunking):
+    with ChunkStore.build("", tmp_path, chunking) as store:
+        assert store.spans == [(0, 0)]
+        assert store.text(0) == ""
+        assert not store.contains("anything")
@@ -0,0 +1,80 @@
+"""
+Tests for content-defined chunk boundaries
+"""
+import random
+
+import pytest
+
+from app.services.chunking_service import ChunkingService
+
+
+def document(paragraphs: int = 150, seed: int = 7) -> str:
+    rng = random.Random(seed)
+    words = ["cell", "energy", "membrane", "protein", "signal", "transport", "gradient",
+             "enzyme", "structure", "function", "pathway", "molecule", "reaction", "binding"]
+    return "\n\n".join(
+        " ".join(rng.choice(words) for _ in range(rng.randint(40, 90))) + "."
+        for _ in range(paragraphs)
+    )
+
+
+def chunks(service: ChunkingService, text: str):
+    return [text[start:end] for start, end in service.create_chunk_spans(text)]
+
+
+@pytest.fixture
+def service():
+    return ChunkingService(chunk_size=1000, boundaries="content")
+
+
+def test_insertion_mid_document_keeps_other_chunks(service):
+    text = document()
+    middle = text.index("\n\n", len(text) // 2)
+    edited = text[:middle] + "\n\nA brand new paragraph inserted by the author during revision." + text[middle:]
+
+    before, after = chunks(service, text), chunks(service, edited)
+    unchanged = set(before) & set(after)
+    # Only the chunks around the edit move
+    assert len(before) > 50
+    assert len(unchanged) >= len(before) - 4
+
+
+def test_deletion_keeps_other_chunks(service):
+    text = document()
+    start = text.index("\n\n", len(text) // 3)
+    end = text.index("\n\n", start + 2)
+    edited = text[:start] + text[end:]
+
+    before, after = chunks(service, text), chunks(service, edited)
+    assert len(set(before) & set(after)) >= len(before) - 4
+
+
+@pytest.mark.parametrize("chunk_size", [64, 400, 2000])
+def test_chunk_sizes_stay_within_the_clamps(chunk_size):
+    service = ChunkingService(chunk_size=chunk_size, boundaries="content")
+    text = document()
+    spans = service.create_content_defined_spans(text)
+
+    sizes = [end - start for start, end in spans]
+    assert max(sizes) <= chunk_size
+    # Trimming whitespace can only take a few characters off the minimum
+    assert min(sizes[:-1]) >= chunk_size // 4 - 2
+
+
+def test_text_without_whitespace_is_cut_at_the_maximum():
+    service = ChunkingService(chunk_size=100, boundaries="content")
+    text = "x" * 1050
+    assert [end - start for start, end in service.create_content_defined_spans(text)] == [100] * 10 + [50]
+
+
+def test_spans_cover_the_text_without_overlap(service):
+    text = document()
+    spans = service.create_content_defined_spans(text)
+    for (_, end), (start, _) in zip(spans, spans[1:]):
+        assert end <= start
+        assert text[end:start].strip() == ""
+    assert text[:spans[0][0]].strip() == "" and text[spans[-1][1]:].strip() == ""
+
+
+def test_short_text_is_one_chunk(service):
+    assert service.create_chunk_spans("short text") == [(0, 10)]
@@ -0,0 +1,74 @@
+"""
+Tests for MMR context selection and span merging
+"""
+import pytest
+
+from app.services.chunk_store import ChunkStore
+from app.services.chunking_service import ChunkingService
+
+PHOTOSYNTHESIS = (
+    "Photosynthesis converts light into chemical energy. Chlorophyll in the chloroplast "
+    "absorbs light for photosynthesis. "
+)
+FILLER = "The weather report said nothing of interest today. Traffic was light on the bridge. "
+VOLCANO = "Volcanoes erupt when magma rises through the crust. Volcano lava cools into basalt rock. "
+
+
+@pytest.fixture
+def chunking():
+    return ChunkingService(chunk_size=200, overlap=40)
+
+
+@pytest.fixture
+def store(tmp_path, chunking):
+    # Photosynthesis dominates, the volcano topic appears once near the end
+    text = PHOTOSYNTHESIS * 6 + FILLER * 4 + VOLCANO + FILLER * 2
+    with ChunkStore.build(text, tmp_path, chunking) as chunk_store:
+        yield chunk_store
+
+
+def covered_text(store, spans):
+    return " ".join(store.slice(start, end) for start, end in spans).lower()
+
+
+def test_two_topic_query_covers_both_topics(store, chunking):
+    spans = chunking.select_context_spans(store, "photosynthesis and volcano eruptions", max_chunks=2)
+    text = covered_text(store, spans)
+    assert "photosynthesis" in text
+    assert "volcano" in text
+
+
+def test_pure_relevance_repeats_the_dominant_topic(store, chunking):
+    spans = chunking.select_context_spans(store, "photosynthesis and volcano eruptions", max_chunks=2, mmr_lambda=1.0)
+    assert "volcano" not in covered_text(store, spans)
+
+
+def test_selected_overlapping_chunks_are_merged(store, chunking):
+    spans = chunking.select_context_spans(store, "photosynthesis chlorophyll", max_chunks=3, mmr_lambda=1.0)
+    # Adjacent top chunks overlap, so fewer spans than chunks come back
+    assert len(spans) < 3
+    for (_, end), (start, _) in zip(sorted(spans), sorted(spans)[1:]):
+        assert end < start
+
+
+def test_spans_are_ordered_by_their_best_chunk(store, chunking):
+    spans = chunking.select_context_spans(store, "volcano magma", max_chunks=3)
+    assert "volcano" in store.slice(*spans[0]).lower()
+
+
+def test_query_without_keywords_falls_back_to_the_start(store, chunking):
+    spans = chunking.select_context_spans(store, "what is it?", max_chunks=2)
+    assert spans[0][0] == store.spans[0][0]
+
+
+def test_merge_spans_joins_overlapping_and_adjacent_spans(chunking):
+    assert chunking.merge_spans([(50, 60), (0, 10), (5, 20), (20, 30)]) == [(0, 30), (50, 60)]
+
+
+def test_merge_spans_gap(chunking):
+    assert chunking.merge_spans([(0, 10), (15, 20)]) == [(0, 10), (15, 20)]
+    assert chunking.merge_spans([(0, 10), (15, 20)], gap=5) == [(0, 20)]
+
+
+def test_merge_spans_keeps_contained_spans_inside(chunking):
+    assert chunking.merge_spans([(0, 100), (10, 20), (90, 120)]) == [(0, 120)]
@@ -0,0 +1,83 @@
+"""
+Tests for cancelling request work when the client disconnects
+"""
+import asyncio
+from types import SimpleNamespace
+import pytest
+from app.utils import disconnect
+from app.utils.disconnect import ClientDisconnected, cancel_on_disconnect, stream_until_disconnect
+
+
+class FakeRequest:
+    """Reports the client as gone once `disconnected` is set"""
+
+    def __init__(self):
+        self.url = SimpleNamespace(path="/api/ai/chat")
+        self.disconnected = False
+
+    async def is_disconnected(self):
+        return self.disconnected
+
+
+@pytest.fixture(autouse=True)
+def fast_polling(monkeypatch):
+    monkeypatch.setattr(disconnect, "DISCONNECT_POLL_SECONDS", 0.01)
+
+
+def test_work_is_cancelled_when_the_client_leaves():
+    async def scenario():
+        request = FakeRequest()
+        started = asyncio.Event()
+        cancelled = asyncio.Event()
+
+        async def work():
+            started.set()
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+
+        async def leave():
+            await started.wait()
+            request.disconnected = True
+
+        leaving = asyncio.ensure_future(leave())
+        with pytest.raises(ClientDisconnected):
+            await cancel_on_disconnect(request, work())
+        await leaving
+        # The work has unwound by the time the caller sees the disconnect
+        return cancelled.is_set()
+
+    assert asyncio.run(scenario())
+
+
+def test_result_is_returned_while_the_client_stays():
+    async def work():
+        await asyncio.sleep(0.05)
+        return "answer"
+
+    assert asyncio.run(cancel_on_disconnect(FakeRequest(), work())) == "answer"
+
+
+def test_stream_is_closed_when_the_client_leaves():
+    async def scenario():
+        request = FakeRequest()
+        closed = asyncio.Event()
+
+        async def deltas():
+            try:
+                yield "first"
+                await asyncio.sleep(10)
+                yield "never"
+            finally:
+                closed.set()
+
+        received = []
+        with pytest.raises(ClientDisconnected):
+            async for delta in stream_until_disconnect(request, deltas()):
+                received.append(delta)
+                request.disconnected = True
+        return received, closed.is_set()
+
+    assert asyncio.run(scenario()) == (["first"], True)
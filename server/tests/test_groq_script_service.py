@@ -0,0 +1,111 @@
+"""
+Tests for batched teacher script planning, parsing and fallback
+"""
+import asyncio
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from app.services import groq_script_service
+from app.services.cache_service import LRUCache
+from app.services.groq_script_service import GroqScriptService
+
+
+class FakeCompletions:
+    """Answers batched (JSON mode) requests with `batch_reply` and single requests by echo"""
+
+    def __init__(self, batch_reply: str):
+        self.batch_reply = batch_reply
+        self.requests = []
+
+    async def create(self, **request):
+        self.requests.append(request)
+        if "response_format" in request:
+            content = self.batch_reply
+        else:
+            content = f"script {len(self.requests)}"
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+
+
+@pytest.fixture
+def service(monkeypatch):
+    monkeypatch.setenv("GROQ_API_KEY", "test")
+    monkeypatch.setenv("SCRIPT_BATCH_TOKENS", "100")
+    monkeypatch.setenv("SCRIPT_BATCH_MAX_PAGES", "3")
+    monkeypatch.setenv("SCRIPT_BATCH_PAGE_TOKENS", "50")
+    service = GroqScriptService()
+    service.cache = LRUCache()
+    return service
+
+
+def use_client(monkeypatch, completions: FakeCompletions):
+    client = SimpleNamespace(chat=SimpleNamespace(completions=completions))
+    monkeypatch.setattr(groq_script_service, "get_async_groq_client", lambda: client)
+
+
+def page(num: int, words: int) -> dict:
+    return {'page_num': num, 'title': f"Page {num}", 'text': " ".join(f"w{num}x{i}" for i in range(words))}
+
+
+def test_short_pages_share_batches_within_the_budgets(service):
+    pages = [page(n, 10) for n in range(1, 6)]
+    groups = service._plan_batches(pages)
+    assert [[p['page_num'] for p in group] for group in groups] == [[1, 2, 3], [4, 5]]
+
+
+def test_long_pages_get_their_own_request(service):
+    pages = [page(1, 10), page(2, 200), page(3, 10)]
+    groups = service._plan_batches(pages)
+    assert [[p['page_num'] for p in group] for group in groups] == [[2], [1, 3]]
+
+
+def test_token_budget_closes_a_batch(service):
+    # Each page is about 40 tokens, so only two fit in 100
+    pages = [page(n, 30) for n in range(1, 4)]
+    groups = service._plan_batches(pages)
+    assert [len(group) for group in groups] == [2, 1]
+
+
+def test_parse_batch_maps_ids_to_pages_and_caches(service):
+    pages = [page(1, 5), page(2, 5)]
+    reply = json.dumps({"scripts": [{"id": 2, "script": " second "}, {"id": 1, "script": "first"}]})
+    assert service._parse_batch(reply, pages) == ["first", "second"]
+    assert service.cache.get(service._page_key(pages[1])) == "second"
+
+
+@pytest.mark.parametrize("reply", [
+    "not json",
+    json.dumps({"pages": []}),
+    json.dumps({"scripts": [{"id": "one", "script": "x"}]}),
+    json.dumps({"scripts": [{"id": 1, "script": "only the first"}]}),
+])
+def test_parse_batch_rejects_malformed_or_partial_replies(service, reply):
+    assert service._parse_batch(reply, [page(1, 5), page(2, 5)]) is None
+
+
+def test_malformed_batch_falls_back_to_single_requests(service, monkeypatch):
+    completions = FakeCompletions(batch_reply="{broken")
+    use_client(monkeypatch, completions)
+    pages = [page(1, 5), page(2, 5)]
+
+    scripts = asyncio.run(service.generate_teacher_scripts(pages, batch=True))
+
+    assert len(completions.requests) == 3
+    assert "response_format" in completions.requests[0]
+    assert sorted(scripts) == ["script 2", "script 3"]
+
+
+def test_sync_entry_point_delegates_to_the_async_path(service, monkeypatch):
+    reply = json.dumps({"scripts": [{"id": 1, "script": "one"}, {"id": 2, "script": "two"}]})
+    completions = FakeCompletions(batch_reply=reply)
+    use_client(monkeypatch, completions)
+    pages = [page(1, 5), page(2, 5)]
+
+    result = service.generate_scripts_for_pages(pages, batch=True)
+
+    assert [p['teacher_script'] for p in result] == ["one", "two"]
+    assert len(completions.requests) == 1
+    # Both scripts are cached, so a single-page call makes no request
+    assert service.generate_teacher_script("Page 1", pages[0]['text'], 1) == "one"
+    assert len(completions.requests) == 1
@@ -0,0 +1,38 @@
+"""
+Tests for content hashing and question fingerprints
+"""
+from app.utils.hashing import question_fingerprint
+
+
+def test_rephrasings_share_a_fingerprint():
+    assert question_fingerprint("What is the main idea?") == question_fingerprint(
+        "what's the main ideas of this document"
+    )
+
+
+def test_filler_and_punctuation_do_not_matter():
+    assert question_fingerprint("Define osmosis, please!") == question_fingerprint("please define OSMOSIS")
+
+
+def test_word_order_matters():
+    assert question_fingerprint("Is Python better than Java?") != question_fingerprint(
+        "Is Java better than Python?"
+    )
+
+
+def test_suffixes_are_stemmed():
+    assert question_fingerprint("How are proteins folded?") == question_fingerprint("how is protein folding")
+
+
+def test_question_words_are_kept():
+    assert question_fingerprint("Why does the cell divide?") != question_fingerprint("How does the cell divide?")
+
+
+def test_different_subjects_differ():
+    assert question_fingerprint("What is mitosis?") != question_fingerprint("What is meiosis?")
+
+
+def test_filler_only_question_has_no_fingerprint():
+    assert question_fingerprint("Can you explain this?") == ""
+    assert question_fingerprint("") == ""
+    assert question_fingerprint(None) == ""
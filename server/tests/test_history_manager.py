@@ -0,0 +1,142 @@
+"""
+Tests for chat history budgeting with a rolling summary
+"""
+import asyncio
+import uuid
+from app.services.history_manager import SUMMARY_INTRO, HistoryManager
+
+
+def conversation(exchanges, words=20, start=0):
+    messages = []
+    for n in range(start, start + exchanges):
+        messages.append({"role": "user", "content": f"question {n} " + "word " * words})
+        messages.append({"role": "model", "content": f"answer {n} " + "word " * words})
+    messages.append({"role": "user", "content": "current question"})
+    return messages
+
+
+def manager(turns=2, tokens=200, summary_tokens=50) -> HistoryManager:
+    history_manager = HistoryManager()
+    history_manager.max_turns = turns
+    history_manager.max_tokens = tokens
+    history_manager.summary_tokens = summary_tokens
+    return history_manager
+
+
+class Completion:
+    def __init__(self, fail=False):
+        self.calls = []
+        self.fail = fail
+
+    async def __call__(self, instructions, text, max_tokens):
+        self.calls.append(text)
+        if self.fail:
+            raise RuntimeError("provider down")
+        return f"summary {len(self.calls)}"
+
+
+class FakeChatHistory:
+    def __init__(self):
+        self.saved = {}
+
+    def get_history_summary(self, session_id):
+        return self.saved.get(session_id)
+
+    def save_history_summary(self, session_id, record):
+        self.saved[session_id] = record
+
+
+def session() -> str:
+    return f"test:{uuid.uuid4()}"
+
+
+def test_short_history_is_sent_unchanged():
+    complete = Completion()
+    messages = conversation(2)
+    result = asyncio.run(manager().prepare(messages, complete, session()))
+    assert result == messages
+    assert complete.calls == []
+
+
+def test_long_history_is_folded_within_budget():
+    history_manager = manager()
+    complete = Completion()
+    messages = conversation(8)
+    result = asyncio.run(history_manager.prepare(messages, complete, session()))
+
+    assert result[0]["role"] == "user" and result[0]["content"].startswith(SUMMARY_INTRO)
+    assert result[-1] == messages[-1]
+    assert [msg["role"] for msg in result] == ["user", "model"] * (len(result) // 2) + ["user"]
+    assert history_manager._tokens(result[:-1]) <= history_manager.max_tokens
+    assert len(complete.calls) == 1
+    # The kept messages are the most recent ones, verbatim
+    kept = result[2:-1]
+    assert kept == messages[len(messages) - 1 - len(kept):-1]
+
+
+def test_fold_is_incremental():
+    history_manager = manager()
+    complete = Completion()
+    key = session()
+    messages = conversation(8)
+    asyncio.run(history_manager.prepare(messages, complete, key))
+
+    # Two more exchanges: only what the last summary did not cover is summarized
+    longer = messages[:-1] + conversation(2, start=8)[:-1] + messages[-1:]
+    asyncio.run(history_manager.prepare(longer, complete, key))
+
+    assert len(complete.calls) == 2
+    assert "summary 1" in complete.calls[1]
+    assert "question 0 " not in complete.calls[1]
+    assert len(complete.calls[1]) < len(complete.calls[0])
+
+
+def test_unchanged_history_reuses_the_summary():
+    history_manager = manager()
+    complete = Completion()
+    key = session()
+    messages = conversation(8)
+    first = asyncio.run(history_manager.prepare(messages, complete, key))
+    second = asyncio.run(history_manager.prepare(messages, complete, key))
+    assert first == second
+    assert len(complete.calls) == 1
+
+
+def test_edited_history_is_summarized_again():
+    history_manager = manager()
+    complete = Completion()
+    key = session()
+    messages = conversation(8)
+    asyncio.run(history_manager.prepare(messages, complete, key))
+
+    edited = [dict(msg) for msg in messages]
+    edited[0]["content"] = "a different first question"
+    asyncio.run(history_manager.prepare(edited, complete, key))
+
+    assert len(complete.calls) == 2
+    assert "a different first question" in complete.calls[1]
+
+
+def test_failed_fold_drops_older_turns():
+    history_manager = manager()
+    messages = conversation(8)
+    result = asyncio.run(history_manager.prepare(messages, Completion(fail=True), session()))
+    assert not result[0]["content"].startswith(SUMMARY_INTRO)
+    assert result[-1] == messages[-1]
+    assert history_manager._tokens(result[:-1]) <= history_manager.max_tokens
+
+
+def test_summary_is_saved_on_the_session_and_reloaded():
+    chat_history = FakeChatHistory()
+    key = session()
+    messages = conversation(8)
+    asyncio.run(manager().prepare(messages, Completion(), key, chat_history))
+    assert chat_history.saved[key]["summary"] == "summary 1"
+
+    # Another worker without the cached record continues from the saved one
+    other_worker = manager()
+    other_worker.cache.delete(key)
+    complete = Completion()
+    result = asyncio.run(other_worker.prepare(messages, complete, key, chat_history))
+    assert complete.calls == []
+    assert "summary 1" in result[0]["content"]
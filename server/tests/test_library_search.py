@@ -0,0 +1,101 @@
+"""
+Tests for library-wide page search and packing retrieved pages into context
+"""
+import sqlite3
+import uuid
+
+import pytest
+
+from app.services.chunking_service import ChunkingService
+from app.services.database_service import Database
+
+
+class MemoryDatabase(Database):
+    """Database whose connections share one in-memory SQLite database"""
+
+    def __init__(self):
+        self.uri = f"file:{uuid.uuid4().hex}?mode=memory&cache=shared"
+        # The database lives as long as one connection to it stays open
+        self.keep_alive = sqlite3.connect(self.uri, uri=True)
+        super().__init__(db_path=":memory:")
+
+    def get_connection(self):
+        return sqlite3.connect(self.uri, uri=True)
+
+
+@pytest.fixture
+def db():
+    database = MemoryDatabase()
+    if not database.fts_enabled:
+        pytest.skip("SQLite built without FTS5")
+    video = database.create_video("job-a", "biology.pdf", 3, user_id="alice")
+    database.create_page(video, 1, "Mitochondria produce ATP through cellular respiration.", "Cells")
+    database.create_page(video, 2, "Photosynthesis happens in chloroplasts.", "Plants")
+    database.create_page(video, 3, "Respiration respiration respiration in detail.", "More cells")
+    other = database.create_video("job-b", "notes.pdf", 1, user_id="bob")
+    database.create_page(other, 1, "Bob's notes on respiration.", "Notes")
+    return database
+
+
+def test_search_ranks_matching_pages_of_the_user(db):
+    pages = db.search_pages("alice", ["respiration"])
+    assert [(page["job_id"], page["page_num"]) for page in pages] == [("job-a", 3), ("job-a", 1)]
+    assert "**respiration**" in pages[1]["snippet"].lower()
+    assert pages[0]["original_text"].startswith("Respiration")
+
+
+def test_search_matches_any_keyword_and_respects_limit(db):
+    assert len(db.search_pages("alice", ["chloroplasts", "mitochondria"])) == 2
+    assert len(db.search_pages("alice", ["respiration"], limit=1)) == 1
+
+
+def test_search_treats_input_as_plain_terms(db):
+    assert db.search_pages("alice", ['resp" OR "photosynthesis']) == []
+    assert db.search_pages("alice", []) == []
+
+
+def test_search_follows_page_updates(db):
+    conn = db.get_connection()
+    conn.execute("UPDATE pages SET original_text = 'Now about enzymes.' WHERE page_num = 2 AND title = 'Plants'")
+    conn.commit()
+    conn.close()
+    assert [page["title"] for page in db.search_pages("alice", ["enzymes"])] == ["Plants"]
+    assert db.search_pages("alice", ["chloroplasts"]) == []
+
+
+def test_one_long_page_does_not_crowd_out_the_rest():
+    service = ChunkingService()
+    long_page = ("Filler sentence about nothing. " * 400) + "The answer involves ribosomes. " + (
+        "More filler text here. " * 400
+    )
+    sections = [("[a.pdf, page 1]", long_page)] + [
+        (f"[b.pdf, page {n}]", f"Page {n} mentions ribosomes briefly.") for n in range(2, 6)
+    ]
+
+    context, included = service.build_excerpt_context(sections, "What do ribosomes do?", max_chars=3000)
+
+    assert included == [0, 1, 2, 3, 4]
+    assert len(context) <= 3000
+    assert "The answer involves ribosomes." in context
+    assert all(f"page {n}]" in context for n in range(1, 6))
+
+
+def test_short_pages_pass_their_share_on():
+    service = ChunkingService()
+    sections = [("[a]", "short"), ("[b]", "x" * 5000)]
+
+    context, included = service.build_excerpt_context(sections, "anything", max_chars=2000)
+
+    assert included == [0, 1]
+    # The long page gets nearly all of the budget the short one left
+    assert context.count("x") > 1800
+
+
+def test_weakest_sections_are_left_out_when_there_is_no_room():
+    service = ChunkingService()
+    sections = [(f"[page {n}]", "text " * 100) for n in range(20)]
+
+    context, included = service.build_excerpt_context(sections, "text", max_chars=1000)
+
+    assert included == [0, 1, 2, 3]
+    assert len(context) <= 1000
@@ -0,0 +1,241 @@
+"""
+Tests for the AIMD concurrency governor for outbound LLM calls
+"""
+import asyncio
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from app.core import llm_governor
+from app.core.llm_governor import LLMGovernor, Overloaded, background, rate_limit_retry_after
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def governor(monkeypatch):
+    monkeypatch.setenv("LLM_CONCURRENCY_INITIAL", "4")
+    monkeypatch.setenv("LLM_CONCURRENCY_MAX", "8")
+    monkeypatch.setenv("LLM_QUEUE_MAX", "2")
+    monkeypatch.setenv("LLM_QUEUE_TIMEOUT", "0.1")
+    return LLMGovernor("test")
+
+
+class RateLimitError(Exception):
+    status_code = 429
+
+    def __init__(self, retry_after: str):
+        super().__init__("rate limited")
+        self.response = SimpleNamespace(headers={"retry-after": retry_after})
+
+
+def test_successes_raise_the_limit_additively(governor):
+    async def scenario():
+        for _ in range(4):
+            async with governor.slot():
+                pass
+
+    asyncio.run(scenario())
+    # Four successes at a limit of about 4 add about one slot
+    assert 4.9 < governor.limit < 5.0
+    assert governor.in_flight == 0
+
+
+def test_limit_never_exceeds_the_maximum(governor):
+    async def scenario():
+        for _ in range(200):
+            async with governor.slot():
+                pass
+
+    asyncio.run(scenario())
+    assert governor.limit == 8
+
+
+def test_failures_release_without_raising_the_limit(governor):
+    async def scenario():
+        with pytest.raises(ValueError):
+            async with governor.slot():
+                raise ValueError("boom")
+
+    asyncio.run(scenario())
+    assert governor.limit == 4
+    assert governor.in_flight == 0
+
+
+def test_rate_limit_halves_the_limit_once_per_second(governor, monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(llm_governor, "time", clock)
+
+    governor.on_rate_limited(2.0)
+    governor.on_rate_limited(2.0)
+    assert governor.limit == 2
+    assert governor.rate_limited == 2
+
+    clock.now += 1.0
+    governor.on_rate_limited(2.0)
+    assert governor.limit == 1
+
+    clock.now += 1.0
+    governor.on_rate_limited(2.0)
+    assert governor.limit == governor.min_limit
+
+
+def test_rate_limit_pauses_new_calls_for_retry_after(governor, monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(llm_governor, "time", clock)
+
+    governor.on_rate_limited(5.0)
+    assert not governor._can_start()
+    clock.now += 4.9
+    assert not governor._can_start()
+    clock.now += 0.1
+    assert governor._can_start()
+
+
+def test_429_from_a_call_backs_off_by_its_retry_after(governor):
+    async def scenario():
+        with pytest.raises(RateLimitError):
+            async with governor.slot():
+                raise RateLimitError("3")
+
+    asyncio.run(scenario())
+    assert governor.limit == 2
+    assert governor.blocked_until - time.monotonic() > 2.5
+
+
+def test_retry_after_is_read_from_rate_limit_errors():
+    assert rate_limit_retry_after(RateLimitError("7")) == 7.0
+    assert rate_limit_retry_after(RateLimitError("soon")) == 1.0
+    assert rate_limit_retry_after(ValueError("other")) is None
+
+
+def test_calls_beyond_the_limit_are_shed_after_the_queue_timeout(governor):
+    async def scenario():
+        for _ in range(4):
+            await governor.acquire()
+        started = time.monotonic()
+        with pytest.raises(Overloaded) as error:
+            await governor.acquire()
+        return time.monotonic() - started, error.value
+
+    waited, error = asyncio.run(scenario())
+    assert 0.09 <= waited < 0.5
+    assert error.status_code == 503
+    assert error.headers["Retry-After"] == "1"
+    assert governor.rejected == 1
+    assert governor.waiting == 0
+
+
+def test_waiting_call_starts_when_a_slot_is_released(governor):
+    async def scenario():
+        for _ in range(4):
+            await governor.acquire()
+        waiter = asyncio.ensure_future(governor.acquire(queue_timeout=1.0))
+        await asyncio.sleep(0.01)
+        assert not waiter.done()
+        await governor.release(True)
+        await asyncio.wait_for(waiter, 0.5)
+
+    asyncio.run(scenario())
+    assert governor.in_flight == 4
+
+
+def test_full_queue_rejects_immediately(governor):
+    async def scenario():
+        for _ in range(4):
+            await governor.acquire()
+        queued = [asyncio.ensure_future(governor.acquire(queue_timeout=1.0)) for _ in range(2)]
+        await asyncio.sleep(0.01)
+        assert governor.waiting == 2
+
+        started = time.monotonic()
+        with pytest.raises(Overloaded):
+            await governor.acquire(queue_timeout=1.0)
+        rejected_after = time.monotonic() - started
+
+        for task in queued:
+            task.cancel()
+        await asyncio.gather(*queued, return_exceptions=True)
+        return rejected_after
+
+    assert asyncio.run(scenario()) < 0.05
+    assert governor.rejected == 1
+    assert governor.waiting == 0
+
+
+def test_background_calls_yield_to_waiting_callers(governor):
+    governor.limit = 1
+    order = []
+
+    async def call(name: str, low_priority: bool):
+        if low_priority:
+            with background():
+                await governor.acquire(queue_timeout=1.0)
+        else:
+            await governor.acquire(queue_timeout=1.0)
+        order.append(name)
+        await asyncio.sleep(0.01)
+        # Released as failures so the limit stays at one slot
+        await governor.release(False)
+
+    async def scenario():
+        await governor.acquire()
+        queued = asyncio.ensure_future(call("background", True))
+        await asyncio.sleep(0.01)
+        interactive = asyncio.ensure_future(call("interactive", False))
+        await asyncio.sleep(0.01)
+        await governor.release(False)
+        await asyncio.gather(queued, interactive)
+
+    asyncio.run(scenario())
+    assert order == ["interactive", "background"]
+
+
+def test_background_waiters_do_not_fill_the_queue(governor):
+    async def scenario():
+        for _ in range(4):
+            await governor.acquire()
+        with background():
+            queued = [asyncio.ensure_future(governor.acquire(queue_timeout=1.0)) for _ in range(3)]
+        await asyncio.sleep(0.01)
+        assert governor.background_waiting == 3
+
+        interactive = asyncio.ensure_future(governor.acquire(queue_timeout=1.0))
+        await asyncio.sleep(0.01)
+        assert not interactive.done()
+        await governor.release(True)
+        await asyncio.wait_for(interactive, 0.5)
+
+        for task in queued:
+            task.cancel()
+        await asyncio.gather(*queued, return_exceptions=True)
+
+    asyncio.run(scenario())
+    assert governor.rejected == 0
+    assert governor.waiting == 0
+
+
+def test_promoted_background_work_stops_yielding(governor):
+    async def scenario():
+        for _ in range(3):
+            await governor.acquire()
+        # One slot is free, but a normal caller is waiting for a second one
+        with background() as work:
+            low = asyncio.ensure_future(governor.acquire(queue_timeout=1.0))
+        governor.waiting += 1
+        await asyncio.sleep(0.01)
+        assert not low.done()
+
+        work.promote()
+        await asyncio.wait_for(low, 1.0)
+        governor.waiting -= 1
+
+    asyncio.run(scenario())
+    assert governor.in_flight == 4
@@ -0,0 +1,179 @@
+"""
+Tests for provider racing, hedging and failover in LLMRouter
+"""
+import asyncio
+import math
+
+import pytest
+
+from app.services.llm_router import LLMRouter, Provider, ProviderStats
+
+
+class StubService:
+    """Provider answering after `delay` seconds, or failing if `error` is set"""
+
+    def __init__(self, name: str, delay: float = 0.0, error: Exception = None):
+        self.name = name
+        self.delay = delay
+        self.error = error
+        self.calls = 0
+        self.cancelled = 0
+        self.closed = 0
+
+    async def chat_with_pdf(self, context, messages):
+        self.calls += 1
+        try:
+            await asyncio.sleep(self.delay)
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        if self.error:
+            raise self.error
+        return f"answer from {self.name}"
+
+    async def summarize_pdf(self, pdf_text, length="standard"):
+        return await self.chat_with_pdf(pdf_text, [])
+
+    async def stream_chat_with_pdf(self, context, messages, stats=None):
+        self.calls += 1
+        try:
+            await asyncio.sleep(self.delay)
+            if self.error:
+                raise self.error
+            for word in ("one ", "two ", self.name):
+                yield word
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        finally:
+            self.closed += 1
+
+
+def router(*services: StubService, hedge_after: float = 0.05) -> LLMRouter:
+    llm_router = LLMRouter([Provider(service.name, service) for service in services])
+    llm_router.default_hedge_after = hedge_after
+    return llm_router
+
+
+def test_fast_primary_is_not_hedged():
+    primary, backup = StubService("primary"), StubService("backup")
+    assert asyncio.run(router(primary, backup).chat_with_pdf("", [])) == "answer from primary"
+    assert backup.calls == 0
+
+
+def test_slow_primary_is_hedged_and_the_loser_cancelled():
+    primary, backup = StubService("primary", delay=1.0), StubService("backup", delay=0.01)
+    llm_router = router(primary, backup)
+
+    stats = {}
+    assert asyncio.run(llm_router.summarize_pdf("text", stats=stats)) == "answer from primary"
+    # Full summaries are never hedged
+    assert backup.calls == 0
+    assert stats["provider"] == "primary"
+
+    primary.calls = 0
+    assert asyncio.run(llm_router.chat_with_pdf("", [])) == "answer from backup"
+    assert primary.cancelled == 1
+    assert backup.calls == 1
+
+
+def test_failure_fails_over_immediately():
+    primary = StubService("primary", error=RuntimeError("down"))
+    backup = StubService("backup")
+    llm_router = router(primary, backup, hedge_after=10)
+
+    stats = {}
+    assert asyncio.run(llm_router.summarize_pdf("text", stats=stats)) == "answer from backup"
+    assert stats["provider"] == "backup"
+    assert llm_router.providers[0].stats_for("summary:standard").error_rate > 0
+
+
+def test_last_error_is_raised_when_every_provider_fails():
+    services = [StubService(name, error=RuntimeError(name)) for name in ("primary", "backup")]
+    with pytest.raises(RuntimeError, match="backup"):
+        asyncio.run(router(*services).chat_with_pdf("", []))
+
+
+def test_unhealthy_provider_is_ranked_last():
+    primary, backup = StubService("primary"), StubService("backup")
+    llm_router = router(primary, backup)
+    for _ in range(5):
+        llm_router.providers[0].stats_for("chat").record(None, ok=False)
+
+    assert asyncio.run(llm_router.chat_with_pdf("", [])) == "answer from backup"
+    assert primary.calls == 0
+
+
+def test_cancelling_the_caller_cancels_every_attempt():
+    primary, backup = StubService("primary", delay=1.0), StubService("backup", delay=1.0)
+
+    async def scenario():
+        call = asyncio.ensure_future(router(primary, backup).chat_with_pdf("", []))
+        await asyncio.sleep(0.1)
+        call.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await call
+
+    asyncio.run(scenario())
+    assert (primary.cancelled, backup.cancelled) == (1, 1)
+
+
+def test_stream_hedges_on_first_delta_and_closes_the_loser():
+    primary, backup = StubService("primary", delay=1.0), StubService("backup", delay=0.01)
+
+    async def scenario():
+        stats = {}
+        text = "".join([delta async for delta in router(primary, backup).stream_chat_with_pdf("", [], stats=stats)])
+        return text, stats
+
+    text, stats = asyncio.run(scenario())
+    assert text == "one two backup"
+    assert stats["provider"] == "backup"
+    assert primary.cancelled == 1
+    assert (primary.closed, backup.closed) == (1, 1)
+
+
+def test_stream_fails_over_before_the_first_delta():
+    primary = StubService("primary", error=RuntimeError("down"))
+    backup = StubService("backup")
+
+    async def scenario():
+        return "".join([delta async for delta in router(primary, backup).stream_chat_with_pdf("", [])])
+
+    assert asyncio.run(scenario()) == "one two backup"
+
+
+def test_stats_track_ewma_latency_and_p95():
+    stats = ProviderStats(alpha=0.5)
+    stats.record(1.0, ok=True)
+    assert (stats.latency, stats.p95) == (1.0, 1.0)
+
+    stats.record(3.0, ok=True)
+    assert stats.latency == 2.0
+    assert stats.latency_variance == pytest.approx(1.0)
+    assert stats.p95 == pytest.approx(2.0 + 1.645)
+    assert stats.samples == 2
+
+
+def test_stats_track_error_rate_and_recover():
+    stats = ProviderStats(alpha=0.5)
+    stats.record(None, ok=False)
+    assert stats.error_rate == 0.5
+    assert not stats.healthy(max_error_rate=0.4, retry_after=60)
+    assert stats.healthy(max_error_rate=0.4, retry_after=0)
+
+    stats.record(1.0, ok=True)
+    assert stats.error_rate == 0.25
+    assert stats.samples == 1
+    assert math.isclose(stats.latency, 1.0)
+
+
+def test_hedge_delay_uses_p95_once_measured():
+    primary = StubService("primary")
+    llm_router = router(primary, hedge_after=7)
+    provider = llm_router.providers[0]
+    assert llm_router._hedge_after(provider, "chat") == 7
+
+    for _ in range(llm_router.min_hedge_samples):
+        provider.stats_for("chat").record(0.5, ok=True)
+    assert llm_router._hedge_after(provider, "chat") == pytest.approx(0.5)
@@ -0,0 +1,50 @@
+"""
+Tests for the fast/large model cascade
+"""
+import pytest
+
+from app.services.model_cascade import ModelCascade, NOT_IN_DOCUMENT, unsure_answer
+
+
+@pytest.fixture
+def cascade(monkeypatch):
+    monkeypatch.setenv("LLM_CASCADE", "true")
+    monkeypatch.setenv("LLM_FAST_MODEL", "fast")
+    return ModelCascade()
+
+
+def test_prompted_not_in_document_answer_escalates(cascade):
+    answer = (
+        f"{NOT_IN_DOCUMENT}.\n\nHowever, I can help you with:\n"
+        "- What are the main findings?"
+    )
+    assert cascade.should_escalate("fast", answer)
+
+
+@pytest.mark.parametrize("answer", [
+    "I don't see that specific information in this document",
+    "I don’t see that specific information in this document.",
+    "I do not see this information in the document.",
+    "I'm not sure.",
+    "",
+])
+def test_unsure_answers_escalate(cascade, answer):
+    assert cascade.should_escalate("fast", answer)
+
+
+def test_confident_answer_is_kept(cascade):
+    assert not cascade.should_escalate("fast", "The study found a **12%** increase in yield.")
+
+
+def test_large_model_answers_never_escalate(cascade):
+    assert not cascade.should_escalate("large", NOT_IN_DOCUMENT)
+
+
+def test_disabled_cascade_never_escalates(monkeypatch):
+    monkeypatch.setenv("LLM_CASCADE", "false")
+    assert not ModelCascade().should_escalate("llama-3.1-8b-instant", NOT_IN_DOCUMENT)
+
+
+def test_unsure_answers_are_recognized_for_any_model():
+    assert unsure_answer(f"{NOT_IN_DOCUMENT}. However, I can help you with: ...")
+    assert not unsure_answer("Mitochondria produce ATP.")
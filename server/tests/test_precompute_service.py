@@ -0,0 +1,86 @@
+"""
+Tests for speculative background summaries
+"""
+import asyncio
+
+import pytest
+
+from app.core import llm_governor
+from app.services.cache_service import LRUCache
+from app.services.precompute_service import SummaryPrecomputeService
+from app.utils.hashing import file_hash
+
+
+class FakeSummaries:
+    """Summary provider that records whether its calls ran at background priority"""
+
+    def __init__(self, delay: float = 0.0):
+        self.delay = delay
+        self.priorities = []
+
+    def summary_cache_key(self, document_hash, length, provider=None):
+        return f"{provider or 'primary'}:{document_hash}:{length}"
+
+    def summary_cache_keys(self, document_hash, length):
+        return [self.summary_cache_key(document_hash, length, name) for name in ("primary", "backup")]
+
+    async def summarize_pdf(self, text, length="standard", stats=None):
+        await asyncio.sleep(self.delay)
+        work = llm_governor._background.get()
+        self.priorities.append(work is not None and work.active)
+        stats["provider"] = "backup"
+        return f"summary of {text}"
+
+
+@pytest.fixture
+def pdf(tmp_path):
+    path = tmp_path / "doc.pdf"
+    path.write_bytes(b"%PDF-1.4 test")
+    return str(path)
+
+
+def precompute(monkeypatch, ai_service) -> SummaryPrecomputeService:
+    monkeypatch.setenv("SUMMARY_PRECOMPUTE", "true")
+    service = SummaryPrecomputeService(ai_service)
+    service.cache = LRUCache()
+    return service
+
+
+def test_summary_runs_in_background_and_is_cached_under_the_winner(monkeypatch, pdf):
+    ai_service = FakeSummaries()
+    service = precompute(monkeypatch, ai_service)
+
+    async def scenario():
+        assert await service.schedule("job", "user", pdf, "text")
+        await asyncio.gather(*service._tasks.values())
+
+    asyncio.run(scenario())
+    assert ai_service.priorities == [True]
+    cached = [key for key in ai_service.summary_cache_keys(*_hash_and_length(service, pdf)) if service.cache.get(key)]
+    assert cached == [ai_service.summary_cache_key(*_hash_and_length(service, pdf), "backup")]
+
+
+def test_cached_summary_is_not_recomputed(monkeypatch, pdf):
+    ai_service = FakeSummaries()
+    service = precompute(monkeypatch, ai_service)
+    service.cache.set(ai_service.summary_cache_key(*_hash_and_length(service, pdf), "backup"), "done")
+
+    assert not asyncio.run(service.schedule("job", "user", pdf, "text"))
+
+
+def test_attaching_raises_the_job_to_normal_priority(monkeypatch, pdf):
+    ai_service = FakeSummaries(delay=0.05)
+    service = precompute(monkeypatch, ai_service)
+
+    async def scenario():
+        await service.schedule("job", "user", pdf, "text")
+        await asyncio.sleep(0.01)
+        cache_key = next(iter(service._tasks))
+        return await service.attach(cache_key)
+
+    assert asyncio.run(scenario()) == "summary of text"
+    assert ai_service.priorities == [False]
+
+
+def _hash_and_length(service, pdf):
+    return file_hash(pdf), service.length
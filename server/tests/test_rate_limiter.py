@@ -0,0 +1,81 @@
+"""
+Tests for the sliding-window provider rate limiter
+"""
+import asyncio
+import time
+from app.utils.rate_limiter import RateLimiter
+
+# Seconds; short so the window can be observed without waiting a minute
+WINDOW = 0.2
+
+
+def limiter(**limits) -> RateLimiter:
+    rate_limiter = RateLimiter(**limits)
+    rate_limiter.window = WINDOW
+    return rate_limiter
+
+
+def test_unlimited_never_waits():
+    async def scenario():
+        rate_limiter = RateLimiter()
+        started = time.monotonic()
+        for _ in range(100):
+            await rate_limiter.acquire(10_000)
+        return time.monotonic() - started
+
+    assert asyncio.run(scenario()) < 0.05
+
+
+def test_requests_beyond_rpm_wait_for_the_window():
+    async def scenario():
+        rate_limiter = limiter(requests_per_minute=2)
+        started = time.monotonic()
+        times = []
+        for _ in range(3):
+            await rate_limiter.acquire()
+            times.append(time.monotonic() - started)
+        return times
+
+    times = asyncio.run(scenario())
+    assert times[1] < WINDOW / 2
+    assert times[2] >= WINDOW * 0.9
+
+
+def test_tokens_beyond_tpm_wait_for_the_window():
+    async def scenario():
+        rate_limiter = limiter(tokens_per_minute=100)
+        started = time.monotonic()
+        await rate_limiter.acquire(60)
+        await rate_limiter.acquire(30)
+        within = time.monotonic() - started
+        await rate_limiter.acquire(30)
+        return within, time.monotonic() - started
+
+    within, after = asyncio.run(scenario())
+    assert within < WINDOW / 2
+    assert after >= WINDOW * 0.9
+
+
+def test_request_larger_than_tpm_is_capped_instead_of_blocking_forever():
+    async def scenario():
+        rate_limiter = limiter(tokens_per_minute=100)
+        await asyncio.wait_for(rate_limiter.acquire(1_000), 1)
+        return rate_limiter._tokens_in_window
+
+    assert asyncio.run(scenario()) == 100
+
+
+def test_waiters_are_served_in_arrival_order():
+    async def scenario():
+        rate_limiter = limiter(requests_per_minute=1)
+        order = []
+
+        async def request(n):
+            await asyncio.sleep(n * 0.001)
+            await rate_limiter.acquire()
+            order.append(n)
+
+        await asyncio.gather(*(request(n) for n in range(3)))
+        return order
+
+    assert asyncio.run(scenario()) == [0, 1, 2]
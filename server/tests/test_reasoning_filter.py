@@ -0,0 +1,104 @@
+"""
+Tests for the streaming reasoning filter
+"""
+import pytest
+from app.utils.reasoning_filter import ReasoningFilter
+
+
+def run(deltas):
+    reasoning_filter = ReasoningFilter()
+    output = "".join(reasoning_filter.feed(delta) for delta in deltas) + reasoning_filter.flush()
+    return output, reasoning_filter
+
+
+def chars(text):
+    """Every character as its own delta, the worst case for split markers"""
+    return list(text)
+
+
+def test_passes_plain_text_through():
+    output, reasoning_filter = run(["Hello ", "world"])
+    assert output == "Hello world"
+    assert reasoning_filter.reasoning_chars == 0
+    assert reasoning_filter.reasoning_tokens == 0
+
+
+def test_removes_think_block_and_leading_whitespace():
+    output, reasoning_filter = run(["<think>", "plan the answer", "</think>", "\n\nThe answer"])
+    assert output == "The answer"
+    assert reasoning_filter.reasoning_chars == len("<think>plan the answer</think>")
+
+
+@pytest.mark.parametrize("text", [
+    "<think>hidden</think>\n\nVisible",
+    "<reasoning>hidden</reasoning>Visible",
+    "```thinking\nhidden\n```Visible",
+    "```reasoning\nhidden\n```Visible",
+])
+def test_markers_split_across_deltas(text):
+    output, _ = run(chars(text))
+    assert output == "Visible"
+
+
+def test_opening_marker_split_mid_word():
+    output, _ = run(["Intro <th", "in", "k>secret</thi", "nk> outro"])
+    assert output == "Intro  outro"
+
+
+def test_markers_are_case_insensitive():
+    output, _ = run(["<THINK>x</Think>Answer"])
+    assert output == "Answer"
+
+
+def test_partial_opening_marker_is_held_back_until_resolved():
+    reasoning_filter = ReasoningFilter()
+    assert reasoning_filter.feed("Answer <thi") == "Answer "
+    assert reasoning_filter.feed("s is fine") == "<this is fine"
+    assert reasoning_filter.flush() == ""
+
+
+def test_text_resembling_a_marker_is_emitted_at_flush():
+    output, _ = run(["The tag <thi"])
+    assert output == "The tag <thi"
+
+
+def test_unterminated_block_is_dropped():
+    output, reasoning_filter = run(chars("Answer<think>never closed"))
+    assert output == "Answer"
+    assert reasoning_filter.in_reasoning
+    assert reasoning_filter.reasoning_chars == len("<think>never closed")
+
+
+def test_unterminated_block_with_partial_closing_marker_is_dropped():
+    output, _ = run(["<think>almost done</thi"])
+    assert output == ""
+
+
+def test_multiple_blocks():
+    output, _ = run(chars("<think>a</think>One <think>b</think>two"))
+    assert output == "One two"
+
+
+def test_reasoning_tokens_count_deltas_inside_blocks():
+    _, reasoning_filter = run(["<think>", "a", "b", "c", "</think>", "Answer"])
+    assert reasoning_filter.reasoning_tokens == 5
+
+
+def test_removes_reasoning_prefix_lines():
+    output, _ = run(["Thinking: weigh it up\nReasoning: more\nAnswer\nThinking: again\nEnd"])
+    assert output == "Answer\nEnd"
+
+
+def test_prefix_lines_split_across_deltas():
+    output, _ = run(chars("First\nthinking: hidden\nSecond"))
+    assert output == "First\nSecond"
+
+
+def test_unterminated_prefix_line_is_dropped():
+    output, _ = run(chars("Answer\nReasoning: trailing"))
+    assert output == "Answer"
+
+
+def test_prefix_words_mid_line_are_kept():
+    output, _ = run(["Note the heading Thinking: aloud\n\nNext"])
+    assert output == "Note the heading Thinking: aloud\n\nNext"
@@ -0,0 +1,205 @@
+"""
+Tests for coalescing concurrent work
+"""
+import asyncio
+import pytest
+from app.utils.singleflight import SingleFlight
+
+
+def test_concurrent_calls_share_one_run():
+    async def scenario():
+        flights = SingleFlight("test")
+        runs = []
+
+        async def work():
+            runs.append(1)
+            await asyncio.sleep(0.01)
+            return "result"
+
+        results = await asyncio.gather(*(flights.do("key", work) for _ in range(10)))
+        return results, runs, flights.in_flight("key")
+
+    results, runs, in_flight = asyncio.run(scenario())
+    assert results == ["result"] * 10
+    assert len(runs) == 1
+    assert not in_flight
+
+
+def test_exception_reaches_every_caller():
+    async def scenario():
+        flights = SingleFlight("test")
+
+        async def work():
+            await asyncio.sleep(0.01)
+            raise ValueError("boom")
+
+        return await asyncio.gather(*(flights.do("key", work) for _ in range(3)), return_exceptions=True)
+
+    results = asyncio.run(scenario())
+    assert all(isinstance(result, ValueError) for result in results)
+
+
+def test_work_survives_one_caller_cancelling():
+    async def scenario():
+        flights = SingleFlight("test")
+
+        async def work():
+            await asyncio.sleep(0.05)
+            return "done"
+
+        first = asyncio.create_task(flights.do("key", work))
+        second = asyncio.create_task(flights.do("key", work))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        return await second
+
+    assert asyncio.run(scenario()) == "done"
+
+
+def test_work_is_cancelled_when_last_caller_leaves():
+    async def scenario():
+        flights = SingleFlight("test")
+        cancelled = asyncio.Event()
+
+        async def work():
+            try:
+                await asyncio.sleep(1)
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+
+        caller = asyncio.create_task(flights.do("key", work))
+        await asyncio.sleep(0.01)
+        caller.cancel()
+        await asyncio.wait_for(cancelled.wait(), 1)
+        return flights.in_flight("key")
+
+    assert asyncio.run(scenario()) is False
+
+
+async def deltas(values, closed, delay=0.01):
+    try:
+        for value in values:
+            await asyncio.sleep(delay)
+            yield value
+    finally:
+        closed.append(True)
+
+
+async def collect(stream, limit=None):
+    received = []
+    async for delta in stream:
+        received.append(delta)
+        if limit is not None and len(received) == limit:
+            await stream.aclose()
+            break
+    return received
+
+
+def test_streams_are_shared_and_replayed_to_late_followers():
+    async def scenario():
+        flights = SingleFlight("test")
+        opened = []
+        closed = []
+
+        def open_stream():
+            opened.append(1)
+            return deltas(["a", "b", "c"], closed)
+
+        async def late_follower():
+            await asyncio.sleep(0.015)
+            return await collect(flights.stream("key", open_stream))
+
+        first, late = await asyncio.gather(collect(flights.stream("key", open_stream)), late_follower())
+        return first, late, opened, closed
+
+    first, late, opened, closed = asyncio.run(scenario())
+    assert first == late == ["a", "b", "c"]
+    assert len(opened) == 1
+    assert closed == [True]
+
+
+def test_do_joins_a_stream_and_gets_the_full_text():
+    async def scenario():
+        flights = SingleFlight("test")
+        closed = []
+        stream = flights.stream("key", lambda: deltas(["x", "y"], closed))
+        return await asyncio.gather(collect(stream), flights.do("key", lambda: asyncio.sleep(0, "other")))
+
+    streamed, joined = asyncio.run(scenario())
+    assert streamed == ["x", "y"]
+    assert joined == "xy"
+
+
+def test_stream_joins_a_run_started_with_do():
+    async def scenario():
+        flights = SingleFlight("test")
+
+        async def work():
+            await asyncio.sleep(0.01)
+            return "whole"
+
+        joined, streamed = await asyncio.gather(
+            flights.do("key", work),
+            collect(flights.stream("key", lambda: deltas(["unused"], [])))
+        )
+        return joined, streamed
+
+    assert asyncio.run(scenario()) == ("whole", ["whole"])
+
+
+def test_stream_continues_for_remaining_followers():
+    async def scenario():
+        flights = SingleFlight("test")
+        closed = []
+
+        def open_stream():
+            return deltas(["1", "2", "3"], closed)
+
+        early_leaver, stayer = await asyncio.gather(
+            collect(flights.stream("key", open_stream), limit=1),
+            collect(flights.stream("key", open_stream))
+        )
+        return early_leaver, stayer, closed
+
+    early_leaver, stayer, closed = asyncio.run(scenario())
+    assert early_leaver == ["1"]
+    assert stayer == ["1", "2", "3"]
+    assert closed == [True]
+
+
+def test_stream_is_closed_when_every_follower_leaves():
+    async def scenario():
+        flights = SingleFlight("test")
+        closed = []
+
+        def open_stream():
+            return deltas(["1", "2", "3"], closed, delay=0.05)
+
+        await asyncio.gather(
+            collect(flights.stream("key", open_stream), limit=1),
+            collect(flights.stream("key", open_stream), limit=1)
+        )
+        await asyncio.sleep(0.01)
+        return closed, flights.in_flight("key")
+
+    closed, in_flight = asyncio.run(scenario())
+    assert closed == [True]
+    assert not in_flight
+
+
+def test_stream_error_reaches_followers():
+    async def scenario():
+        flights = SingleFlight("test")
+
+        async def failing():
+            yield "partial"
+            raise ValueError("boom")
+
+        received = []
+        with pytest.raises(ValueError):
+            async for delta in flights.stream("key", failing):
+                received.append(delta)
+        return received
+
+    assert asyncio.run(scenario()) == ["partial"]
@@ -0,0 +1,62 @@
+"""
+Tests for map-reduce condensing of long documents
+"""
+import asyncio
+import uuid
+from app.services.summarization_service import COMBINE_PROMPT, MAP_PROMPT, MapReduceSummarizer
+
+
+class Completion:
+    """Returns summaries of a fixed length per prompt, recording the prompts"""
+
+    def __init__(self, map_chars):
+        self.map_chars = map_chars
+        self.calls = []
+
+    async def __call__(self, instructions, text, max_tokens):
+        self.calls.append((instructions, max_tokens))
+        if instructions == MAP_PROMPT:
+            return str(len(self.calls)).ljust(self.map_chars, "m")
+        if instructions == COMBINE_PROMPT:
+            return str(len(self.calls)).ljust(100, "c")
+        return str(len(self.calls)).ljust(max_tokens * 4, "s")
+
+
+def document(chars):
+    # Unique per test so cached section summaries never leak between tests
+    words = [uuid.uuid4().hex[:8] + ("." if n % 12 == 11 else "") for n in range(chars // 9 + 1)]
+    return " ".join(words)[:chars]
+
+
+def test_short_text_is_returned_unchanged():
+    complete = Completion(map_chars=100)
+    summarizer = MapReduceSummarizer(complete, "model", section_chars=500)
+
+    assert asyncio.run(summarizer.condense("short text", limit=1000)) == "short text"
+    assert complete.calls == []
+
+
+def test_summaries_that_fit_together_are_combined():
+    complete = Completion(map_chars=300)
+    summarizer = MapReduceSummarizer(complete, "model", section_chars=500)
+
+    condensed = asyncio.run(summarizer.condense(document(5000), limit=1000))
+
+    assert len(condensed) <= 1000
+    assert condensed.endswith("c" * 90)
+    assert all(instructions in (MAP_PROMPT, COMBINE_PROMPT) for instructions, _ in complete.calls)
+
+
+def test_summaries_too_long_to_combine_are_shortened_not_truncated():
+    complete = Completion(map_chars=600)
+    summarizer = MapReduceSummarizer(complete, "model", section_chars=500)
+
+    condensed = asyncio.run(summarizer.condense(document(5000), limit=1000))
+
+    shortened = [max_tokens for instructions, max_tokens in complete.calls if instructions.startswith("Shorten")]
+    assert shortened
+    # Every section keeps its shortened summary whole rather than the tail being cut off
+    parts = condensed.split("\n\n")
+    assert len(parts) == len(shortened)
+    assert all(len(part) == max_tokens * 4 and part.endswith("s") for part, max_tokens in zip(parts, shortened))
+    assert len(condensed) <= 1000